@@ -96,16 +96,15 @@ class OSFCASAuthentication(authentication.BaseAuthentication):
     """Check whether the user provides a valid OAuth2 bearer token"""
 
     def authenticate(self, request):
-        client = cas.get_client()  # Returns a CAS server client
         try:
             auth_header_field = request.META['HTTP_AUTHORIZATION']
             auth_token = cas.parse_auth_header(auth_header_field)
         except (cas.CasTokenError, KeyError):
             return None  # If no token in header, then this method is not applicable
 
-        # Found a token; query CAS for the associated user id
+        # Found a token; query CAS (or the token cache) for the associated user id
         try:
-            cas_auth_response = client.profile(auth_token)
+            cas_auth_response = cas.get_profile(auth_token)
         except cas.CasHTTPError:
             raise exceptions.NotAuthenticated(_('User provided an invalid OAuth2 access token'))
 
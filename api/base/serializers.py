@@ -235,7 +235,11 @@ def _url_val(val, obj, serializer, request, **kwargs):
     elif isinstance(val, basestring):  # if a string is passed, it's a method of the serializer
         if getattr(serializer, 'field', None):
             serializer = serializer.parent
-        url = getattr(serializer, val)(obj) if obj is not None else None
+        prefetched = getattr(serializer, 'prefetched_counts', {}).get(val)
+        if prefetched is not None and getattr(obj, '_id', None) in prefetched:
+            url = prefetched[obj._id]
+        else:
+            url = getattr(serializer, val)(obj) if obj is not None else None
     else:
         url = val
 
@@ -909,9 +913,14 @@ class JSONAPIListSerializer(ser.ListSerializer):
                 self.child.to_esi_representation(item, envelope=None) for item in data
             ]
         else:
-            ret = [
-                self.child.to_representation(item, envelope=envelope) for item in data
-            ]
+            data = list(data)
+            self.child.prefetch_counts(data)
+            try:
+                ret = [
+                    self.child.to_representation(item, envelope=envelope) for item in data
+                ]
+            finally:
+                self.child.prefetched_counts = {}
 
         if errors and bulk_skip_uneditable:
             ret.append({'errors': errors})
@@ -998,6 +1007,12 @@ class JSONAPISerializer(ser.Serializer):
         'nodes:node-registrations',
     }
 
+    # Maps count methods named in `related_meta` and `self_meta` to methods
+    # returning the counts of a list of objects at once, by object id. List
+    # serializers call them once per page for the requested related counts.
+    batch_counts = {}
+    prefetched_counts = {}
+
     # overrides Serializer
     @classmethod
     def many_init(cls, *args, **kwargs):
@@ -1013,6 +1028,41 @@ class JSONAPISerializer(ser.Serializer):
             [f.field_name for f in fields_check if getattr(f, 'json_api_link', False)])
         return invalid_embeds
 
+    def get_requested_count_methods(self):
+        """Names of the count methods of the relationships whose counts are
+        requested with the `related_counts` query parameter.
+        """
+        request = self.context['request']
+        related_counts = request.query_params.get('related_counts', False)
+        if not related_counts or utils.is_falsy(related_counts):
+            return set()
+        if (request.parser_context.get('kwargs') or {}).get('is_embedded'):
+            return set()
+        requested = None if utils.is_truthy(related_counts) else set(related_counts.split(','))
+
+        methods = set()
+        for field_name, field in self.fields.items():
+            if requested is not None and field_name not in requested:
+                continue
+            field = getattr(field, 'field', field)
+            for meta in (getattr(field, 'related_meta', None), getattr(field, 'self_meta', None)):
+                for key, value in (meta or {}).items():
+                    if key in ('count', 'unread') and isinstance(value, basestring):
+                        methods.add(value)
+        return methods
+
+    def prefetch_counts(self, objs):
+        """Compute the requested related counts of `objs` with the methods of
+        `batch_counts`, to be used instead of one count query per object.
+        """
+        self.prefetched_counts = {}
+        if not self.batch_counts or not objs:
+            return
+        requested = self.get_requested_count_methods()
+        for count_method, batch_method in self.batch_counts.items():
+            if count_method in requested:
+                self.prefetched_counts[count_method] = getattr(self, batch_method)(objs)
+
     def to_esi_representation(self, data, envelope='data'):
         href = None
         query_params_blacklist = ['page[size]']
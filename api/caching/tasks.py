@@ -1,85 +1,241 @@
+import os
+import re
 import urlparse
+from collections import defaultdict
 
 import requests
 import logging
+from gevent.pool import Pool
+from requests.adapters import HTTPAdapter
+
+from framework.celery_tasks import app as celery_app
+from framework.postcommit_tasks.handlers import postcommit_queue
 from website.project.model import Comment
 
 from website import settings
 
 logger = logging.getLogger(__name__)
 
+BAN_AGGREGATOR_KEY = 'api.caching.tasks.ban_aggregator'
+
+# Characters with a meaning in a Varnish (PCRE) regex; '/' is left alone so patterns stay valid url paths
+REGEX_SPECIAL_CHARS = re.compile(r'([.^$*+?()\[\]{}|\\])')
+
+_session = None
+
 
 def get_varnish_servers():
     #  TODO: this should get the varnish servers from HAProxy or a setting
     return settings.VARNISH_SERVERS
 
 
-def get_bannable_urls(instance):
-    bannable_urls = []
-    parsed_absolute_url = {}
+def get_session():
+    """Return a process-wide requests session that keeps connections to the
+    varnish servers alive between bans.
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max(len(get_varnish_servers()), 1),
+            pool_maxsize=settings.VARNISH_BAN_CONCURRENCY,
+        )
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
 
+
+def get_bannable_paths(instance):
+    """Return the api paths that must be banned when `instance` changes, along
+    with the hostname they are served from.
+    """
     if not hasattr(instance, 'absolute_api_v2_url'):
         logger.warning('Tried to ban {}:{} but it didn\'t have a absolute_api_v2_url method'.format(instance.__class__, instance))
         return [], ''
 
+    parsed_absolute_url = urlparse.urlparse(instance.absolute_api_v2_url)
+    bannable_paths = [parsed_absolute_url.path]
+
+    if isinstance(instance, Comment):
+        try:
+            bannable_paths.append(urlparse.urlparse(instance.target.referent.absolute_api_v2_url).path)
+        except AttributeError:
+            # some referents don't have an absolute_api_v2_url
+            # I'm looking at you NodeWikiPage
+            pass
+
+        try:
+            bannable_paths.append(urlparse.urlparse(instance.root_target.referent.absolute_api_v2_url).path)
+        except AttributeError:
+            # some root_targets don't have an absolute_api_v2_url
+            pass
+
+    return bannable_paths, parsed_absolute_url.hostname
+
+
+def get_bannable_urls(instance):
+    bannable_urls = []
+    bannable_paths, hostname = get_bannable_paths(instance)
+
     for host in get_varnish_servers():
-        # add instance url
         varnish_parsed_url = urlparse.urlparse(host)
-        parsed_absolute_url = urlparse.urlparse(instance.absolute_api_v2_url)
-        url_string = '{scheme}://{netloc}{path}.*'.format(scheme=varnish_parsed_url.scheme,
-                                                          netloc=varnish_parsed_url.netloc,
-                                                          path=parsed_absolute_url.path)
-        bannable_urls.append(url_string)
-        if isinstance(instance, Comment):
-            try:
-                parsed_target_url = urlparse.urlparse(instance.target.referent.absolute_api_v2_url)
-            except AttributeError:
-                # some referents don't have an absolute_api_v2_url
-                # I'm looking at you NodeWikiPage
-                pass
-            else:
-                url_string = '{scheme}://{netloc}{path}.*'.format(scheme=varnish_parsed_url.scheme,
-                                                                  netloc=varnish_parsed_url.netloc,
-                                                                  path=parsed_target_url.path)
-                bannable_urls.append(url_string)
-
-            try:
-                parsed_root_target_url = urlparse.urlparse(instance.root_target.referent.absolute_api_v2_url)
-            except AttributeError:
-                # some root_targets don't have an absolute_api_v2_url
-                pass
-            else:
-                url_string = '{scheme}://{netloc}{path}.*'.format(scheme=varnish_parsed_url.scheme,
+        for path in bannable_paths:
+            url_string = '{scheme}://{netloc}{path}.*'.format(scheme=varnish_parsed_url.scheme,
                                                               netloc=varnish_parsed_url.netloc,
-                                                              path=parsed_root_target_url.path)
-                bannable_urls.append(url_string)
+                                                              path=path)
+            bannable_urls.append(url_string)
+
+    return bannable_urls, hostname
+
+
+def _escape_path(path):
+    return REGEX_SPECIAL_CHARS.sub(r'\\\1', path)
+
+
+def _common_directory(paths):
+    prefix = os.path.commonprefix(paths)
+    return prefix[:prefix.rfind('/') + 1]
+
+
+def _build_pattern(paths):
+    if len(paths) == 1:
+        return '{}.*'.format(_escape_path(paths[0]))
+    prefix = _common_directory(paths)
+    alternatives = '|'.join(_escape_path(path[len(prefix):]) for path in paths)
+    # A plain group: '(?:' would start a query string in the url of the BAN
+    return '{}({}).*'.format(_escape_path(prefix), alternatives)
+
+
+def coalesce_ban_patterns(paths, max_length=None):
+    """Merge `paths` into as few alternation regexes as possible, each no
+    longer than `max_length` characters.
+
+    Paths that are already covered by a shorter banned prefix are dropped, since
+    every pattern bans everything below its path.
+
+    :param iterable paths: url paths, e.g. ``/v2/nodes/abc12/``
+    :param int max_length: maximum length of a single pattern
+    :return list: regex patterns, each usable as the path of a BAN request
+    """
+    max_length = max_length or settings.VARNISH_BAN_MAX_URL_LENGTH
+    unique_paths = []
+    for path in sorted(set(paths)):
+        if unique_paths and path.startswith(unique_paths[-1]):
+            continue
+        unique_paths.append(path)
+
+    patterns = []
+    batch = []
+    for path in unique_paths:
+        if batch and len(_build_pattern(batch + [path])) > max_length:
+            patterns.append(_build_pattern(batch))
+            batch = []
+        batch.append(path)
+    if batch:
+        patterns.append(_build_pattern(batch))
+    return patterns
+
+
+def _send_ban(url_to_ban, hostname):
+    session = get_session()
+    try:
+        request = session.prepare_request(requests.Request('BAN', url_to_ban, headers=dict(
+            Host=hostname
+        )))
+        # Varnish uses the url verbatim as the regex, so the '|' and backslashes
+        # of a pattern must not be percent-encoded the way requests would
+        request.url = url_to_ban
+        response = session.send(request, timeout=settings.VARNISH_BAN_TIMEOUT)
+    except Exception as ex:
+        logger.error('Banning {} failed: {}'.format(
+            url_to_ban,
+            ex.message
+        ))
+        return False
+    if not response.ok:
+        logger.error('Banning {} failed: {}'.format(
+            url_to_ban,
+            response.text
+        ))
+        return False
+    logger.info('Banning {} succeeded'.format(
+        url_to_ban
+    ))
+    return True
+
+
+def send_bans(urls, hostname):
+    """Send a BAN for every url in parallel over pooled keep-alive connections.
+
+    :return list: the urls whose ban failed
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+    pool = Pool(settings.VARNISH_BAN_CONCURRENCY)
+    results = pool.map(lambda url: _send_ban(url, hostname), urls)
+    return [url for url, ok in zip(urls, results) if not ok]
+
+
+def ban_paths(paths, hostname):
+    """Ban `paths` on every varnish server, coalescing them into as few
+    regexes as possible. Failed bans are handed to `retry_bans`.
+    """
+    if not settings.ENABLE_VARNISH:
+        return
+    patterns = coalesce_ban_patterns(paths)
+    urls = []
+    for host in get_varnish_servers():
+        varnish_parsed_url = urlparse.urlparse(host)
+        for pattern in patterns:
+            urls.append('{scheme}://{netloc}{path}'.format(scheme=varnish_parsed_url.scheme,
+                                                           netloc=varnish_parsed_url.netloc,
+                                                           path=pattern))
+    failed = send_bans(urls, hostname)
+    if failed:
+        if settings.USE_CELERY:
+            retry_bans.delay(failed, hostname)
+        else:
+            logger.error('Could not ban {} and celery is disabled, not retrying'.format(failed))
+
+
+@celery_app.task(bind=True, max_retries=settings.VARNISH_BAN_MAX_RETRIES, default_retry_delay=settings.VARNISH_BAN_RETRY_DELAY)
+def retry_bans(self, urls, hostname):
+    failed = send_bans(urls, hostname)
+    if failed:
+        self.retry(args=(failed, hostname), exc=Exception('Banning {} failed'.format(failed)))
+
+
+class BanAggregator(object):
+    """Collects the bannable paths of every object saved during a request and
+    bans them all at once when the postcommit queue runs.
+    """
+
+    def __init__(self):
+        self.paths_by_hostname = defaultdict(set)
+
+    def add(self, instance):
+        paths, hostname = get_bannable_paths(instance)
+        self.paths_by_hostname[hostname].update(paths)
+
+    def __call__(self):
+        for hostname, paths in self.paths_by_hostname.items():
+            ban_paths(paths, hostname)
+        self.paths_by_hostname.clear()
+
 
-    return bannable_urls, parsed_absolute_url.hostname
+def enqueue_ban(instance):
+    """Schedule `instance` to be banned from varnish once the current request
+    has been committed. All bans of a request are sent together.
+    """
+    queue = postcommit_queue()
+    aggregator = queue.get(BAN_AGGREGATOR_KEY)
+    if aggregator is None:
+        aggregator = queue[BAN_AGGREGATOR_KEY] = BanAggregator()
+    aggregator.add(instance)
 
 
 def ban_url(instance):
-    # TODO: Refactor; Pull url generation into postcommit_task handling so we only ban urls once per request
-    timeout = 0.3  # 300ms timeout for bans
     if settings.ENABLE_VARNISH:
-        bannable_urls, hostname = get_bannable_urls(instance)
-
-        for url_to_ban in set(bannable_urls):
-            try:
-                response = requests.request('BAN', url_to_ban, timeout=timeout, headers=dict(
-                    Host=hostname
-                ))
-            except Exception as ex:
-                logger.error('Banning {} failed: {}'.format(
-                    url_to_ban,
-                    ex.message
-                ))
-            else:
-                if not response.ok:
-                    logger.error('Banning {} failed: {}'.format(
-                        url_to_ban,
-                        response.text
-                    ))
-                else:
-                    logger.info('Banning {} succeeded'.format(
-                        url_to_ban
-                    ))
+        bannable_paths, hostname = get_bannable_paths(instance)
+        ban_paths(bannable_paths, hostname)
@@ -0,0 +1,99 @@
+import re
+import unittest
+
+import mock
+from nose.tools import *  # flake8: noqa
+
+from api.caching import tasks
+from framework.postcommit_tasks.handlers import postcommit_before_request, postcommit_queue
+
+
+class FakeObject(object):
+
+    def __init__(self, path):
+        self.absolute_api_v2_url = 'http://localhost:8000{}'.format(path)
+
+
+class TestCoalesceBanPatterns(unittest.TestCase):
+
+    def test_single_path_is_unchanged(self):
+        assert_equal(tasks.coalesce_ban_patterns(['/v2/nodes/abc12/']), ['/v2/nodes/abc12/.*'])
+
+    def test_paths_are_merged_into_an_alternation(self):
+        patterns = tasks.coalesce_ban_patterns(['/v2/nodes/abc12/', '/v2/nodes/def34/', '/v2/nodes/abc12/'])
+        assert_equal(patterns, ['/v2/nodes/(abc12/|def34/).*'])
+
+    def test_covered_paths_are_dropped(self):
+        patterns = tasks.coalesce_ban_patterns(['/v2/nodes/abc12/', '/v2/nodes/abc12/contributors/user1/'])
+        assert_equal(patterns, ['/v2/nodes/abc12/.*'])
+
+    def test_patterns_respect_max_length(self):
+        paths = ['/v2/nodes/{:05d}/'.format(i) for i in range(100)]
+        patterns = tasks.coalesce_ban_patterns(paths, max_length=100)
+        assert_greater(len(patterns), 1)
+        for pattern in patterns:
+            assert_less_equal(len(pattern), 100)
+        for path in paths:
+            assert_true(any(re.match(pattern, path) for pattern in patterns))
+
+    def test_regex_characters_are_escaped(self):
+        patterns = tasks.coalesce_ban_patterns(['/v2/files/a.b/', '/v2/files/c+d/'])
+        assert_equal(patterns, [r'/v2/files/(a\.b/|c\+d/).*'])
+        assert_true(re.match(patterns[0], '/v2/files/a.b/'))
+        assert_false(re.match(patterns[0], '/v2/files/aXb/'))
+
+
+class TestBanAggregator(unittest.TestCase):
+
+    def setUp(self):
+        postcommit_before_request()
+        self.varnish_servers = mock.patch('website.settings.VARNISH_SERVERS', ['http://varnish1', 'http://varnish2'])
+        self.enable_varnish = mock.patch('website.settings.ENABLE_VARNISH', True)
+        self.varnish_servers.start()
+        self.enable_varnish.start()
+
+    def tearDown(self):
+        self.varnish_servers.stop()
+        self.enable_varnish.stop()
+        postcommit_before_request()
+
+    def test_enqueue_ban_uses_a_single_postcommit_task(self):
+        for i in range(10):
+            tasks.enqueue_ban(FakeObject('/v2/nodes/node{}/'.format(i)))
+        assert_equal(postcommit_queue().keys(), [tasks.BAN_AGGREGATOR_KEY])
+
+    @mock.patch('api.caching.tasks.send_bans')
+    def test_one_ban_per_varnish_server(self, mock_send_bans):
+        mock_send_bans.return_value = []
+        for i in range(100):
+            tasks.enqueue_ban(FakeObject('/v2/nodes/node{}/'.format(i)))
+        postcommit_queue()[tasks.BAN_AGGREGATOR_KEY]()
+
+        assert_equal(mock_send_bans.call_count, 1)
+        urls, hostname = mock_send_bans.call_args[0]
+        assert_equal(hostname, 'localhost')
+        assert_equal(len(urls), 2)
+        assert_true(urls[0].startswith('http://varnish1/v2/nodes/('))
+        assert_true(urls[1].startswith('http://varnish2/v2/nodes/('))
+
+    @mock.patch('api.caching.tasks.retry_bans')
+    @mock.patch('api.caching.tasks._send_ban')
+    def test_failed_bans_are_retried(self, mock_send_ban, mock_retry_bans):
+        mock_send_ban.side_effect = lambda url, hostname: 'varnish2' not in url
+        with mock.patch('website.settings.USE_CELERY', True):
+            tasks.ban_paths(['/v2/nodes/abc12/'], 'localhost')
+        mock_retry_bans.delay.assert_called_once_with(['http://varnish2/v2/nodes/abc12/.*'], 'localhost')
+
+    @mock.patch('requests.Session.send')
+    def test_pattern_is_sent_unencoded_in_the_url(self, mock_send):
+        mock_send.return_value = mock.Mock(ok=True)
+        tasks.ban_paths(['/v2/files/a.b/', '/v2/nodes/abc12/'], 'localhost')
+
+        prepared = [call[0][0] for call in mock_send.call_args_list]
+        assert_equal(sorted(request.url for request in prepared), [
+            r'http://varnish1/v2/(files/a\.b/|nodes/abc12/).*',
+            r'http://varnish2/v2/(files/a\.b/|nodes/abc12/).*',
+        ])
+        for request in prepared:
+            assert_equal(request.method, 'BAN')
+            assert_equal(request.headers['Host'], 'localhost')
@@ -43,13 +43,8 @@ class CommentMixin(object):
         except NoResultsFound:
             raise NotFound
 
-        # Deleted root targets still appear as tuples in the database and are included in
-        # the above query, requiring an additional check
+        # Comments on targets deleted before their root target was unset on deletion
         if comment.root_target.referent.is_deleted:
-            comment.root_target = None
-            comment.save()
-
-        if comment.root_target is None:
             raise NotFound
 
         if check_permissions:
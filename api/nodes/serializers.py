@@ -12,9 +12,10 @@ from django.conf import settings
 from website.addons.base.exceptions import InvalidFolderError, InvalidAuthError
 from website.project.metadata.schemas import ACTIVE_META_SCHEMAS, LATEST_SCHEMA_VERSION
 from website.project.metadata.utils import is_prereg_admin_not_project_admin
-from website.models import Node, Comment, Institution, MetaSchema, DraftRegistration, PrivateLink
+from website.models import Node, Comment, Institution, MetaSchema, DraftRegistration, PrivateLink, Pointer
 from website.exceptions import NodeStateError
 from website.util import permissions as osf_permissions
+from website.project import log_counters
 from website.project import new_private_link
 from website.project.model import NodeUpdateError
 
@@ -286,6 +287,15 @@ class NodeSerializer(JSONAPISerializer):
         auth = Auth(user if not user.is_anonymous() else None)
         return obj.can_comment(auth)
 
+    batch_counts = {
+        'get_logs_count': 'get_logs_counts',
+        'get_node_count': 'get_node_counts',
+        'get_registration_count': 'get_registration_counts',
+        'get_pointers_count': 'get_pointers_counts',
+        'get_node_links_count': 'get_node_links_counts',
+        'get_unread_comments_count': 'get_unread_comments_counts',
+    }
+
     class Meta:
         type_ = 'nodes'
 
@@ -295,7 +305,7 @@ class NodeSerializer(JSONAPISerializer):
     # TODO: See if we can get the count filters into the filter rather than the serializer.
 
     def get_logs_count(self, obj):
-        return len(obj.logs)
+        return obj.log_count
 
     def get_node_count(self, obj):
         auth = get_user_auth(self.context['request'])
@@ -329,6 +339,91 @@ class NodeSerializer(JSONAPISerializer):
             'node': node_comments
         }
 
+    # Batch counts of a page of nodes, see `JSONAPISerializer.batch_counts`
+
+    def get_logs_counts(self, objs):
+        counters = log_counters.get_counters(obj._id for obj in objs)
+        return {node_id: counter['count'] for node_id, counter in counters.items()}
+
+    def get_node_counts(self, objs):
+        auth = get_user_auth(self.context['request'])
+        counts = dict.fromkeys((obj._id for obj in objs), 0)
+        children = Node.find(Q('parent_node', 'in', list(counts)) & Q('is_deleted', 'eq', False))
+        for child in children:
+            if child.can_view(auth):
+                counts[child.parent_node._id] += 1
+        return counts
+
+    def get_registration_counts(self, objs):
+        auth = get_user_auth(self.context['request'])
+        counts = dict.fromkeys((obj._id for obj in objs), 0)
+        for registration in Node.find(Q('registered_from', 'in', list(counts))):
+            if registration.can_view(auth):
+                counts[registration.registered_from._id] += 1
+        return counts
+
+    def get_linked_nodes(self, objs):
+        """The nodes each of `objs` points to, by node id, loaded with one query
+        per collection instead of once per pointer.
+        """
+        documents = Node._storage[0].store.find({'_id': {'$in': [obj._id for obj in objs]}}, {'nodes': True})
+        pointer_ids = {
+            document['_id']: [key for key, schema in document.get('nodes') or [] if schema == 'pointer']
+            for document in documents
+        }
+        all_pointer_ids = [pointer_id for ids in pointer_ids.values() for pointer_id in ids]
+        targets = {
+            pointer['_id']: pointer.get('node')
+            for pointer in Pointer._storage[0].store.find({'_id': {'$in': all_pointer_ids}}, {'node': True})
+        } if all_pointer_ids else {}
+        nodes = {
+            node._id: node
+            for node in Node.find(Q('_id', 'in', list(set(targets.values()) - {None})))
+        } if targets else {}
+        return {
+            node_id: [nodes.get(targets.get(pointer_id)) for pointer_id in ids]
+            for node_id, ids in pointer_ids.items()
+        }
+
+    def get_pointers_counts(self, objs):
+        return {node_id: len(nodes) for node_id, nodes in self.get_linked_nodes(objs).items()}
+
+    def get_node_links_counts(self, objs):
+        auth = get_user_auth(self.context['request'])
+        return {
+            node_id: len([
+                node for node in nodes
+                if node and not node.is_deleted and not node.is_collection and node.can_view(auth)
+            ])
+            for node_id, nodes in self.get_linked_nodes(objs).items()
+        }
+
+    def get_unread_comments_counts(self, objs):
+        user = get_user_auth(self.context['request']).user
+        counts = {obj._id: {'node': 0} for obj in objs}
+        if not user:
+            return counts
+        unread = []
+        for obj in objs:
+            if obj.is_contributor(user):
+                view_timestamp = user.get_node_comment_timestamps(target_id=obj._id)
+                unread.append({
+                    'node': obj._id,
+                    'root_target': obj._id,
+                    '$or': [
+                        {'date_created': {'$gt': view_timestamp}},
+                        {'date_modified': {'$gt': view_timestamp}},
+                    ],
+                })
+        if unread:
+            results = Comment._storage[0].store.aggregate([
+                {'$match': {'$or': unread, 'user': {'$ne': user._id}, 'is_deleted': False}},
+                {'$group': {'_id': '$node', 'count': {'$sum': 1}}},
+            ])['result']
+            for result in results:
+                counts[result['_id']]['node'] = result['count']
+        return counts
+
     def create(self, validated_data):
         request = self.context['request']
         user = request.user
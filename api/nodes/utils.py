@@ -1,14 +1,27 @@
 # -*- coding: utf-8 -*-
+import collections
+import copy
+import threading
+import time
+
 from modularodm import Q
 from rest_framework.exceptions import PermissionDenied, NotFound
 from rest_framework.status import is_server_error
 import requests
 
+from framework import metrics
+from website import settings
+from website.files import metadata_changes
 from website.files.models import OsfStorageFileNode
 from website.util import waterbutler_api_url_for
 
 from api.base.exceptions import ServiceUnavailableError
-from api.base.utils import get_object_or_error
+from api.base.utils import get_object_or_error, get_user_auth
+
+# Providers whose file nodes depend on the requester: Dataverse hides unpublished
+# files from users who can not edit the node when updating them
+UNCACHED_PROVIDERS = {'dataverse'}
+
 
 def get_file_object(node, path, provider, request):
     if provider == 'osfstorage':
@@ -25,15 +38,122 @@ def get_file_object(node, path, provider, request):
             )
         return obj
 
+    return get_waterbutler_metadata(node, path, provider, request)[0]
+
+
+class MetadataCache(object):
+    """Bounded cache of the metadata WaterButler returns for paths of external
+    providers, keyed by node, provider, path and version of the files of the
+    provider (see `website.files.metadata_changes`).
+
+    Metadata is served without asking WaterButler for
+    `WATERBUTLER_METADATA_CACHE_TTL` seconds, and for up to
+    `WATERBUTLER_METADATA_CACHE_STALE_TTL` seconds when WaterButler fails or
+    does not answer within `WATERBUTLER_METADATA_TIMEOUT` seconds. Up to
+    `WATERBUTLER_METADATA_CACHE_SIZE` paths are kept per process, least
+    recently used first out.
+    """
+
+    def __init__(self):
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, stale=False):
+        """Return a copy of the metadata cached for `key`, or None if there is
+        none younger than the TTL, or than the stale TTL if `stale`.
+        """
+        max_age = settings.WATERBUTLER_METADATA_CACHE_STALE_TTL if stale else settings.WATERBUTLER_METADATA_CACHE_TTL
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            age = time.time() - entry[0] if entry else None
+            if entry is not None and age <= settings.WATERBUTLER_METADATA_CACHE_STALE_TTL:
+                self._entries[key] = entry  # Most recently used
+            if entry is None or age > max_age:
+                if not stale:
+                    self.stats['misses'] += 1
+                return None
+            self.stats['stale_hits' if stale else 'hits'] += 1
+        # Callers update file nodes from the metadata, which alters it
+        return copy.deepcopy(entry[1])
+
+    def set(self, key, metadata):
+        entry = (time.time(), copy.deepcopy(metadata))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > settings.WATERBUTLER_METADATA_CACHE_SIZE:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_status(self):
+        return dict(self.stats, size=len(self))
+
+
+metadata_cache = MetadataCache()
+metrics.register('waterbutler_metadata_cache', metadata_cache.get_status)
+
+
+def get_waterbutler_metadata(node, path, provider, request):
+    """Metadata of `path` of an external provider, from the metadata cache when
+    enabled. WaterButler checks that the requester can view the node; cached
+    metadata is only served after the same check.
+
+    :return: ``(metadata, cache_status)``, the status being 'hit', 'stale',
+        'miss' or None when the cache is disabled
+    """
     if not node.get_addon(provider) or not node.get_addon(provider).configured:
         raise NotFound('The {} provider is not configured for this project.'.format(provider))
 
+    enabled = settings.WATERBUTLER_METADATA_CACHE_ENABLED and provider not in UNCACHED_PROVIDERS
+    if enabled:
+        # Read before asking WaterButler: a change reported meanwhile makes the
+        # metadata fetched now outdated
+        key = (node._id, provider, path, metadata_changes.get_version(node._id, provider))
+    metadata = metadata_cache.get(key) if enabled else None
+    if metadata is not None:
+        check_can_view(node, request)
+        return metadata, 'hit'
+
+    try:
+        metadata = request_waterbutler_metadata(node, path, provider, request)
+    except ServiceUnavailableError:
+        metadata = metadata_cache.get(key, stale=True) if enabled else None
+        if metadata is None:
+            raise
+        check_can_view(node, request)
+        return metadata, 'stale'
+
+    if not enabled:
+        return metadata, None
+    metadata_cache.set(key, metadata)
+    return metadata, 'miss'
+
+
+def check_can_view(node, request):
+    if not node.can_view(get_user_auth(request)):
+        raise PermissionDenied
+
+
+def request_waterbutler_metadata(node, path, provider, request):
     url = waterbutler_api_url_for(node._id, provider, path, meta=True)
-    waterbutler_request = requests.get(
-        url,
-        cookies=request.COOKIES,
-        headers={'Authorization': request.META.get('HTTP_AUTHORIZATION')},
-    )
+    try:
+        waterbutler_request = requests.get(
+            url,
+            cookies=request.COOKIES,
+            headers={'Authorization': request.META.get('HTTP_AUTHORIZATION')},
+            timeout=settings.WATERBUTLER_METADATA_TIMEOUT,
+        )
+    except requests.exceptions.RequestException:
+        # Includes timeouts
+        raise ServiceUnavailableError(detail='Could not retrieve files information at this time.')
 
     if waterbutler_request.status_code == 401:
         raise PermissionDenied
@@ -6,7 +6,6 @@ from rest_framework.status import HTTP_204_NO_CONTENT
 from rest_framework.response import Response
 
 from framework.auth.oauth_scopes import CoreScopes
-from framework.postcommit_tasks.handlers import enqueue_postcommit_task
 
 from api.base import generic_bulk_views as bulk_views
 from api.base import permissions as base_permissions
@@ -21,7 +20,7 @@ from api.base.exceptions import RelationshipPostMakesNoChanges, EndpointNotImple
 from api.base.pagination import CommentPagination, NodeContributorPagination, MaxSizePagination
 from api.base.utils import get_object_or_error, is_bulk_request, get_user_auth, is_truthy
 from api.base.settings import ADDONS_OAUTH, API_BASE
-from api.caching.tasks import ban_url
+from api.caching.tasks import enqueue_ban
 from api.addons.views import AddonSettingsMixin
 from api.files.serializers import FileSerializer
 from api.comments.serializers import NodeCommentSerializer, CommentCreateSerializer
@@ -54,7 +53,7 @@ from api.nodes.serializers import (
     NodeCitationSerializer,
     NodeCitationStyleSerializer
 )
-from api.nodes.utils import get_file_object
+from api.nodes.utils import get_file_object, get_waterbutler_metadata
 from api.citations.utils import render_citation
 
 from api.addons.serializers import NodeAddonFolderSerializer
@@ -143,20 +142,51 @@ class WaterButlerMixin(object):
 
     path_lookup_url_kwarg = 'path'
     provider_lookup_url_kwarg = 'provider'
+    metadata_cache_status = None
 
     def get_file_item(self, item):
-        attrs = item['attributes']
-        file_node = FileNode.resolve_class(
-            attrs['provider'],
-            FileNode.FOLDER if attrs['kind'] == 'folder'
-            else FileNode.FILE
-        ).get_or_create(self.get_node(check_object_permissions=False), attrs['path'])
+        file_nodes = self.get_file_items([item])
+        if not file_nodes:
+            raise NotFound
+        return file_nodes[0]
 
-        file_node.update(None, attrs, user=self.request.user)
+    def get_file_items(self, items):
+        """File nodes of the waterbutler metadata `items`, looked up with one
+        query. Only nodes that are new or whose metadata changed are saved.
 
-        self.check_object_permissions(self.request, file_node)
+        Metadata served from the cache was stored when it was fetched; it is
+        not stored again, and items whose file node has been removed since
+        (e.g. deleted files) are left out.
+        """
+        from_cache = self.metadata_cache_status in ('hit', 'stale')
+        node = self.get_node(check_object_permissions=False)
+        paths = ['/' + item['attributes']['path'].lstrip('/') for item in items]
+        stored = {
+            (file_node.provider, file_node.path, file_node.is_file): file_node
+            for file_node in FileNode.find(Q('node', 'eq', node) & Q('path', 'in', paths))
+        }
 
-        return file_node
+        file_nodes = []
+        for item, path in zip(items, paths):
+            attrs = item['attributes']
+            is_file = attrs['kind'] != 'folder'
+            key = (attrs['provider'], path, is_file)
+            file_node = stored.get(key)
+            if from_cache:
+                if file_node is None:
+                    continue
+            elif file_node is None or file_node.metadata_changed(attrs):
+                if file_node is None:
+                    file_node = stored[key] = FileNode.resolve_class(
+                        attrs['provider'],
+                        FileNode.FILE if is_file else FileNode.FOLDER
+                    ).create(node=node, path=path)
+                file_node.update(None, attrs, user=self.request.user)
+
+            self.check_object_permissions(self.request, file_node)
+            file_nodes.append(file_node)
+
+        return file_nodes
 
     def fetch_from_waterbutler(self):
         node = self.get_node(check_object_permissions=False)
@@ -165,12 +195,24 @@ class WaterButlerMixin(object):
         return self.get_file_object(node, path, provider)
 
     def get_file_object(self, node, path, provider, check_object_permissions=True):
+        if provider != 'osfstorage':
+            obj, self.metadata_cache_status = get_waterbutler_metadata(node, path, provider, self.request)
+            return obj
         obj = get_file_object(node=node, path=path, provider=provider, request=self.request)
-        if provider == 'osfstorage':
-            if check_object_permissions:
-                self.check_object_permissions(self.request, obj)
+        if check_object_permissions:
+            self.check_object_permissions(self.request, obj)
         return obj
 
+    def add_metadata_cache_header(self, response):
+        """Tell whether the metadata of external providers came from the
+        metadata cache ('hit'), from it because waterbutler failed ('stale')
+        or from waterbutler ('miss').
+        """
+        cache_status = getattr(self, 'metadata_cache_status', None)
+        if cache_status:
+            response['X-OSF-Metadata-Cache'] = cache_status
+        return response
+
 
 class NodeList(JSONAPIBaseView, bulk_views.BulkUpdateJSONAPIView, bulk_views.BulkDestroyJSONAPIView, bulk_views.ListBulkCreateJSONAPIView, ODMFilterMixin, WaterButlerMixin):
     """Nodes that represent projects and components. *Writeable*.
@@ -1864,7 +1906,7 @@ class NodeFilesList(JSONAPIBaseView, generics.ListAPIView, WaterButlerMixin, Lis
         files_list = self.fetch_from_waterbutler()
 
         if isinstance(files_list, list):
-            return [self.get_file_item(file) for file in files_list]
+            return self.get_file_items(files_list)
 
         if isinstance(files_list, dict) or getattr(files_list, 'is_file', False):
             # We should not have gotten a file here
@@ -1876,6 +1918,10 @@ class NodeFilesList(JSONAPIBaseView, generics.ListAPIView, WaterButlerMixin, Lis
     def get_queryset(self):
         return self.get_queryset_from_request()
 
+    # overrides ListAPIView
+    def list(self, request, *args, **kwargs):
+        return self.add_metadata_cache_header(super(NodeFilesList, self).list(request, *args, **kwargs))
+
 
 class NodeFileDetail(JSONAPIBaseView, generics.RetrieveAPIView, WaterButlerMixin, NodeMixin):
     permission_classes = (
@@ -1904,6 +1950,10 @@ class NodeFileDetail(JSONAPIBaseView, generics.RetrieveAPIView, WaterButlerMixin
 
         return fobj
 
+    # overrides RetrieveAPIView
+    def retrieve(self, request, *args, **kwargs):
+        return self.add_metadata_cache_header(super(NodeFileDetail, self).retrieve(request, *args, **kwargs))
+
 
 class NodeAddonList(JSONAPIBaseView, generics.ListAPIView, ListFilterMixin, NodeMixin, AddonSettingsMixin):
     """List of addons connected to this node *Read-only*
@@ -2647,14 +2697,8 @@ class NodeCommentsList(JSONAPIBaseView, generics.ListCreateAPIView, ODMFilterMix
         return Q('node', 'eq', self.get_node()) & Q('root_target', 'ne', None)
 
     def get_queryset(self):
-        comments = Comment.find(self.get_query_from_request())
-        for comment in comments:
-            # Deleted root targets still appear as tuples in the database,
-            # but need to be None in order for the query to be correct.
-            if comment.root_target.referent.is_deleted:
-                comment.root_target = None
-                comment.save()
-
+        # The root target of comments on deleted files and wiki pages is unset
+        # when they are deleted, see `Comment.hide_for_deleted_target`
         return Comment.find(self.get_query_from_request())
 
     def get_serializer_class(self):
@@ -3184,7 +3228,7 @@ class NodeViewOnlyLinkDetail(JSONAPIBaseView, generics.RetrieveUpdateDestroyAPIV
         assert isinstance(link, PrivateLink), 'link must be a PrivateLink'
         link.is_deleted = True
         link.save()
-        enqueue_postcommit_task(ban_url, (self.get_node(),), {}, celery=True, once_per_request=True)
+        enqueue_ban(self.get_node())
 
 
 class NodeIdentifierList(NodeMixin, IdentifierList):
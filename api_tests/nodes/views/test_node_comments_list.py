@@ -3,11 +3,13 @@ from nose.tools import *  # flake8: noqa
 
 from framework.auth import core
 from framework.guid.model import Guid
+from website.project.model import Comment
 
 from api.base.settings.defaults import API_BASE
 from api.base.settings import osf_settings
 from api_tests import utils as test_utils
 from tests.base import ApiTestCase
+from tests.utils import count_queries
 from tests.factories import (
     ProjectFactory,
     RegistrationFactory,
@@ -143,6 +145,19 @@ class TestNodeCommentsListFiles(NodeCommentsListMixin, ApiTestCase):
         comment_ids = [comment['id'] for comment in comment_json]
         assert_not_in(self.comment._id, comment_ids)
 
+    def test_deleting_file_hides_its_comments(self):
+        self._set_up_private_project_with_comment()
+        self.file.delete()
+        assert_is_none(Comment.load(self.comment._id).root_target)
+
+    def test_listing_comments_does_not_write(self):
+        self._set_up_private_project_with_comment()
+        self.file.delete()
+        with count_queries() as counter:
+            res = self.app.get(self.private_url, auth=self.user.auth)
+        assert_equal(res.json['data'], [])
+        assert_equal([query for query in counter.queries if query[0] == 'comment' and query[1] != 'find'], [])
+
 
 class TestNodeCommentsListWiki(NodeCommentsListMixin, ApiTestCase):
 
@@ -174,6 +189,11 @@ class TestNodeCommentsListWiki(NodeCommentsListMixin, ApiTestCase):
         comment_ids = [comment['id'] for comment in comment_json]
         assert_not_in(self.comment._id, comment_ids)
 
+    def test_deleting_wiki_hides_its_comments(self):
+        self._set_up_private_project_with_comment()
+        self.private_project.delete_node_wiki(self.wiki.page_name, core.Auth(self.user))
+        assert_is_none(Comment.load(self.comment._id).root_target)
+
 
 class NodeCommentsCreateMixin(object):
 
@@ -2,16 +2,26 @@ import datetime
 import json
 
 import httpretty
+import mock
+import requests
 from nose.tools import *  # flake8: noqa
 
+from modularodm import Q
+
 from framework.auth.core import Auth
 
+from website import settings
+from website.addons.base import signals as file_signals
+from website.files.models import FileNode
+
 from website.addons.github.tests.factories import GitHubAccountFactory
 from website.models import Node
 from website.util import waterbutler_api_url_for
 from api.base.settings.defaults import API_BASE
+from api.nodes.utils import get_waterbutler_metadata, metadata_cache
 from api_tests import utils as api_utils
 from tests.base import ApiTestCase
+from tests.utils import count_queries
 from tests.factories import (
     ProjectFactory,
     AuthUserFactory
@@ -464,3 +474,163 @@ class TestNodeFilesListPagination(ApiTestCase):
         self.check_file_order(res)
 
 
+class TestNodeFilesListMetadataCache(ApiTestCase):
+
+    def setUp(self):
+        super(TestNodeFilesListMetadataCache, self).setUp()
+        self.user = AuthUserFactory()
+        self.project = ProjectFactory(creator=self.user)
+        self.add_github()
+        self.url = '/{}nodes/{}/files/github/'.format(API_BASE, self.project._id)
+        self.files = [
+            {'name': 'one', 'path': '/one', 'materialized': '/one', 'etag': 'a1'},
+            {'name': 'dir', 'path': '/dir/', 'materialized': '/dir/', 'kind': 'folder'},
+        ]
+        metadata_cache.clear()
+        self.cache_enabled = mock.patch.object(settings, 'WATERBUTLER_METADATA_CACHE_ENABLED', True)
+        self.cache_enabled.start()
+        httpretty.enable()
+
+    def tearDown(self):
+        super(TestNodeFilesListMetadataCache, self).tearDown()
+        self.cache_enabled.stop()
+        metadata_cache.clear()
+        httpretty.disable()
+        httpretty.reset()
+
+    def add_github(self):
+        user_auth = Auth(self.user)
+        self.project.add_addon('github', auth=user_auth)
+        addon = self.project.get_addon('github')
+        addon.repo = 'something'
+        addon.user = 'someone'
+        oauth_settings = GitHubAccountFactory()
+        oauth_settings.save()
+        self.user.add_addon('github')
+        self.user.external_accounts.append(oauth_settings)
+        self.user.save()
+        addon.user_settings = self.user.get_addon('github')
+        addon.save()
+        self.project.save()
+
+    def names(self, res):
+        return sorted(each['attributes']['name'] for each in res.json['data'])
+
+    def test_listing_is_served_from_cache_within_ttl(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(res.headers['X-OSF-Metadata-Cache'], 'miss')
+
+        prepare_mock_wb_response(node=self.project, files=[{'name': 'two', 'path': '/two', 'materialized': '/two'}])
+        res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(res.headers['X-OSF-Metadata-Cache'], 'hit')
+        assert_equal(self.names(res), ['dir', 'one'])
+
+    def test_expired_listing_is_fetched_again(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        with mock.patch.object(settings, 'WATERBUTLER_METADATA_CACHE_TTL', -1):
+            self.app.get(self.url, auth=self.user.auth)
+            prepare_mock_wb_response(node=self.project, files=[{'name': 'two', 'path': '/two', 'materialized': '/two'}])
+            res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(res.headers['X-OSF-Metadata-Cache'], 'miss')
+        assert_equal(self.names(res), ['two'])
+
+    def test_stale_listing_is_served_when_waterbutler_fails(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        with mock.patch.object(settings, 'WATERBUTLER_METADATA_CACHE_TTL', -1):
+            self.app.get(self.url, auth=self.user.auth)
+            prepare_mock_wb_response(node=self.project, status_code=502)
+            res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(res.status_code, 200)
+        assert_equal(res.headers['X-OSF-Metadata-Cache'], 'stale')
+        assert_equal(self.names(res), ['dir', 'one'])
+
+    def test_stale_listing_is_served_when_waterbutler_times_out(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        with mock.patch.object(settings, 'WATERBUTLER_METADATA_CACHE_TTL', -1):
+            self.app.get(self.url, auth=self.user.auth)
+            with mock.patch('api.nodes.utils.requests.get', side_effect=requests.exceptions.Timeout):
+                res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(res.headers['X-OSF-Metadata-Cache'], 'stale')
+        assert_equal(self.names(res), ['dir', 'one'])
+
+    def test_waterbutler_timeout_without_cached_listing_returns_503(self):
+        with mock.patch('api.nodes.utils.requests.get', side_effect=requests.exceptions.Timeout) as mock_get:
+            res = self.app.get(self.url, auth=self.user.auth, expect_errors=True)
+        assert_equal(res.status_code, 503)
+        assert_equal(mock_get.call_args[1]['timeout'], settings.WATERBUTLER_METADATA_TIMEOUT)
+
+    def test_cached_listing_is_not_served_to_non_contributors(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        self.app.get(self.url, auth=self.user.auth)
+        res = self.app.get(self.url, auth=AuthUserFactory().auth, expect_errors=True)
+        assert_equal(res.status_code, 403)
+
+    def test_no_header_when_cache_is_disabled(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        with mock.patch.object(settings, 'WATERBUTLER_METADATA_CACHE_ENABLED', False):
+            res = self.app.get(self.url, auth=self.user.auth)
+        assert_not_in('X-OSF-Metadata-Cache', res.headers)
+
+    def test_file_detail_has_cache_header(self):
+        prepare_mock_wb_response(node=self.project, files=self.files[:1], folder=False, path='/one')
+        url = '/{}nodes/{}/files/github/one'.format(API_BASE, self.project._id)
+        self.app.get(url, auth=self.user.auth)
+        res = self.app.get(url, auth=self.user.auth)
+        assert_equal(res.headers['X-OSF-Metadata-Cache'], 'hit')
+        assert_equal(res.json['data']['attributes']['name'], 'one')
+
+    def test_file_changes_invalidate_cached_listing(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        self.app.get(self.url, auth=self.user.auth)
+
+        file_signals.file_updated.send(
+            node=self.project, user=self.user, event_type='file_removed',
+            payload={'provider': 'github', 'metadata': {'path': '/one', 'materialized': '/one'}},
+        )
+        prepare_mock_wb_response(node=self.project, files=self.files[1:])
+        res = self.app.get(self.url, auth=self.user.auth)
+
+        assert_equal(res.headers['X-OSF-Metadata-Cache'], 'miss')
+        assert_equal(self.names(res), ['dir'])
+
+    def test_cached_listing_does_not_create_file_nodes(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        self.app.get(self.url, auth=self.user.auth)
+        FileNode.find_one(Q('node', 'eq', self.project) & Q('path', 'eq', '/one')).delete()
+
+        with count_queries() as counter:
+            res = self.app.get(self.url, auth=self.user.auth)
+
+        assert_equal(res.headers['X-OSF-Metadata-Cache'], 'hit')
+        assert_equal(self.names(res), ['dir'])
+        writes = [query for query in counter.queries if query[0] == 'storedfilenode' and query[1] != 'find']
+        assert_equal(writes, [])
+
+    @mock.patch('api.nodes.utils.request_waterbutler_metadata', return_value=[])
+    def test_dataverse_metadata_is_not_cached(self, mock_request):
+        node = mock.Mock(_id=self.project._id)
+        for _ in range(2):
+            _, cache_status = get_waterbutler_metadata(node, '/', 'dataverse', mock.Mock())
+        assert_equal(mock_request.call_count, 2)
+        assert_is_none(cache_status)
+
+    def test_unchanged_listing_saves_nothing(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        with mock.patch.object(settings, 'WATERBUTLER_METADATA_CACHE_ENABLED', False):
+            self.app.get(self.url, auth=self.user.auth)
+            with count_queries() as counter:
+                self.app.get(self.url, auth=self.user.auth)
+        writes = [query for query in counter.queries if query[0] == 'storedfilenode' and query[1] != 'find']
+        assert_equal(writes, [])
+
+    def test_changed_files_are_saved(self):
+        prepare_mock_wb_response(node=self.project, files=self.files)
+        with mock.patch.object(settings, 'WATERBUTLER_METADATA_CACHE_ENABLED', False):
+            self.app.get(self.url, auth=self.user.auth)
+            prepare_mock_wb_response(node=self.project, files=[dict(self.files[0], etag='b2'), self.files[1]])
+            with count_queries() as counter:
+                res = self.app.get(self.url, auth=self.user.auth)
+        writes = [query for query in counter.queries if query[0] == 'storedfilenode' and query[1] != 'find']
+        assert_equal(len(writes), 1)
+        assert_equal(self.names(res), ['dir', 'one'])
@@ -19,7 +19,10 @@ from tests.factories import (
     AuthUserFactory,
     UserFactory,
     PreprintFactory,
+    NodeFactory,
+    CommentFactory,
 )
+from tests.utils import count_queries
 
 
 class TestNodeList(ApiTestCase):
@@ -1963,3 +1966,64 @@ class TestNodeListPagination(ApiTestCase):
 
         assert_not_in('{}-{}'.format(res.json['data'][0]['id'], self.users[10]._id), uids)
         assert_equal(res.json['data'][0]['embeds']['contributors']['links']['meta']['per_page'], 10)
+
+
+class TestNodeListRelatedCounts(ApiTestCase):
+
+    def setUp(self):
+        super(TestNodeListRelatedCounts, self).setUp()
+        self.user = AuthUserFactory()
+        self.commenter = AuthUserFactory()
+        self.linked = ProjectFactory(is_public=True, title='Linked')
+        self.projects = []
+        for _ in range(4):
+            project = ProjectFactory(is_public=True, creator=self.user, title='Counted')
+            NodeFactory(parent=project, creator=self.user, is_public=True, title='Component')
+            project.add_pointer(self.linked, auth=Auth(self.user))
+            project.add_contributor(self.commenter, auth=Auth(self.user), save=True)
+            CommentFactory(node=project, user=self.commenter)
+            self.projects.append(project)
+        self.url = '/{}nodes/?filter[title]=Counted&related_counts=true'.format(API_BASE)
+
+    def tearDown(self):
+        super(TestNodeListRelatedCounts, self).tearDown()
+        Node.remove()
+
+    def get_related_meta(self, data, field):
+        return data['relationships'][field]['links']['related']['meta']
+
+    def test_related_counts(self):
+        res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(len(res.json['data']), 4)
+        for data in res.json['data']:
+            project = Node.load(data['id'])
+            assert_equal(self.get_related_meta(data, 'children')['count'], 1)
+            assert_equal(self.get_related_meta(data, 'linked_nodes')['count'], 1)
+            assert_equal(self.get_related_meta(data, 'registrations')['count'], 0)
+            assert_equal(self.get_related_meta(data, 'contributors')['count'], 2)
+            assert_equal(self.get_related_meta(data, 'logs')['count'], len(project.logs))
+            assert_equal(self.get_related_meta(data, 'comments')['unread'], {'node': 1})
+
+    def test_related_counts_match_node_detail(self):
+        res = self.app.get(self.url, auth=self.user.auth)
+        for data in res.json['data']:
+            detail = self.app.get(
+                '/{}nodes/{}/?related_counts=true'.format(API_BASE, data['id']),
+                auth=self.user.auth
+            ).json['data']
+            for field in ('children', 'linked_nodes', 'registrations', 'contributors', 'logs', 'comments'):
+                assert_equal(self.get_related_meta(data, field), self.get_related_meta(detail, field))
+
+    def count_related_counts_queries(self, page_size):
+        """Queries added by related counts to a page of `page_size` nodes"""
+        counts = {}
+        for related_counts in ('true', 'false'):
+            url = '/{}nodes/?filter[title]=Counted&related_counts={}&page[size]={}'.format(API_BASE, related_counts, page_size)
+            self.app.get(url, auth=self.user.auth)  # warm up caches
+            with count_queries() as counter:
+                self.app.get(url, auth=self.user.auth)
+            counts[related_counts] = counter.count
+        return counts['true'] - counts['false']
+
+    def test_related_counts_queries_do_not_grow_with_page_size(self):
+        assert_equal(self.count_related_counts_queries(4), self.count_related_counts_queries(2))
@@ -20,8 +20,10 @@ from tests.factories import (
     AuthUserFactory,
     CollectionFactory,
     BookmarkCollectionFactory,
-    DraftRegistrationFactory
+    DraftRegistrationFactory,
+    NodeFactory,
 )
+from tests.utils import count_queries
 
 
 class TestRegistrationList(ApiTestCase):
@@ -83,6 +85,46 @@ class TestRegistrationList(ApiTestCase):
         assert_not_in(self.public_project._id, ids)
         assert_not_in(self.project._id, ids)
 
+
+class TestRegistrationListRelatedCounts(ApiTestCase):
+
+    def setUp(self):
+        super(TestRegistrationListRelatedCounts, self).setUp()
+        self.user = AuthUserFactory()
+        self.registrations = []
+        for _ in range(4):
+            project = ProjectFactory(is_public=True, creator=self.user, title='Counted')
+            NodeFactory(parent=project, creator=self.user, is_public=True, title='Component')
+            self.registrations.append(RegistrationFactory(creator=self.user, project=project, is_public=True))
+        self.url = '/{}registrations/?filter[title]=Counted&related_counts=true'.format(API_BASE)
+
+    def tearDown(self):
+        super(TestRegistrationListRelatedCounts, self).tearDown()
+        Node.remove()
+
+    def test_related_counts(self):
+        res = self.app.get(self.url, auth=self.user.auth)
+        assert_equal(len(res.json['data']), 4)
+        for data in res.json['data']:
+            registration = Node.load(data['id'])
+            assert_equal(data['relationships']['children']['links']['related']['meta']['count'], 1)
+            assert_equal(data['relationships']['logs']['links']['related']['meta']['count'], len(registration.logs))
+
+    def count_related_counts_queries(self, page_size):
+        """Queries added by related counts to a page of `page_size` registrations"""
+        counts = {}
+        for related_counts in ('true', 'false'):
+            url = '/{}registrations/?filter[title]=Counted&related_counts={}&page[size]={}'.format(API_BASE, related_counts, page_size)
+            self.app.get(url, auth=self.user.auth)  # warm up caches
+            with count_queries() as counter:
+                self.app.get(url, auth=self.user.auth)
+            counts[related_counts] = counter.count
+        return counts['true'] - counts['false']
+
+    def test_related_counts_queries_do_not_grow_with_page_size(self):
+        assert_equal(self.count_related_counts_queries(4), self.count_related_counts_queries(2))
+
+
 class TestRegistrationFiltering(ApiTestCase):
 
     def setUp(self):
@@ -6,6 +6,8 @@ from datetime import datetime
 
 from dateutil import parser
 
+from framework.analytics import counter_buffer
+from framework.analytics.visits import record_visit
 from framework.mongo import database
 from framework.postcommit_tasks.handlers import run_postcommit
 from framework.sessions import session
@@ -29,12 +31,7 @@ def increment_user_activity_counters(user_id, action, date_string, db=None):
             'action.{0}.date.{1}'.format(action, date): 1,
         }
     }
-    collection.update(
-        {'_id': user_id},
-        query,
-        upsert=True,
-        manipulate=False,
-    )
+    counter_buffer.increment(collection, user_id, query['$inc'])
     return True
 
 
@@ -44,9 +41,10 @@ def get_total_activity_count(user_id, db=None):
     result = collection.find_one(
         {'_id': user_id}, {'total': 1}
     )
+    total = counter_buffer.pending(collection, user_id).get('total', 0)
     if result and 'total' in result:
-        return result['total']
-    return 0
+        total += result['total']
+    return total
 
 
 def clean_page(page):
@@ -91,31 +89,14 @@ def update_counter(page, node_info=None, db=None):
 
     d = {'$inc': {}}
 
-    visited_by_date = session.data.get('visited_by_date')
-    if not visited_by_date:
-        visited_by_date = {'date': date, 'pages': []}
+    first_visit, first_visit_today = record_visit(session.data, page, date)
 
-    if date == visited_by_date['date']:
-        if page not in visited_by_date['pages']:
-            d['$inc']['date.%s.unique' % date] = 1
-            visited_by_date['pages'].append(page)
-            session.data['visited_by_date'] = visited_by_date
-    else:
-        visited_by_date['date'] = date
-        visited_by_date['pages'] = []
+    if first_visit_today:
         d['$inc']['date.%s.unique' % date] = 1
-        visited_by_date['pages'].append(page)
-        session.data['visited_by_date'] = visited_by_date
-
     d['$inc']['date.%s.total' % date] = 1
 
-    visited = session.data.get('visited')  # '/project/x/, project/y/'
-    if not visited:
-        visited = []
-    if page not in visited:
+    if first_visit:
         d['$inc']['unique'] = 1
-        visited.append(page)
-        session.data['visited'] = visited
     d['$inc']['total'] = 1
 
     # If a download counter is being updated, only perform the update
@@ -128,7 +109,7 @@ def update_counter(page, node_info=None, db=None):
             d['$inc']['unique'] = 0
             d['$inc']['total'] = 0
 
-    collection.update({'_id': page}, d, True, False)
+    counter_buffer.increment(collection, page, d['$inc'])
 
 def update_counters(rex, node_info=None, db=None):
     """Create a decorator that updates analytics in `pagecounters` when the
@@ -155,15 +136,18 @@ def get_basic_counters(page, db=None):
     unique = 0
     total = 0
     collection = database['pagecounters']
+    page = clean_page(page)
     result = collection.find_one(
-        {'_id': clean_page(page)},
+        {'_id': page},
         {'total': 1, 'unique': 1}
     )
-    if result:
-        if 'unique' in result:
+    # Views recorded by this process that have not been flushed yet
+    pending = counter_buffer.pending(collection, page)
+    if result or pending:
+        if result and 'unique' in result:
             unique = result['unique']
-        if 'total' in result:
+        if result and 'total' in result:
             total = result['total']
-        return unique, total
+        return unique + pending.get('unique', 0), total + pending.get('total', 0)
     else:
         return None, None
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""In-process aggregation of counter increments.
+
+Every tracked page view used to be its own `$inc` upsert, so popular pages
+and downloads meant a stream of writes to the same few documents. Increments
+are instead merged per document in a `CounterBuffer` and written out by a
+background thread every `ANALYTICS_BUFFER_FLUSH_INTERVAL` seconds (or as soon
+as `ANALYTICS_BUFFER_MAX_KEYS` documents are pending), one write per document
+per flush. Readers add the increments still pending in their process to what
+is stored, so counts read in the process that recorded a view include it.
+
+With `ANALYTICS_BUFFER_FLUSH_ON_EXIT` pending increments are written when the
+process exits; without it, at most one flush interval of counts can be lost.
+"""
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from framework import metrics
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer(object):
+
+    def __init__(self, flush_interval=None, max_keys=None):
+        self.flush_interval = flush_interval or settings.ANALYTICS_BUFFER_FLUSH_INTERVAL
+        self.max_keys = max_keys or settings.ANALYTICS_BUFFER_MAX_KEYS
+        self._pending = {}
+        self._collections = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self.stats = {
+            'increments': 0,
+            'writes': 0,
+            'flushes': 0,
+            'failures': 0,
+        }
+
+    def increment(self, collection, key, increments):
+        """Add `increments`, a dict of field => amount, to the document `key` of
+        `collection`.
+        """
+        with self._lock:
+            self._collections[collection.full_name] = collection
+            pending = self._pending.setdefault((collection.full_name, key), defaultdict(int))
+            for field, amount in increments.items():
+                if amount:
+                    pending[field] += amount
+            self.stats['increments'] += 1
+            full = len(self._pending) >= self.max_keys
+        if full:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def pending(self, collection, key):
+        """The increments of document `key` that have not been written yet."""
+        with self._lock:
+            return dict(self._pending.get((collection.full_name, key), {}))
+
+    def flush(self):
+        """Write all pending increments, one update per document.
+
+        :return int: number of documents written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            collections = dict(self._collections)
+        if not pending:
+            return 0
+
+        by_collection = defaultdict(list)
+        for (name, key), increments in pending.items():
+            if increments:
+                by_collection[name].append((key, increments))
+
+        written = 0
+        for name, updates in by_collection.items():
+            try:
+                self._write(collections[name], updates)
+                written += len(updates)
+            except Exception as error:
+                logger.exception(error)
+                self.stats['failures'] += 1
+                # Keep the counts and try again on the next flush
+                with self._lock:
+                    for key, increments in updates:
+                        merged = self._pending.setdefault((name, key), defaultdict(int))
+                        for field, amount in increments.items():
+                            merged[field] += amount
+        self.stats['writes'] += written
+        self.stats['flushes'] += 1
+        return written
+
+    def _write(self, collection, updates):
+        if hasattr(collection, 'initialize_unordered_bulk_op'):
+            bulk = collection.initialize_unordered_bulk_op()
+            for key, increments in updates:
+                bulk.find({'_id': key}).upsert().update({'$inc': dict(increments)})
+            bulk.execute()
+        else:
+            # pymongo < 2.7 has no bulk API
+            for key, increments in updates:
+                collection.update({'_id': key}, {'$inc': dict(increments)}, upsert=True, manipulate=False)
+
+    def _ensure_flusher(self):
+        # A forked worker does not inherit the flushing thread of its parent
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        thread = threading.Thread(target=self._run_flusher, name='counter-buffer-flusher')
+        thread.daemon = True
+        thread.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as error:
+                logger.exception(error)
+
+
+counter_buffer = CounterBuffer()
+metrics.register('analytics_counter_buffer', lambda: dict(counter_buffer.stats, pending=len(counter_buffer._pending)))
+
+
+def increment(collection, key, increments):
+    """Increment the counters of document `key` of `collection`, buffered if
+    `ANALYTICS_BUFFER_ENABLED` is set.
+    """
+    if settings.ANALYTICS_BUFFER_ENABLED:
+        counter_buffer.increment(collection, key, increments)
+    else:
+        collection.update({'_id': key}, {'$inc': increments}, upsert=True, manipulate=False)
+
+
+def pending(collection, key):
+    if not settings.ANALYTICS_BUFFER_ENABLED:
+        return {}
+    return counter_buffer.pending(collection, key)
+
+
+@atexit.register
+def _flush_on_exit():
+    if settings.ANALYTICS_BUFFER_ENABLED and settings.ANALYTICS_BUFFER_FLUSH_ON_EXIT:
+        counter_buffer.flush()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Compact record of the pages a session has visited.
+
+Page counters count a visit as unique the first time a session sees a page,
+both overall and per day. Rather than keeping every page key in the session,
+which makes long-lived sessions grow with each page viewed, the visited pages
+are kept in fixed-size bloom filters stored as base64 strings: membership
+checks take constant time and the session document stays the same size no
+matter how many pages are visited. The price is a small chance of a page being
+taken for already visited, which slightly undercounts unique visits.
+"""
+import base64
+import hashlib
+import struct
+
+SESSION_KEY = 'visits'
+
+# Legacy session keys holding lists of visited pages
+LEGACY_VISITED_KEY = 'visited'
+LEGACY_VISITED_BY_DATE_KEY = 'visited_by_date'
+
+# 8192 bits (1 KiB) and four hashes keep false positives below 1% for the
+# first ~750 distinct pages of a session
+FILTER_BITS = 8192
+FILTER_HASHES = 4
+
+
+class VisitFilter(object):
+    """A bloom filter of page keys."""
+
+    def __init__(self, encoded=None, size=FILTER_BITS, hashes=FILTER_HASHES):
+        self.size = size
+        self.hashes = hashes
+        if encoded:
+            self.bits = bytearray(base64.b64decode(encoded))
+        else:
+            self.bits = bytearray(size // 8)
+
+    def _positions(self, page):
+        if isinstance(page, unicode):
+            page = page.encode('utf-8')
+        digest = hashlib.md5(page).digest()
+        # Double hashing: the i-th position is h1 + i * h2
+        h1, h2 = struct.unpack('<QQ', digest)
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, page):
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self._positions(page))
+
+    def add(self, page):
+        """Add `page` to the filter.
+
+        :return bool: whether `page` was (probably) not in the filter yet
+        """
+        added = False
+        for position in self._positions(page):
+            mask = 1 << (position % 8)
+            if not self.bits[position // 8] & mask:
+                self.bits[position // 8] |= mask
+                added = True
+        return added
+
+    def encode(self):
+        return base64.b64encode(bytes(self.bits))
+
+
+def record_visit(session_data, page, date):
+    """Record that the session visited `page` on `date`.
+
+    :param dict session_data: data of the current session, updated in place
+    :param str page: page key
+    :param str date: day of the visit, e.g. ``'2016/05/04'``
+    :return tuple: whether this is the session's first visit to the page
+        overall, and on `date`
+    """
+    visits = session_data.get(SESSION_KEY) or {}
+    visited = VisitFilter(visits.get('all'))
+    visited_today = VisitFilter(visits.get('today') if visits.get('date') == date else None)
+
+    # Fold the page lists of sessions started before the filters were introduced into them
+    for legacy_page in session_data.pop(LEGACY_VISITED_KEY, None) or []:
+        visited.add(legacy_page)
+    legacy_by_date = session_data.pop(LEGACY_VISITED_BY_DATE_KEY, None) or {}
+    if legacy_by_date.get('date') == date:
+        for legacy_page in legacy_by_date.get('pages') or []:
+            visited_today.add(legacy_page)
+
+    first_visit = visited.add(page)
+    first_visit_today = visited_today.add(page)
+
+    if first_visit or first_visit_today or visits.get('date') != date or SESSION_KEY not in session_data:
+        session_data[SESSION_KEY] = {
+            'all': visited.encode(),
+            'date': date,
+            'today': visited_today.encode(),
+        }
+    return first_visit, first_visit_today
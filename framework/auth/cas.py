@@ -1,18 +1,24 @@
 # -*- coding: utf-8 -*-
 
+import collections
 import furl
+import hashlib
 import httplib as http
 import json
+import threading
+import time
 import urllib
 
 from lxml import etree
 import requests
 
+from framework import metrics
 from framework.auth import User
 from framework.auth import authenticate, external_first_login_authenticate
 from framework.auth.core import get_user, generate_verification_key
 from framework.flask import redirect
 from framework.exceptions import HTTPError
+from framework.mongo import database
 from website import settings
 
 
@@ -185,11 +191,135 @@ class CasClient(object):
 
         resp = requests.post(url, data=payload)
         if resp.status_code == 204:
+            # Revoking the tokens of an application revokes every cached token;
+            # which tokens those are is only known to CAS
+            token_cache.revoke(payload.get('token'))
             return True
         else:
             self._handle_error(resp)
 
 
+def _revocations():
+    return database['castokenrevocations']
+
+
+# Key of the revocations of every token
+ALL_TOKENS = 'all'
+
+
+class TokenCache(object):
+    """Bounded cache of the profiles CAS returns for access tokens.
+
+    Profiles of valid tokens are kept for `CAS_TOKEN_CACHE_TTL` seconds and
+    tokens CAS rejects for `CAS_TOKEN_CACHE_NEGATIVE_TTL` seconds, up to
+    `CAS_TOKEN_CACHE_SIZE` tokens per process, least recently used first out.
+    Tokens are keyed by their hash.
+
+    Revoking a token, or the tokens of an application, bumps a version in
+    `castokenrevocations`, for the token or for every token. A profile is
+    cached along with the versions current when it was fetched and is only
+    served while they are unchanged, so that every process stops trusting a
+    token as soon as it is revoked.
+    """
+
+    def __init__(self):
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(access_token):
+        if isinstance(access_token, unicode):
+            access_token = access_token.encode('utf-8')
+        return hashlib.sha256(access_token).hexdigest()
+
+    def get_versions(self, access_token):
+        """Return the revocation versions of `access_token` and of every token"""
+        key = self._key(access_token)
+        versions = {
+            each['_id']: each.get('version', 0)
+            for each in _revocations().find({'_id': {'$in': [key, ALL_TOKENS]}})
+        }
+        return versions.get(key, 0), versions.get(ALL_TOKENS, 0)
+
+    def get(self, access_token, versions):
+        """Return the cached ``(profile, error)`` of `access_token` if it was
+        cached under the revocation `versions`, or None
+        """
+        key = self._key(access_token)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] < time.time() or entry[1] != versions:
+                self.stats['misses'] += 1
+                return None
+            self._entries[key] = entry  # Most recently used
+            self.stats['negative_hits' if entry[3] else 'hits'] += 1
+            return entry[2:]
+
+    def set(self, access_token, versions, profile=None, error=None):
+        ttl = settings.CAS_TOKEN_CACHE_NEGATIVE_TTL if error or not profile.authenticated else settings.CAS_TOKEN_CACHE_TTL
+        with self._lock:
+            self._entries.pop(self._key(access_token), None)
+            self._entries[self._key(access_token)] = (time.time() + ttl, versions, profile, error)
+            while len(self._entries) > settings.CAS_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def revoke(self, access_token=None):
+        """Stop every process from serving `access_token`, or every token if None"""
+        key = self._key(access_token) if access_token else ALL_TOKENS
+        _revocations().update({'_id': key}, {'$inc': {'version': 1}}, upsert=True)
+        if access_token:
+            self.invalidate(access_token)
+        else:
+            self.clear()
+
+    def invalidate(self, access_token):
+        with self._lock:
+            if self._entries.pop(self._key(access_token), None):
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+
+    def get_status(self):
+        return dict(self.stats, size=len(self))
+
+
+token_cache = TokenCache()
+metrics.register('cas_token_cache', token_cache.get_status)
+
+
+def get_profile(access_token):
+    """Return the CAS profile of `access_token`, from the token cache when
+    enabled. Raises `CasHTTPError` like `CasClient.profile`.
+    """
+    if not settings.CAS_TOKEN_CACHE_ENABLED:
+        return get_client().profile(access_token)
+    # Read before asking CAS, so that a revocation made meanwhile isn't missed
+    versions = token_cache.get_versions(access_token)
+    cached = token_cache.get(access_token, versions)
+    if cached:
+        profile, error = cached
+        if error:
+            raise error
+        return profile
+    try:
+        profile = get_client().profile(access_token)
+    except CasHTTPError as error:
+        # Only remember tokens CAS rejected, not its failures
+        if 400 <= error.code < 500:
+            token_cache.set(access_token, versions, error=error)
+        raise
+    token_cache.set(access_token, versions, profile=profile)
+    return profile
+
+
 def parse_auth_header(header):
     """
     Given an Authorization header string, e.g. 'Bearer abc123xyz',
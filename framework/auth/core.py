@@ -2,12 +2,10 @@
 
 from copy import deepcopy
 import datetime as dt
-import itertools
 import logging
 import re
 import urlparse
 
-import bson
 import pytz
 import itsdangerous
 
@@ -1364,31 +1362,44 @@ class User(GuidStoredObject, AddonModelMixin):
         watched_node_ids = set([config.node._id for config in self.watched])
         return node._id in watched_node_ids
 
-    def get_recent_log_ids(self, since=None):
+    def get_recent_log_ids(self, since=None, start=0, limit=None):
         '''Return a generator of recent logs' ids.
 
+        Logs of every watched node are read with one query on the node and date
+        index, sorted in reverse chronological order by the database, and are
+        fetched from the database as the generator is consumed.
+
         :param since: A datetime specifying the oldest time to retrieve logs
         from. If ``None``, defaults to 60 days before today. Must be a tz-aware
-        datetime because PyMongo's generation times are tz-aware.
+        datetime.
+        :param int start: Number of the most recent logs to skip
+        :param int limit: Maximum number of log ids to return
 
         :rtype: generator of log ids (strings)
         '''
-        log_ids = []
+        from website.project.model import NodeLog, WatchConfig
+
         # Default since to 60 days before today if since is None
         # timezone aware utcnow
         utcnow = dt.datetime.utcnow().replace(tzinfo=pytz.utc)
         since_date = since or (utcnow - dt.timedelta(days=60))
-        for config in self.watched:
-            # Extract the timestamps for each log from the log_id (fast!)
-            # The first 4 bytes of Mongo's ObjectId encodes time
-            # This prevents having to load each Log Object and access their
-            # date fields
-            node_log_ids = [log.pk for log in config.node.logs
-                                   if bson.ObjectId(log.pk).generation_time > since_date and
-                                   log.pk not in log_ids]
-            # Log ids in reverse chronological order
-            log_ids = _merge_into_reversed(log_ids, node_log_ids)
-        return (l_id for l_id in log_ids)
+        watched_node_ids = [
+            config['node']
+            for config in WatchConfig._storage[0].store.find(
+                {'_id': {'$in': self.watched._to_primary_keys()}},
+                {'node': True},
+            )
+            if config.get('node')
+        ]
+        if not watched_node_ids:
+            return (l_id for l_id in [])
+        cursor = NodeLog._storage[0].store.find(
+            {'node': {'$in': watched_node_ids}, 'date': {'$gt': since_date}},
+            {'_id': True},
+        ).sort('date', -1).skip(start).batch_size(settings.LOG_FEED_BATCH_SIZE)
+        if limit:
+            cursor = cursor.limit(limit)
+        return (log['_id'] for log in cursor)
 
     def get_daily_digest_log_ids(self):
         '''Return a generator of log ids generated in the past day
@@ -1626,9 +1637,3 @@ class User(GuidStoredObject, AddonModelMixin):
         """
         default_timestamp = dt.datetime(1970, 1, 1, 12, 0, 0)
         return self.comments_viewed_timestamp.get(target_id, default_timestamp)
-
-
-def _merge_into_reversed(*iterables):
-    '''Merge multiple sorted inputs into a single output in reverse order.
-    '''
-    return sorted(itertools.chain(*iterables), reverse=True)
@@ -1,8 +1,10 @@
-import smtplib
 import logging
+import time
 from email.mime.text import MIMEText
+from multiprocessing.pool import ThreadPool
 
 from framework.celery_tasks import app
+from framework.email import transport
 from website import settings
 import sendgrid
 
@@ -32,6 +34,58 @@ def send_email(from_addr, to_addr, subject, message, mimetype='html', ttls=True,
     """
     if not settings.USE_EMAIL:
         return
+    start = time.time()
+    try:
+        sent = _send(from_addr, to_addr, subject, message, mimetype=mimetype, ttls=ttls, login=login,
+                     username=username, password=password, categories=categories)
+    except Exception:
+        transport.record(failed=1, seconds=time.time() - start)
+        raise
+    if sent:
+        transport.record(sent=1, seconds=time.time() - start)
+    else:
+        transport.record(failed=1, seconds=time.time() - start)
+    return sent
+
+
+@app.task
+def send_emails(messages):
+    """Send many emails at once, up to `MAIL_SEND_CONCURRENCY` at a time on
+    pooled connections. A message that fails does not stop the others.
+
+    :param list messages: Dicts of the keyword arguments of `send_email`
+    :return list: For each message, True if it was sent
+    """
+    return send_many(messages)
+
+
+def send_many(messages):
+    """Send `messages`, dicts of the keyword arguments of `send_email`, and
+    return whether each one was sent.
+    """
+    messages = list(messages)
+    if not settings.USE_EMAIL or not messages:
+        return [None] * len(messages)
+    workers = min(settings.MAIL_SEND_CONCURRENCY, len(messages))
+    if workers <= 1:
+        return [_send_safely(message) for message in messages]
+    pool = ThreadPool(workers)
+    try:
+        return pool.map(_send_safely, messages)
+    finally:
+        pool.close()
+
+
+def _send_safely(message):
+    try:
+        return bool(send_email(**message))
+    except Exception as error:
+        logger.exception(error)
+        return False
+
+
+def _send(from_addr, to_addr, subject, message, mimetype='html', ttls=True, login=True,
+          username=None, password=None, categories=None):
     if settings.SENDGRID_API_KEY:
         return _send_with_sendgrid(
             from_addr=from_addr,
@@ -67,23 +121,19 @@ def _send_with_smtp(from_addr, to_addr, subject, message, mimetype='html', ttls=
     msg['From'] = from_addr
     msg['To'] = to_addr
 
-    s = smtplib.SMTP(settings.MAIL_SERVER)
-    s.ehlo()
-    if ttls:
-        s.starttls()
-        s.ehlo()
-    if login:
-        s.login(username, password)
-    s.sendmail(
+    transport.smtp_pool.sendmail(
         from_addr=from_addr,
         to_addrs=[to_addr],
-        msg=msg.as_string()
+        msg=msg.as_string(),
+        ttls=ttls,
+        login=login,
+        username=username,
+        password=password,
     )
-    s.quit()
     return True
 
 def _send_with_sendgrid(from_addr, to_addr, subject, message, mimetype='html', categories=None, client=None):
-    client = client or sendgrid.SendGridClient(settings.SENDGRID_API_KEY)
+    client = client or transport.get_sendgrid_client()
     mail = sendgrid.Mail()
     mail.set_from(from_addr)
     mail.add_to(to_addr)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Connections used to deliver mail, shared by every send of a process.
+
+Opening an SMTP connection takes an EHLO, a STARTTLS handshake and a LOGIN, so
+authenticated connections are kept in `smtp_pool` and reused by later sends,
+up to `MAIL_SMTP_POOL_SIZE` connections at once per process and at most
+`MAIL_SMTP_MAX_MESSAGES` messages per connection. A connection the server has
+dropped is replaced and the message sent again once. The SendGrid client is
+built once per API key.
+"""
+import contextlib
+import smtplib
+import socket
+import threading
+
+import sendgrid
+
+from framework import metrics
+from website import settings
+
+# Errors after which a connection can not be used anymore
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.error)
+
+stats = {
+    'sent': 0,
+    'failed': 0,
+    'connections_opened': 0,
+    'reconnects': 0,
+    'seconds': 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def record(**increments):
+    with _stats_lock:
+        for key, value in increments.items():
+            stats[key] += value
+
+
+class SMTPConnectionPool(object):
+    """Pool of open SMTP connections, keyed by server and credentials"""
+
+    def __init__(self, size):
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(connections) for connections in self._idle.values())
+
+    def _connect(self, server, ttls, login, username, password):
+        connection = smtplib.SMTP(server, timeout=settings.MAIL_SMTP_TIMEOUT)
+        connection.ehlo()
+        if ttls:
+            connection.starttls()
+            connection.ehlo()
+        if login:
+            connection.login(username, password)
+        connection.messages_sent = 0
+        record(connections_opened=1)
+        return connection
+
+    @contextlib.contextmanager
+    def connection(self, ttls=True, login=True, username=None, password=None):
+        """Yield an open connection to `MAIL_SERVER`, returning it to the pool
+        afterwards unless it failed or has sent `MAIL_SMTP_MAX_MESSAGES`.
+        """
+        key = (settings.MAIL_SERVER, ttls, login, username, password)
+        with self._slots:
+            with self._lock:
+                idle = self._idle.get(key)
+                connection = idle.pop() if idle else None
+            if connection is None:
+                connection = self._connect(settings.MAIL_SERVER, ttls, login, username, password)
+            try:
+                yield connection
+            except CONNECTION_ERRORS:
+                close(connection)
+                raise
+            except Exception:
+                # e.g. refused recipients; the connection is still usable
+                self._release(key, connection)
+                raise
+            self._release(key, connection)
+
+    def _release(self, key, connection):
+        if connection.messages_sent >= settings.MAIL_SMTP_MAX_MESSAGES:
+            close(connection)
+        else:
+            with self._lock:
+                self._idle.setdefault(key, []).append(connection)
+
+    def sendmail(self, from_addr, to_addrs, msg, **credentials):
+        """Send `msg` on a pooled connection, on a new one if the pooled
+        connection turns out to be closed.
+        """
+        for attempt in range(2):
+            try:
+                with self.connection(**credentials) as connection:
+                    connection.sendmail(from_addr=from_addr, to_addrs=to_addrs, msg=msg)
+                    connection.messages_sent += 1
+                    return
+            except CONNECTION_ERRORS:
+                if attempt:
+                    raise
+                record(reconnects=1)
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                close(connection)
+
+
+def close(connection):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, socket.error):
+        connection.close()
+
+
+smtp_pool = SMTPConnectionPool(settings.MAIL_SMTP_POOL_SIZE)
+
+_sendgrid_clients = {}
+
+
+def get_sendgrid_client():
+    """The SendGrid client of `SENDGRID_API_KEY`"""
+    api_key = settings.SENDGRID_API_KEY
+    if api_key not in _sendgrid_clients:
+        _sendgrid_clients[api_key] = sendgrid.SendGridClient(api_key)
+    return _sendgrid_clients[api_key]
+
+
+def get_status():
+    status = dict(stats, idle_connections=len(smtp_pool))
+    status['messages_per_second'] = round(stats['sent'] / stats['seconds'], 2) if stats['seconds'] else None
+    return status
+
+
+metrics.register('mail_transport', get_status)
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""Registry of in-process counters exposed by the status endpoint."""
+
+_providers = {}
+
+
+def register(name, provider):
+    """Register `provider`, a callable returning a JSON-serializable dict, to
+    be reported under `name`.
+    """
+    _providers[name] = provider
+
+
+def get_metrics():
+    return {
+        name: provider()
+        for name, provider in _providers.items()
+    }
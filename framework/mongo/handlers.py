@@ -1,64 +1,171 @@
 # -*- coding: utf-8 -*-
 
+import time
 import logging
 import threading
+import weakref
 
 import pymongo
 from werkzeug.local import LocalProxy
 
+from framework import metrics
 from website import settings
 
+try:
+    import greenlet
+except ImportError:  # pragma: no cover
+    greenlet = None
+
 
 logger = logging.getLogger(__name__)
 
 
+def _gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:  # pragma: no cover
+        return False
+    return 'threading' in getattr(monkey, 'saved', {})
+
+
 class ClientPool(object):
+    """Process-wide MongoDB client pool.
+
+    A single `MongoClient` (and so a single socket pool) is shared by the whole
+    process. Each thread or greenlet that acquires the pool gets a lease, which
+    pins one socket to it with `MongoClient.start_request` so that TokuMX
+    transactions always run over the same connection. At most `max_clients`
+    leases may be held at once; further callers wait up to `wait_timeout`
+    seconds before `PoolExhaustedError` is raised. Leases held by greenlets or
+    threads that die without releasing are reclaimed when those are collected,
+    and sockets are dropped once the pool has been idle for `idle_timeout`
+    seconds.
+    """
 
     class ExtraneousReleaseError(Exception):
         message = 'no cached connection to release'
 
+    class PoolExhaustedError(Exception):
+        message = 'timed out waiting for a database connection'
+
     @property
     def thread_id(self):
-        return threading.current_thread().ident
-
-    def __init__(self, MAX_CLIENTS=100):
-        self._max_clients = MAX_CLIENTS
-        self._cache, self._local = [], {}
-        self._sem = threading.BoundedSemaphore(MAX_CLIENTS)
+        if greenlet is not None:
+            return greenlet.getcurrent()
+        return threading.current_thread()
+
+    def __init__(self, MAX_CLIENTS=None, wait_timeout=None, idle_timeout=None):
+        self._max_clients = MAX_CLIENTS or settings.DB_POOL_SIZE
+        self._wait_timeout = wait_timeout if wait_timeout is not None else settings.DB_POOL_WAIT_TIMEOUT
+        self._idle_timeout = idle_timeout if idle_timeout is not None else settings.DB_POOL_IDLE_TIMEOUT
+        self._client = None
+        self._local = {}
+        self._in_use = 0
+        self._idle_since = time.time()
+        self._cond = threading.Condition(threading.RLock())
+        self.stats = {
+            'acquired': 0,
+            'acquire_wait_total': 0.0,
+            'acquire_wait_max': 0.0,
+            'exhausted': 0,
+            'reclaimed': 0,
+            'evicted': 0,
+        }
 
     def acquire(self, _id=None):
-        _id = _id or self.thread_id
-
-        if _id not in self._local:
-            self._sem.acquire()
-            self._local[_id] = self._get_client()
-        return self._local[_id]
+        owner = _id or self.thread_id
+        key = id(owner)
+        lease = self._local.get(key)
+        if lease is not None and lease[1]() is owner:
+            return lease[0]
+
+        start = time.time()
+        with self._cond:
+            while self._in_use >= self._max_clients:
+                remaining = self._wait_timeout - (time.time() - start)
+                if remaining <= 0:
+                    self.stats['exhausted'] += 1
+                    logger.error('MongoDB client pool exhausted: {} clients in use'.format(self._in_use))
+                    raise ClientPool.PoolExhaustedError
+                self._cond.wait(remaining)
+            self._evict_if_idle()
+            self._in_use += 1
+            waited = time.time() - start
+            self.stats['acquired'] += 1
+            self.stats['acquire_wait_total'] += waited
+            self.stats['acquire_wait_max'] = max(self.stats['acquire_wait_max'], waited)
+
+        client = self._get_client()
+        client.start_request()
+        # Give the slot back if the greenlet or thread goes away without releasing
+        self._local[key] = (client, weakref.ref(owner, lambda ref: self._reclaim(key)))
+        return client
 
     def release(self, _id=None):
         try:
-            self._cache.append(self._local.pop(_id or self.thread_id))
-            self._sem.release()
+            client, _ = self._local.pop(id(_id or self.thread_id))
         except KeyError:
             raise ClientPool.ExtraneousReleaseError
-
-    def transfer(self, to, from_):
-        self._local[to] = self._local.pop(from_ or self.thread_id)
+        client.end_request()
+        self._return_slot()
+
+    def _reclaim(self, key):
+        if self._local.pop(key, None) is not None:
+            self.stats['reclaimed'] += 1
+            self._return_slot()
+
+    def _return_slot(self):
+        with self._cond:
+            self._in_use -= 1
+            if not self._in_use:
+                self._idle_since = time.time()
+            self._cond.notify()
+
+    def _evict_if_idle(self):
+        if self._client is not None and not self._in_use and time.time() - self._idle_since > self._idle_timeout:
+            self.stats['evicted'] += 1
+            self._client.disconnect()
 
     def _get_client(self):
-        try:
-            return self._cache.pop(0)
-        except IndexError:
-            pass
-        logger.warning('Creating new client instance. {} instances initialized.'.format(self._max_clients - self._sem._Semaphore__value))
-        client = pymongo.MongoClient(settings.DB_HOST, settings.DB_PORT, max_pool_size=1)
-        db = client[settings.DB_NAME]
-
-        if settings.DB_USER and settings.DB_PASS:
-            db.authenticate(settings.DB_USER, settings.DB_PASS)
-        return client
+        if self._client is not None:
+            return self._client
+        with self._cond:
+            if self._client is None:
+                logger.info('Creating MongoDB client with a pool of {} connections'.format(self._max_clients))
+                client = pymongo.MongoClient(
+                    settings.DB_HOST,
+                    settings.DB_PORT,
+                    max_pool_size=self._max_clients,
+                    use_greenlets=_gevent_patched(),
+                )
+                db = client[settings.DB_NAME]
+
+                if settings.DB_USER and settings.DB_PASS:
+                    db.authenticate(settings.DB_USER, settings.DB_PASS)
+                self._client = client
+        return self._client
+
+    def reset(self):
+        """Forget the client and all leases, e.g. in a freshly forked process
+        that must not share sockets with its parent.
+        """
+        with self._cond:
+            self._client = None
+            self._local = {}
+            self._in_use = 0
+
+    def get_status(self):
+        acquired = self.stats['acquired']
+        return dict(
+            self.stats,
+            size=self._max_clients,
+            in_use=self._in_use,
+            acquire_wait_mean=self.stats['acquire_wait_total'] / acquired if acquired else 0.0,
+        )
 
 
 CLIENT_POOL = ClientPool()
+metrics.register('mongo_client_pool', CLIENT_POOL.get_status)
 
 
 def connection_before_request():
@@ -38,6 +38,17 @@ def postcommit_celery_task_wrapper(queue):
     # http://stackoverflow.com/questions/34177131/how-to-solve-python-celery-error-when-using-chain-encodeerrorruntimeerrormaxi?answertab=votes#tab-top
     chain(*queue.values()).apply()
 
+def release_connection_after(func):
+    # Hand the greenlet's database lease back to the pool as soon as it is done
+    from framework.mongo.handlers import CLIENT_POOL, ClientPool
+    try:
+        func()
+    finally:
+        try:
+            CLIENT_POOL.release()
+        except ClientPool.ExtraneousReleaseError:
+            pass
+
 def postcommit_after_request(response, base_status_error_code=500):
     if response.status_code >= base_status_error_code:
         _local.postcommit_queue = OrderedDict()
@@ -48,7 +59,7 @@ def postcommit_after_request(response, base_status_error_code=500):
             number_of_threads = 30  # one db connection per greenlet, let's share
             pool = Pool(number_of_threads)
             for func in postcommit_queue().values():
-                pool.spawn(func)
+                pool.spawn(release_connection_after, func)
             pool.join(timeout=5.0, raise_error=True)  # 5 second timeout and reraise exceptions
 
         if postcommit_celery_queue():
@@ -6,8 +6,10 @@ import httplib as http
 import json
 import logging
 import os
+import threading
+import time
 
-from flask import request, make_response
+from flask import _request_ctx_stack, request, make_response
 import lxml.html
 from mako.lookup import TemplateLookup
 from mako.template import Template
@@ -15,7 +17,7 @@ import markupsafe
 from werkzeug.exceptions import NotFound
 import werkzeug.wrappers
 
-from framework import sentry
+from framework import metrics, sentry
 from framework.exceptions import HTTPError
 from framework.flask import app, redirect
 from framework.sessions import session
@@ -303,6 +305,61 @@ def call_url(url, view_kwargs=None):
 
     return rv
 
+
+def call_url_memoized(url, view_kwargs=None):
+    """Like `call_url`, but call each view with the same kwargs only once per
+    request; embeds of a page often ask for the same URL.
+
+    Results are kept on the request context rather than on `g`, which lives
+    on the app context and is shared by every request pushed within one.
+
+    :return: 2-tuple: (<data from view function>, <flag: memoized>)
+    """
+    ctx = _request_ctx_stack.top
+    if ctx is None:
+        return call_url(url, view_kwargs=view_kwargs), False
+    results = getattr(ctx, 'call_url_results', None)
+    if results is None:
+        results = ctx.call_url_results = {}
+    key = (url, json.dumps(view_kwargs, sort_keys=True))
+    if key in results:
+        return results[key], True
+    results[key] = call_url(url, view_kwargs=view_kwargs)
+    return results[key], False
+
+
+# Timings of embedded templates rendered by this process
+embed_stats = {
+    'embeds': 0,
+    'memoized_calls': 0,
+    'fetch_seconds': 0.0,
+    'render_seconds': 0.0,
+}
+_embed_stats_lock = threading.Lock()
+
+
+def record_embed(timing):
+    """Add the `timing` of an embed to the timings of the current request, in
+    the `embed_timings` of its request context, and to `embed_stats`.
+    """
+    logger.debug(
+        'Rendered embed %s (%s) in %.4fs fetching and %.4fs rendering',
+        timing['tpl'], timing['uri'], timing['fetch'], timing['render'],
+    )
+    ctx = _request_ctx_stack.top
+    if ctx is not None:
+        if getattr(ctx, 'embed_timings', None) is None:
+            ctx.embed_timings = []
+        ctx.embed_timings.append(timing)
+    with _embed_stats_lock:
+        embed_stats['embeds'] += 1
+        embed_stats['memoized_calls'] += int(timing['memoized'])
+        embed_stats['fetch_seconds'] += timing['fetch']
+        embed_stats['render_seconds'] += timing['render']
+
+
+metrics.register('web_renderer_embeds', lambda: dict(embed_stats))
+
 ### Renderers ###
 
 class Renderer(object):
@@ -497,11 +554,13 @@ class WebRenderer(Renderer):
         render_data = copy.copy(data)
         render_data.update(kwargs)
 
+        timing = {'tpl': element_meta.get('tpl'), 'uri': uri, 'fetch': 0.0, 'render': 0.0, 'memoized': False}
         if uri:
             # Catch errors and return appropriate debug divs
             # todo: add debug parameter
+            start = time.time()
             try:
-                uri_data = call_url(uri, view_kwargs=view_kwargs)
+                uri_data, timing['memoized'] = call_url_memoized(uri, view_kwargs=view_kwargs)
                 render_data.update(uri_data)
             except NotFound:
                 return '<div>URI {} not found</div>'.format(markupsafe.escape(uri)), is_replace
@@ -513,7 +572,9 @@ class WebRenderer(Renderer):
                     uri,
                     repr(error)
                 ), is_replace
+            timing['fetch'] = time.time() - start
 
+        start = time.time()
         try:
             template_rendered = self._render(
                 render_data,
@@ -525,9 +586,45 @@ class WebRenderer(Renderer):
                 element_meta['tpl'],
                 repr(error)
             ), is_replace
+        # Includes the embeds of the embedded template
+        timing['render'] = time.time() - start
+        record_embed(timing)
 
         return template_rendered, is_replace
 
+    def render_elements(self, rendered, elements, data):
+        """Render the embedded templates `elements` of the HTML `rendered` and
+        splice them in with a single pass over `rendered`.
+
+        :param rendered: Rendered HTML
+        :param elements: The template embeds of `rendered`, in document order
+        :param data: Dictionary to be passed to the templates as context
+        :return: Rendered HTML with the embeds replaced or filled
+        """
+        pieces = []
+        position = 0
+        for element in elements:
+            original = lxml.html.tostring(element)
+            start = rendered.find(original, position)
+            if start == -1:
+                # Within an embed spliced in already
+                continue
+
+            # Render nested template
+            template_rendered, is_replace = self.render_element(element, data)
+
+            if is_replace:
+                replacement = template_rendered
+            else:
+                replacement = original.replace('><', '>' + template_rendered + '<')
+
+            pieces.append(rendered[position:start])
+            pieces.append(replacement)
+            position = start + len(original)
+
+        pieces.append(rendered[position:])
+        return ''.join(pieces)
+
     def _render(self, data, template_name=None):
         """Render output of view function to HTML.
 
@@ -557,19 +654,9 @@ class WebRenderer(Renderer):
 
         html = lxml.html.fragment_fromstring(rendered, create_parent='remove')
 
-        for element in html.findall('.//*[@mod-meta]'):
-
-            # Render nested template
-            template_rendered, is_replace = self.render_element(element, data)
-
-            original = lxml.html.tostring(element)
-            if is_replace:
-                replacement = template_rendered
-            else:
-                replacement = original
-                replacement = replacement.replace('><', '>' + template_rendered + '<')
-
-            rendered = rendered.replace(original, replacement)
+        elements = html.findall('.//*[@mod-meta]')
+        if elements:
+            rendered = self.render_elements(rendered, elements, data)
 
         ## Parse HTML using html5lib; lxml is too strict and e.g. throws
         ## errors if missing parent container; htmlparser mangles whitespace
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+import httplib as http
+
+from framework import metrics
+from framework.exceptions import HTTPError
+from website import settings
+
+
+def status_metrics():
+    """Report the in-process counters (connection pools, queues, caches) of
+    the worker serving the request.
+    """
+    if not settings.ENABLE_STATUS_METRICS:
+        raise HTTPError(http.NOT_FOUND)
+    return metrics.get_metrics()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks for hot paths. Each module can be run with
+``python -m scripts.benchmarks.<name>`` and prints a before/after comparison.
+"""
+import time
+import threading
+import contextlib
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+
+class Timer(object):
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+
+@contextlib.contextmanager
+def timed():
+    timer = Timer()
+    start = time.time()
+    try:
+        yield timer
+    finally:
+        timer.elapsed = time.time() - start
+
+
+def print_results(title, rows, headers):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    line = '  '.join('{{:<{}}}'.format(width) for width in widths)
+    print(title)
+    print(line.format(*headers))
+    for row in rows:
+        print(line.format(*row))
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubServer(object):
+    """Local HTTP server running in a background thread. `handler` is called
+    with the request handler for every request and must write the response.
+    Requests are counted by method in `self.counts`.
+    """
+
+    def __init__(self, handler, latency=0.0):
+        self.counts = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                with stub._lock:
+                    stub.counts[self.command] = stub.counts.get(self.command, 0) + 1
+                if latency:
+                    time.sleep(latency)
+                handler(self)
+
+            do_GET = do_POST = do_PUT = do_BAN = _handle
+
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def respond(request, status=200, body='', content_type='text/plain'):
+    request.send_response(status)
+    request.send_header('Content-Type', content_type)
+    request.send_header('Content-Length', str(len(body)))
+    request.end_headers()
+    request.wfile.write(body)
+
+
+@contextlib.contextmanager
+def benchmark_database(name='osf_benchmarks'):
+    """Point the models at a scratch database for the duration of the block and
+    drop it afterwards.
+    """
+    from framework.mongo import client
+    from website import settings
+    from website.app import init_app
+
+    original_name = settings.DB_NAME
+    settings.DB_NAME = name
+    init_app(set_backends=True, routes=False)
+    try:
+        yield
+    finally:
+        client.drop_database(name)
+        settings.DB_NAME = original_name
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Compare requests to CAS and timings of authenticating API requests that
+carry one of a few personal access tokens, asking CAS about every request (the
+old behaviour) and through the token cache, which checks the revocations of
+the token in the database on each request. CAS answers after 100 ms.
+
+    python -m scripts.benchmarks.cas_tokens
+"""
+import json
+
+import mock
+
+from scripts.benchmarks import StubServer, benchmark_database, print_results, respond, timed
+
+TOKENS = 5
+REQUESTS = 100
+LATENCY = 0.1
+
+
+def profile(request):
+    respond(request, body=json.dumps({'id': 'abc12', 'scope': ['osf.full_read']}), content_type='application/json')
+
+
+def main():
+    with benchmark_database():
+        from framework.auth import cas
+        from website import settings
+
+        rows = []
+        for name, enabled in (('every request', False), ('cached', True)):
+            cas.token_cache.clear()
+            with StubServer(profile, latency=LATENCY) as server, \
+                    mock.patch.object(settings, 'CAS_SERVER_URL', server.url), \
+                    mock.patch.object(settings, 'CAS_TOKEN_CACHE_ENABLED', enabled), \
+                    timed() as timer:
+                for i in range(REQUESTS):
+                    cas.get_profile('token{}'.format(i % TOKENS))
+            rows.append((name, server.counts.get('GET', 0), '{:.2f}'.format(timer.elapsed * 1000 / REQUESTS)))
+        print_results(
+            '{} API requests with {} tokens'.format(REQUESTS, TOKENS),
+            rows,
+            ('strategy', 'CAS requests', 'ms/request'),
+        )
+
+
+if __name__ == '__main__':
+    main()
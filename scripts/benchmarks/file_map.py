@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Compare finding the files selected in a large preregistration, a project
+and 4 components of 4,000 OSF Storage files each, by scanning the memoized
+file maps once per selected file (the old behaviour) and through the sha256
+index of the registration.
+
+    python -m scripts.benchmarks.file_map
+"""
+import hashlib
+import functools
+
+import mock
+
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+COMPONENTS = 4
+FOLDERS = 40
+FILES_PER_FOLDER = 100
+SELECTED = 100
+
+
+def make_file_tree(node_id):
+    return {
+        'path': '/',
+        'name': '',
+        'kind': 'folder',
+        'children': [
+            {
+                'path': '/folder{}'.format(i),
+                'name': 'folder{}'.format(i),
+                'kind': 'folder',
+                'children': [
+                    {
+                        'path': '/folder{}/file{}'.format(i, j),
+                        'name': 'file{}'.format(j),
+                        'kind': 'file',
+                        'extra': {'hashes': {'sha256': hashlib.sha256('{}{}{}'.format(node_id, i, j)).hexdigest()}},
+                    }
+                    for j in range(FILES_PER_FOLDER)
+                ],
+            }
+            for i in range(FOLDERS)
+        ],
+    }
+
+
+def legacy_find_registration_file(value, node):
+    """`find_registration_file` as it was before the file index, with its memoized,
+    recursive file map.
+    """
+    from website.models import Node
+
+    cache = legacy_find_registration_file.cache
+
+    def do_get_file_map(file_tree):
+        file_map = []
+        stack = [file_tree]
+        while len(stack):
+            tree_node = stack.pop(0)
+            if tree_node['kind'] == 'file':
+                file_map.append((tree_node['extra']['hashes']['sha256'], tree_node))
+            else:
+                stack = stack + tree_node['children']
+        return file_map
+
+    def get_file_map(node):
+        if node._id not in cache:
+            cache[node._id] = do_get_file_map(node.get_addon('osfstorage')._get_file_tree(user=node.creator))
+        for key, file_value in cache[node._id]:
+            yield key, file_value, node._id
+        for child in node.nodes_primary:
+            for key, file_value, node_id in get_file_map(child):
+                yield key, file_value, node_id
+
+    for sha256, file_value, node_id in get_file_map(node):
+        registered_from_id = Node.load(node_id).registered_from._id
+        if sha256 == value['sha256'] and registered_from_id == value['nodeId'] and value['selectedFileName'] == file_value['name']:
+            return file_value, node_id
+    return None, None
+
+legacy_find_registration_file.cache = {}
+
+
+def main():
+    with benchmark_database():
+        from website.addons.base import StorageAddonBase
+        from website.archiver import utils
+        from tests.factories import NodeFactory, ProjectFactory
+
+        src = ProjectFactory()
+        src_components = [NodeFactory(parent=src) for _ in range(COMPONENTS)]
+        registration = ProjectFactory(creator=src.creator)
+        registration.registered_from = src
+        registration.save()
+        for component in src_components:
+            registered = NodeFactory(parent=registration, creator=src.creator)
+            registered.registered_from = component
+            registered.save()
+
+        pairs = zip([src] + src_components, [registration] + registration.nodes_primary)
+        file_trees = {registered._id: make_file_tree(registered._id) for _, registered in pairs}
+        values = []
+        for number in range(SELECTED):
+            original, registered = pairs[number % len(pairs)]
+            selected = file_trees[registered._id]['children'][-1]['children'][-1 - number // len(pairs)]
+            values.append({
+                'sha256': selected['extra']['hashes']['sha256'],
+                'nodeId': original._id,
+                'selectedFileName': selected['name'],
+            })
+
+        def get_file_tree(self, user=None, **kwargs):
+            return file_trees[self.owner._id]
+
+        rows = []
+        with mock.patch.object(StorageAddonBase, '_get_file_tree', get_file_tree):
+            for name, find in (
+                ('file map scans', functools.partial(legacy_find_registration_file, node=registration)),
+                ('sha256 index', functools.partial(utils.find_registration_file, node=registration)),
+            ):
+                with timed() as timer:
+                    found = [find(value) for value in values]
+                assert all(registration_file for registration_file, _ in found)
+                rows.append((name, '{:.3f}'.format(timer.elapsed)))
+        utils.release_file_maps(registration)
+        print_results(
+            'Finding {} selected files among {} files'.format(SELECTED, len(pairs) * FOLDERS * FILES_PER_FOLDER),
+            rows,
+            ('lookup', 'seconds'),
+        )
+
+
+if __name__ == '__main__':
+    main()
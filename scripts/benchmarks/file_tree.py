@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Compare walking an addon file tree of 10k folders served by a local
+WaterButler stub, one listing at a time (the old behaviour, minus its fixed
+pause of 0.2 seconds per listing, which is added as an estimate) and with the
+concurrent `FileTreeWalker`.
+
+    python -m scripts.benchmarks.file_tree
+"""
+import json
+import urlparse
+
+import mock
+import requests
+
+from framework.exceptions import HTTPError
+from scripts.benchmarks import StubServer, print_results, respond, timed
+
+FAN_OUT = 10
+DEPTH = 4  # 10 + 100 + 1,000 + 10,000 folders below the root
+LATENCY = 0.005  # seconds spent by the stub per listing
+OLD_PAUSE = 1.0 / 5.0
+RATE_LIMIT = 1000  # listings per second allowed by the walker
+
+
+def list_stub_folder(request):
+    path = urlparse.parse_qs(urlparse.urlparse(request.path).query)['path'][0].rstrip('/')
+    depth = path.count('/')
+    children = [{'path': path + '/file', 'name': 'file', 'kind': 'file', 'size': 1024}]
+    if depth < DEPTH:
+        children.extend(
+            {'path': '{}/{}'.format(path, i), 'name': str(i), 'kind': 'folder'}
+            for i in range(FAN_OUT)
+        )
+    respond(request, body=json.dumps({'data': children}), content_type='application/json')
+
+
+class StubUser(object):
+
+    def get_or_create_cookie(self):
+        return 'cookie'
+
+
+class StubOwner(object):
+    _id = 'abcde'
+
+
+def stub_addon():
+    from website.addons.base import GenericRootNode, StorageAddonBase
+
+    class StubAddon(StorageAddonBase):
+        config = mock.Mock(short_name='stub')
+        owner = StubOwner()
+        root_node = GenericRootNode()
+
+    return StubAddon()
+
+
+def sequential_file_tree(addon, filenode, user):
+    # What StorageAddonBase._get_file_tree used to do, without the pause after each listing
+    from website.util import waterbutler_url_for
+
+    if filenode.get('kind') == 'file':
+        return filenode
+    url = waterbutler_url_for(
+        'metadata', provider=addon.config.short_name, path=filenode['path'],
+        node=addon.owner, user=user, view_only=True,
+    )
+    res = requests.get(url)
+    if res.status_code != 200:
+        raise HTTPError(res.status_code)
+    filenode['children'] = [sequential_file_tree(addon, child, user) for child in res.json()['data']]
+    return filenode
+
+
+def count_files(file_tree):
+    stack, files = [file_tree], 0
+    while stack:
+        filenode = stack.pop()
+        if filenode['kind'] == 'file':
+            files += 1
+        else:
+            stack.extend(filenode['children'])
+    return files
+
+
+def main():
+    addon = stub_addon()
+    user = StubUser()
+    rows = []
+    for name, walk in (
+        ('sequential', lambda root: sequential_file_tree(addon, root, user)),
+        ('concurrent', lambda root: addon._get_file_tree(root, user)),
+    ):
+        with StubServer(list_stub_folder, latency=LATENCY) as server:
+            with mock.patch('website.settings.WATERBUTLER_URL', server.url), \
+                    mock.patch('website.settings.FILE_TREE_RATE_LIMITS', {'default': RATE_LIMIT}):
+                with timed() as timer:
+                    file_tree = walk({'path': '/', 'name': '', 'kind': 'folder'})
+            listings = server.counts.get('GET', 0)
+        with_pause = timer.elapsed + listings * OLD_PAUSE if name == 'sequential' else timer.elapsed
+        rows.append((
+            name,
+            listings,
+            count_files(file_tree),
+            '{:.1f}'.format(timer.elapsed),
+            '{:.1f}'.format(with_pause),
+        ))
+    print_results(
+        'Walking a tree of {} folders, {:.0f}ms per listing'.format(rows[0][1], LATENCY * 1000),
+        rows,
+        ('strategy', 'listings', 'files', 'seconds', 'seconds with old pause'),
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Compare timings of adding a log to a project with 20000 logs and counting
+its logs, loading every log of the project (the old behaviour) and through the
+per-node log counter.
+
+    python -m scripts.benchmarks.log_counters
+"""
+import datetime as dt
+
+import bson
+
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+LOGS = 20000
+REPEAT = 20
+
+
+def main():
+    with benchmark_database():
+        from website.models import NodeLog
+        from website.project import log_counters
+        from tests.factories import ProjectFactory
+
+        project = ProjectFactory()
+        now = dt.datetime.utcnow()
+        NodeLog._storage[0].store.insert([
+            {'_id': str(bson.ObjectId()), 'node': project._id, 'action': 'tag_added', 'date': now - dt.timedelta(minutes=i)}
+            for i in range(LOGS)
+        ])
+        log_counters.initialize(project._id)
+
+        def legacy_add_log():
+            log = NodeLog(action='tag_added', params={'node': project._id}, node=project, original_node=project._id)
+            log.save()
+            project.date_modified = project.logs[-1].date if len(project.logs) > 1 else log.date
+
+        def add_log():
+            project.add_log('tag_added', params={'node': project._id}, auth=None, save=False)
+
+        rows = []
+        for name, append, count in (
+            ('load logs', legacy_add_log, lambda: len(project.logs)),
+            ('log counter', add_log, lambda: project.log_count),
+        ):
+            NodeLog._clear_caches()
+            with timed() as append_timer:
+                for _ in range(REPEAT):
+                    append()
+            with timed() as count_timer:
+                for _ in range(REPEAT):
+                    count()
+            rows.append((
+                name,
+                '{:.1f}'.format(append_timer.elapsed * 1000 / REPEAT),
+                '{:.1f}'.format(count_timer.elapsed * 1000 / REPEAT),
+            ))
+        print_results(
+            'Project with {} logs'.format(LOGS),
+            rows,
+            ('strategy', 'ms/add_log', 'ms/count'),
+        )
+
+
+if __name__ == '__main__':
+    main()
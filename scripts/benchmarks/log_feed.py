@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Compare queries and timings of building the log feed of a user watching 500
+active projects, loading the logs of each watched project and merging them in
+Python (the old behaviour) and with one query.
+
+    python -m scripts.benchmarks.log_feed
+"""
+import datetime as dt
+import itertools
+
+import bson
+import pytz
+
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+PROJECTS = 500
+LOGS = 20
+PAGE_SIZE = 10
+
+
+def legacy_recent_log_ids(user, since):
+    log_ids = []
+    for config in user.watched:
+        node_log_ids = [log.pk for log in config.node.logs
+                        if bson.ObjectId(log.pk).generation_time > since and
+                        log.pk not in log_ids]
+        log_ids = sorted(itertools.chain(log_ids, node_log_ids), reverse=True)
+    return (l_id for l_id in log_ids)
+
+
+def main():
+    with benchmark_database():
+        from website.models import Node, NodeLog, WatchConfig
+        from tests.factories import UserFactory
+        from tests.utils import count_queries
+
+        user = UserFactory()
+        now = dt.datetime.utcnow()
+        nodes = Node._storage[0].store
+        logs = []
+        for i in range(PROJECTS):
+            node_id = 'bench{}'.format(i)
+            nodes.insert({'_id': node_id, 'title': node_id, 'category': 'project', 'is_deleted': False})
+            config_id = WatchConfig._storage[0].store.insert({'_id': str(bson.ObjectId()), 'node': node_id})
+            user.watched.append(WatchConfig.load(config_id))
+            logs.extend(
+                {'_id': str(bson.ObjectId()), 'node': node_id, 'action': 'tag_added', 'date': now - dt.timedelta(minutes=j * PROJECTS + i)}
+                for j in range(LOGS)
+            )
+        NodeLog._storage[0].store.insert(logs)
+        user.save()
+        since = now.replace(tzinfo=pytz.utc) - dt.timedelta(days=60)
+
+        rows = []
+        for name, first_page in (
+            ('load and merge', lambda: list(itertools.islice(legacy_recent_log_ids(user, since), PAGE_SIZE))),
+            ('one query', lambda: list(user.get_recent_log_ids(since=since, limit=PAGE_SIZE))),
+        ):
+            Node._clear_caches()
+            NodeLog._clear_caches()
+            WatchConfig._clear_caches()
+            with count_queries() as counter, timed() as timer:
+                first_page()
+            rows.append((name, counter.count, '{:.2f}'.format(timer.elapsed)))
+        print_results(
+            'First page of the feed of {} watched projects with {} logs each'.format(PROJECTS, LOGS),
+            rows,
+            ('strategy', 'queries', 'seconds'),
+        )
+
+
+if __name__ == '__main__':
+    main()
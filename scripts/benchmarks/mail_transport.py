@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Compare timings of sending 200 notification emails, opening a connection
+for every message (the old behaviour) and on pooled connections. Opening a
+connection to the stub SMTP server takes 50 ms, as the TLS handshake and login
+of a remote server would.
+
+    python -m scripts.benchmarks.mail_transport
+"""
+import asyncore
+import smtpd
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+
+import mock
+
+from scripts.benchmarks import print_results, timed
+
+MESSAGES = 200
+LATENCY = 0.05
+
+
+class SlowSMTPServer(smtpd.SMTPServer):
+
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.received = 0
+
+    def handle_accept(self):
+        time.sleep(LATENCY)
+        smtpd.SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.received += 1
+
+
+def make_message(i):
+    return {
+        'from_addr': 'noreply@osf.io',
+        'to_addr': 'user{}@example.com'.format(i),
+        'subject': 'Recent activity',
+        'message': '<p>Your digest</p>' * 50,
+        'ttls': False,
+        'login': False,
+    }
+
+
+def send_with_new_connections(server, messages):
+    for message in messages:
+        msg = MIMEText(message['message'], 'html', _charset='utf-8')
+        msg['Subject'] = message['subject']
+        msg['From'] = message['from_addr']
+        msg['To'] = message['to_addr']
+        connection = smtplib.SMTP(server)
+        connection.ehlo()
+        connection.sendmail(message['from_addr'], [message['to_addr']], msg.as_string())
+        connection.quit()
+
+
+def main():
+    from framework.email import tasks, transport
+    from website import settings
+
+    server = SlowSMTPServer()
+    address = '{}:{}'.format(*server.socket.getsockname())
+    thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.05})
+    thread.daemon = True
+    thread.start()
+
+    messages = [make_message(i) for i in range(MESSAGES)]
+    rows = []
+    try:
+        with mock.patch.object(settings, 'MAIL_SERVER', address), \
+                mock.patch.object(settings, 'USE_EMAIL', True), \
+                mock.patch.object(settings, 'SENDGRID_API_KEY', None):
+            for name, send in (
+                ('connection per message', lambda: send_with_new_connections(address, messages)),
+                ('pooled', lambda: tasks.send_many(messages)),
+            ):
+                transport.smtp_pool.clear()
+                received = server.received
+                with timed() as timer:
+                    send()
+                rows.append((name, server.received - received, '{:.1f}'.format(MESSAGES / timer.elapsed)))
+            transport.smtp_pool.clear()
+    finally:
+        asyncore.close_all()
+    print_results(
+        '{} emails'.format(MESSAGES),
+        rows,
+        ('strategy', 'delivered', 'messages/second'),
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Compare queries and timings of reading the first page of the comments of a
+project with 20000 comments, checking the target of every comment (the old
+behaviour) and with one indexed, paginated query.
+
+    python -m scripts.benchmarks.node_comments
+"""
+import datetime as dt
+
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+COMMENTS = 20000
+PAGE_SIZE = 10
+
+
+def main():
+    with benchmark_database():
+        from modularodm import Q
+        from framework.guid.model import Guid
+        from website.project.model import Comment
+        from tests.factories import ProjectFactory
+        from tests.utils import count_queries
+
+        project = ProjectFactory()
+        now = dt.datetime.utcnow()
+        Comment._storage[0].store.insert([
+            {
+                '_id': 'comment{:05d}'.format(i),
+                'user': project.creator._id,
+                'node': project._id,
+                'target': [project._id, 'guid'],
+                'root_target': [project._id, 'guid'],
+                'page': 'node',
+                'content': 'Comment {}'.format(i),
+                'is_deleted': False,
+                'date_created': now - dt.timedelta(minutes=i),
+                'date_modified': now - dt.timedelta(minutes=i),
+            }
+            for i in range(COMMENTS)
+        ])
+        query = Q('node', 'eq', project) & Q('root_target', 'ne', None)
+
+        def check_every_comment():
+            for comment in Comment.find(query):
+                if comment.root_target.referent.is_deleted:
+                    comment.root_target = None
+                    comment.save()
+            return list(Comment.find(query).sort('-date_created')[:PAGE_SIZE])
+
+        def first_page():
+            return list(Comment.find(query).sort('-date_created')[:PAGE_SIZE])
+
+        rows = []
+        for name, read in (('check every comment', check_every_comment), ('indexed query', first_page)):
+            Comment._clear_caches()
+            Guid._clear_caches()
+            with count_queries() as counter, timed() as timer:
+                read()
+            rows.append((name, counter.count, '{:.2f}'.format(timer.elapsed)))
+        print_results(
+            'First page of the comments of a project with {} comments'.format(COMMENTS),
+            rows,
+            ('strategy', 'queries', 'seconds'),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Compare query counts and timings of the node tree helpers when walking the
+tree one `Node.load` at a time and when resolving it from `ancestor_ids`, on a
+tree 10 levels deep and a project with 500 components.
+
+    python -m scripts.benchmarks.node_tree
+"""
+import contextlib
+
+import mock
+
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+DEPTH = 10
+WIDTH = 500
+
+
+@contextlib.contextmanager
+def legacy_tree():
+    from website.project.model import Node
+    # Roots keep using the index (an empty lineage), every other node walks its parents
+    with mock.patch.object(Node, '_has_ancestor_index', property(lambda self: not self.parent_node)), \
+            mock.patch.object(Node, '_has_descendant_index', property(lambda self: False)):
+        yield
+
+
+def measure(label, func):
+    from website.project.model import Node
+    from tests.utils import count_queries
+
+    rows = []
+    for strategy, patch in (('walk', legacy_tree()), ('ancestor_ids', mock.MagicMock())):
+        Node._clear_caches()
+        with patch, count_queries() as counter, timed() as timer:
+            func()
+        rows.append((label, strategy, counter.count, '{:.3f}'.format(timer.elapsed)))
+    return rows
+
+
+def main():
+    with benchmark_database():
+        from framework.auth import Auth
+        from website.project import ancestor_index
+        from website.project.model import Node
+        from tests.factories import AuthUserFactory, NodeFactory, ProjectFactory
+
+        user = AuthUserFactory()
+        stranger = AuthUserFactory()
+        node = root = ProjectFactory(creator=user)
+        for _ in range(DEPTH):
+            node = NodeFactory(creator=user, parent=node)
+        deep_id = node._id
+
+        wide = ProjectFactory(creator=user)
+        for _ in range(WIDTH):
+            NodeFactory(creator=user, parent=wide)
+        wide_id = wide._id
+        ancestor_index.mark_populated()
+        ancestor_index.is_populated()
+
+        rows = []
+        rows += measure('parents (depth {})'.format(DEPTH), lambda: Node.load(deep_id).parents)
+        rows += measure('depth', lambda: Node.load(deep_id).depth)
+        rows += measure('is_admin_parent', lambda: Node.load(deep_id).is_admin_parent(stranger))
+        rows += measure('admin_contributor_ids', lambda: Node.load(deep_id).admin_contributor_ids)
+        rows += measure(
+            'has_permission_on_children (width {})'.format(WIDTH),
+            lambda: Node.load(wide_id).has_permission_on_children(stranger, 'read')
+        )
+        rows += measure('has_addon_on_children', lambda: Node.load(wide_id).has_addon_on_children('github'))
+        rows += measure(
+            'find_readable_descendants',
+            lambda: list(Node.load(wide_id).find_readable_descendants(Auth(stranger)))
+        )
+        rows += measure('get_descendants_recursive', lambda: list(Node.load(root._id).get_descendants_recursive()))
+        print_results('Node tree helpers', rows, ('helper', 'strategy', 'queries', 'seconds'))
+
+
+if __name__ == '__main__':
+    main()
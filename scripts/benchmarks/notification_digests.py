@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Compare queries and timings of collecting and removing the pending digests
+of 2000 users with 5 notifications each, with a group() command and one remove
+per digest (the old behaviour) and streaming chunks of users by index.
+
+    python -m scripts.benchmarks.notification_digests
+"""
+import datetime as dt
+import itertools
+
+import bson
+from bson.code import Code
+
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+USERS = 2000
+NOTIFICATIONS = 5
+
+
+def legacy_send(db, NotificationDigest, Q):
+    groups = db['notificationdigest'].group(
+        key={'user_id': 1},
+        condition={'send_type': 'email_digest'},
+        initial={'info': []},
+        reduce=Code(
+            """
+            function(curr, result) {
+                result.info.push({
+                    'message': curr.message,
+                    'node_lineage': curr.node_lineage,
+                    '_id': curr._id
+                });
+            };
+            """
+        )
+    )
+    for group in groups:
+        for message in group['info']:
+            NotificationDigest.remove(Q('_id', 'eq', message['_id']))
+    return len(groups)
+
+
+def streaming_send(tasks):
+    users = 0
+    for chunk in tasks.iter_users_emails('email_digest'):
+        tasks.remove_notifications(email_notification_ids=[
+            message['_id'] for group in chunk for message in group['info']
+        ])
+        users += len(chunk)
+    return users
+
+
+def main():
+    with benchmark_database():
+        from modularodm import Q
+        from framework.mongo import database as db
+        from website.notifications import tasks
+        from website.notifications.model import NotificationDigest
+        from tests.utils import count_queries
+
+        def insert_digests():
+            now = dt.datetime.utcnow()
+            NotificationDigest._storage[0].store.insert([
+                {
+                    '_id': str(bson.ObjectId()),
+                    'user_id': 'user{}'.format(user),
+                    'send_type': 'email_digest',
+                    'timestamp': now,
+                    'message': 'Freddie commented on your project',
+                    'node_lineage': ['abc12'],
+                }
+                for user, _ in itertools.product(range(USERS), range(NOTIFICATIONS))
+            ])
+
+        rows = []
+        for name, send in (
+            ('group and remove each', lambda: legacy_send(db, NotificationDigest, Q)),
+            ('streamed chunks', lambda: streaming_send(tasks)),
+        ):
+            insert_digests()
+            NotificationDigest._clear_caches()
+            with count_queries() as counter, timed() as timer:
+                users = send()
+            rows.append((name, users, counter.count, '{:.1f}'.format(users / timer.elapsed)))
+        print_results(
+            'Digests of {} users with {} notifications each'.format(USERS, NOTIFICATIONS),
+            rows,
+            ('strategy', 'users', 'queries', 'users/second'),
+        )
+
+
+if __name__ == '__main__':
+    main()
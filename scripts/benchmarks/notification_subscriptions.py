@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Compare query counts and timings of compiling the subscriptions of a node
+5 levels deep with 200 subscribers spread over its lineage, between the old
+recursive compiler (one subscription load and a permission check per user and
+level) and the set-based one.
+
+    python -m scripts.benchmarks.notification_subscriptions
+"""
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+DEPTH = 5
+SUBSCRIBERS = 200
+EVENT = 'file_updated'
+
+
+def legacy_check_node(node, event):
+    """`check_node` as it was before the set-based compiler."""
+    from website.notifications import constants, utils
+    from website.notifications.model import NotificationSubscription
+
+    node_subscriptions = {key: [] for key in constants.NOTIFICATION_TYPES}
+    if node:
+        subscription = NotificationSubscription.load(utils.to_subscription_key(node._id, event))
+        for notification_type in node_subscriptions:
+            users = getattr(subscription, notification_type, [])
+            for user in users:
+                if node.has_permission(user, 'read'):
+                    node_subscriptions[notification_type].append(user._id)
+    return node_subscriptions
+
+
+def legacy_compile_subscriptions(node, event_type, event=None, level=0):
+    """`compile_subscriptions` as it was before the set-based compiler."""
+    from website import models as website_models
+    from website.notifications import utils
+
+    subscriptions = legacy_check_node(node, event_type)
+    if event:
+        subscriptions = legacy_check_node(node, event)
+        parent_subscriptions = legacy_compile_subscriptions(node, event_type, level=level + 1)
+    elif node.parent_id:
+        parent_subscriptions = \
+            legacy_compile_subscriptions(website_models.Node.load(node.parent_id), event_type, level=level + 1)
+    else:
+        parent_subscriptions = legacy_check_node(None, event_type)
+    for notification_type in parent_subscriptions:
+        p_sub_n = parent_subscriptions[notification_type]
+        p_sub_n.extend(subscriptions[notification_type])
+        for nt in subscriptions:
+            if notification_type != nt:
+                p_sub_n = list(set(p_sub_n).difference(set(subscriptions[nt])))
+        if level == 0:
+            p_sub_n, removed = utils.separate_users(node, p_sub_n)
+        parent_subscriptions[notification_type] = p_sub_n
+    return parent_subscriptions
+
+
+def main():
+    with benchmark_database():
+        from framework.auth.core import User
+        from website.notifications import constants, emails
+        from website.project.model import Node
+        from tests.factories import NodeFactory, NotificationSubscriptionFactory, ProjectFactory, UserFactory
+        from tests.utils import count_queries
+
+        nodes = [ProjectFactory()]
+        for _ in range(DEPTH - 1):
+            nodes.append(NodeFactory(parent=nodes[-1]))
+
+        notification_types = [each for each in constants.NOTIFICATION_TYPES if each != 'none']
+        subscriptions = [
+            NotificationSubscriptionFactory(_id='{}_{}'.format(node._id, EVENT), owner=node, event_name=EVENT)
+            for node in nodes
+        ]
+        for number in range(SUBSCRIBERS):
+            user = UserFactory()
+            # Contributors of the project, read access all the way down; admins of the project see everything
+            for node in nodes:
+                node.add_contributor(user, permissions='admin' if number % 10 == 0 else 'read')
+            level = number % DEPTH
+            getattr(subscriptions[level], notification_types[number % len(notification_types)]).append(user)
+        for node in nodes:
+            node.save()
+        for subscription in subscriptions:
+            subscription.save()
+        leaf_id = nodes[-1]._id
+
+        rows = []
+        results = []
+        for label, compile_subscriptions in (
+            ('recursive', legacy_compile_subscriptions),
+            ('set-based', emails.compile_subscriptions),
+        ):
+            Node._clear_caches()
+            User._clear_caches()
+            leaf = Node.load(leaf_id)
+            with count_queries() as counter, timed() as timer:
+                compiled = compile_subscriptions(leaf, EVENT)
+            results.append({key: sorted(set(value)) for key, value in compiled.items()})
+            rows.append((
+                label,
+                sum(len(value) for value in compiled.values()),
+                counter.count,
+                '{:.3f}'.format(timer.elapsed),
+            ))
+        assert results[0] == results[1], 'The compilers disagree'
+        print_results(
+            'compile_subscriptions, {} levels, {} subscribers'.format(DEPTH, SUBSCRIBERS),
+            rows,
+            ('compiler', 'recipients', 'queries', 'seconds'),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Compare queries and timings of copying an OSF Storage tree to a fork, cloning
+and saving one file node at a time (the old behaviour) and in bulk.
+
+    python -m scripts.benchmarks.osfstorage_copy
+"""
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+FOLDERS = 50
+FILES = 40
+
+
+def main():
+    with benchmark_database():
+        from website.files.models import StoredFileNode
+        from website.files.utils import TreeCopier, copy_files
+        from tests.factories import ProjectFactory
+        from tests.utils import count_queries
+
+        root = ProjectFactory().get_addon('osfstorage').get_root()
+        for i in range(FOLDERS):
+            folder = root.append_folder('folder{}'.format(i))
+            for j in range(FILES):
+                folder.append_file('file{}'.format(j))
+
+        rows = []
+        for name, copy in (
+            ('clone and save', lambda target: copy_files(root, target)),
+            ('bulk', lambda target: TreeCopier(root, target).copy()),
+        ):
+            target = ProjectFactory()
+            StoredFileNode._clear_caches()
+            with count_queries() as counter, timed() as timer:
+                copy(target)
+            rows.append((name, counter.count, '{:.2f}'.format(timer.elapsed)))
+        print_results(
+            'Copying {} file nodes'.format(FOLDERS * (FILES + 1) + 1),
+            rows,
+            ('strategy', 'queries', 'seconds'),
+        )
+
+
+if __name__ == '__main__':
+    main()
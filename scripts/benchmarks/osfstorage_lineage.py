@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Compare queries and timings of looking up the materialized path and the
+lineage of OSF Storage files 20 folders deep, walking parents one load at a
+time (the old behaviour) and from the stored lineage.
+
+    python -m scripts.benchmarks.osfstorage_lineage
+"""
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+DEPTH = 20
+FILES = 50
+
+
+def main():
+    with benchmark_database():
+        from website.files.models import OsfStorageFile, StoredFileNode
+        from tests.factories import ProjectFactory
+        from tests.utils import count_queries
+
+        folder = ProjectFactory().get_addon('osfstorage').get_root()
+        for i in range(DEPTH):
+            folder = folder.append_folder('folder{}'.format(i))
+        file_ids = [folder.append_file('file{}'.format(i))._id for i in range(FILES)]
+
+        rows = []
+        for name, materialized_path, lineage in (
+            ('parent walk', lambda each: each._compute_materialized_path(), lambda each: list(each._walk_lineage())),
+            ('stored', lambda each: each.materialized_path, lambda each: each.get_lineage()),
+        ):
+            for operation, func in (('materialized_path', materialized_path), ('lineage', lineage)):
+                # Every lookup is cold, as it is for a WaterButler hook or a search update
+                queries, elapsed = 0, 0.0
+                for file_id in file_ids:
+                    StoredFileNode._clear_caches()
+                    file_node = OsfStorageFile.load(file_id)
+                    with count_queries() as counter, timed() as timer:
+                        func(file_node)
+                    queries += counter.count
+                    elapsed += timer.elapsed
+                rows.append((name, operation, queries / FILES, '{:.2f}'.format(elapsed * 1000 / FILES)))
+        print_results(
+            'Cold lookups for files {} folders deep'.format(DEPTH),
+            rows,
+            ('strategy', 'lookup', 'queries/file', 'ms/file'),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Compare writes to `pagecounters` with and without the counter buffer under
+a synthetic load of 10,000 views a minute, skewed towards a few hot pages the
+way popular projects and downloads are.
+
+One simulated minute is replayed as fast as possible; the buffer is flushed
+every `ANALYTICS_BUFFER_FLUSH_INTERVAL` simulated seconds.
+
+    python -m scripts.benchmarks.page_counters
+"""
+import random
+
+import mock
+
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+VIEWS_PER_MINUTE = 10000
+PAGES = 2000
+HOT_PAGES = 20
+HOT_SHARE = 0.8
+
+
+def synthetic_views(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        if rng.random() < HOT_SHARE:
+            yield 'node:hot{}'.format(rng.randrange(HOT_PAGES))
+        else:
+            yield 'download:cold{}:file'.format(rng.randrange(PAGES))
+
+
+def replay(buffered):
+    from framework.analytics import counter_buffer
+    from framework.mongo import database
+    from website import settings
+
+    collection = database['pagecounters']
+    collection.remove()
+    buffer = counter_buffer.CounterBuffer()
+    views_per_flush = VIEWS_PER_MINUTE * settings.ANALYTICS_BUFFER_FLUSH_INTERVAL // 60
+    writes = [0]
+    original_update = collection.update
+
+    def counted_update(*args, **kwargs):
+        writes[0] += 1
+        return original_update(*args, **kwargs)
+
+    with mock.patch.object(collection, 'update', counted_update), \
+            mock.patch.object(counter_buffer, 'counter_buffer', buffer), \
+            mock.patch.object(counter_buffer.CounterBuffer, '_ensure_flusher'), \
+            mock.patch('website.settings.ANALYTICS_BUFFER_ENABLED', buffered), \
+            timed() as timer:
+        for number, page in enumerate(synthetic_views(VIEWS_PER_MINUTE), 1):
+            counter_buffer.increment(collection, page, {'total': 1, 'date.2016/05/04.total': 1})
+            if buffered and number % views_per_flush == 0:
+                buffer.flush()
+        buffer.flush()
+
+    total = sum(document['total'] for document in collection.find({}, {'total': True}))
+    assert total == VIEWS_PER_MINUTE, 'Lost views: {} of {}'.format(total, VIEWS_PER_MINUTE)
+    return writes[0], timer.elapsed
+
+
+def main():
+    with benchmark_database():
+        rows = []
+        baseline = None
+        for label, buffered in (('write-through', False), ('buffered', True)):
+            writes, elapsed = replay(buffered)
+            baseline = baseline or writes
+            rows.append((
+                label,
+                VIEWS_PER_MINUTE,
+                writes,
+                '{:.1f}'.format(writes / 60.0),
+                '{:.0%}'.format(1 - writes / float(baseline)),
+                '{:.3f}'.format(elapsed),
+            ))
+        print_results(
+            'pagecounters writes for one minute of {} views'.format(VIEWS_PER_MINUTE),
+            rows,
+            ('mode', 'views', 'writes', 'writes/sec', 'saved', 'seconds'),
+        )
+
+
+if __name__ == '__main__':
+    main()
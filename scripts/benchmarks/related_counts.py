@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Compare queries and timings of computing the related counts of a page of 100
+projects with 3 components, 2 linked projects and a comment each, once per
+project (the old behaviour) and once per page.
+
+    python -m scripts.benchmarks.related_counts
+"""
+import os
+
+import mock
+
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+PROJECTS = 100
+COMPONENTS = 3
+LINKS = 2
+
+
+def main():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.base.settings')
+    with benchmark_database():
+        from framework.auth import Auth
+        from website.models import Node, Pointer
+        from api.nodes.serializers import NodeSerializer
+        from tests.factories import CommentFactory, NodeFactory, ProjectFactory, UserFactory
+        from tests.utils import count_queries
+
+        user = UserFactory()
+        auth = Auth(user)
+        commenter = UserFactory()
+        linked = [ProjectFactory(is_public=True) for _ in range(LINKS)]
+        projects = []
+        for _ in range(PROJECTS):
+            project = ProjectFactory(creator=user, is_public=True)
+            for _ in range(COMPONENTS):
+                NodeFactory(parent=project, creator=user, is_public=True)
+            for node in linked:
+                project.add_pointer(node, auth=auth)
+            project.add_contributor(commenter, auth=auth, save=True)
+            CommentFactory(node=project, user=commenter)
+            projects.append(project)
+
+        request = mock.Mock(user=user, query_params={'related_counts': 'true'}, parser_context={'kwargs': {}})
+        serializer = NodeSerializer(context={'request': request})
+
+        def per_project():
+            for project in projects:
+                for count_method in serializer.batch_counts:
+                    getattr(serializer, count_method)(project)
+
+        rows = []
+        for name, count in (
+            ('per project', per_project),
+            ('per page', lambda: serializer.prefetch_counts(projects)),
+        ):
+            Node._clear_caches()
+            Pointer._clear_caches()
+            with count_queries() as counter, timed() as timer:
+                count()
+            rows.append((name, counter.count, '{:.2f}'.format(timer.elapsed)))
+        print_results(
+            'Related counts of {} projects'.format(PROJECTS),
+            rows,
+            ('strategy', 'queries', 'seconds'),
+        )
+
+
+if __name__ == '__main__':
+    main()
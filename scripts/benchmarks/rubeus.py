@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Compare timings of serializing the Files page of a project with 40
+components and 3 remote addons on each, fetching the addons one at a time
+(the old behaviour) and making their remote requests at once. Every addon
+request takes 50 ms.
+
+    python -m scripts.benchmarks.rubeus
+"""
+import mock
+import requests
+
+from scripts.benchmarks import StubServer, benchmark_database, print_results, respond, timed
+
+COMPONENTS = 40
+ADDONS = 3
+LATENCY = 0.05
+
+
+def make_addon(node, url, index):
+    def prefetch_hgrid_data(addon, auth, **kwargs):
+        return lambda: requests.get(url)
+
+    def get_hgrid_data(addon, auth, prefetched=None, **kwargs):
+        return [{'name': 'addon {}'.format(index), 'kind': 'folder'}]
+    addon = mock.Mock()
+    addon.owner = node
+    addon.config.short_name = 'addon{}'.format(index)
+    addon.config.prefetch_hgrid_data.side_effect = prefetch_hgrid_data
+    addon.config.get_hgrid_data.side_effect = get_hgrid_data
+    return addon
+
+
+def main():
+    with benchmark_database(), StubServer(lambda request: respond(request, body='[]'), latency=LATENCY) as server:
+        from framework.auth import Auth
+        from website import settings
+        from website.util import rubeus
+        from tests.factories import NodeFactory, ProjectFactory
+
+        project = ProjectFactory()
+        for _ in range(COMPONENTS):
+            NodeFactory(parent=project, creator=project.creator)
+        auth = Auth(project.creator)
+
+        def get_addons(node):
+            return [make_addon(node, server.url, index) for index in range(ADDONS)]
+
+        rows = []
+        for name, workers in (('serial', 1), ('concurrent', settings.HGRID_ADDON_WORKERS)):
+            with mock.patch('website.project.model.Node.get_addons', get_addons), \
+                    mock.patch.object(settings, 'HGRID_ADDON_WORKERS', workers), \
+                    timed() as timer:
+                rubeus.NodeFileCollector(project, auth).to_hgrid()
+            rows.append((name, workers, '{:.2f}'.format(timer.elapsed)))
+        print_results(
+            'Files page of {} nodes with {} addons each'.format(COMPONENTS + 1, ADDONS),
+            rows,
+            ('strategy', 'workers', 'seconds'),
+        )
+
+
+if __name__ == '__main__':
+    main()
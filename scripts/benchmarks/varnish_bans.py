@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Compare the number of BAN requests and the time spent banning for a bulk
+update of 100 nodes, with one BAN per url per object (the old behaviour) and
+with the request-wide coalesced bans.
+
+    python -m scripts.benchmarks.varnish_bans
+"""
+
+import mock
+import requests
+
+from api.caching import tasks
+from framework.postcommit_tasks.handlers import postcommit_before_request, postcommit_queue
+from scripts.benchmarks import StubServer, print_results, respond, timed
+
+NODE_COUNT = 100
+LATENCY = 0.005  # seconds spent by the stub per BAN
+
+
+class FakeNode(object):
+
+    def __init__(self, _id):
+        self.absolute_api_v2_url = 'http://localhost:8000/v2/nodes/{}/'.format(_id)
+
+
+def ban_one_by_one(instances):
+    # What api.caching used to do: one serial BAN per url per saved instance
+    for instance in instances:
+        urls, hostname = tasks.get_bannable_urls(instance)
+        for url in set(urls):
+            requests.request('BAN', url, timeout=1, headers=dict(Host=hostname))
+
+
+def ban_aggregated(instances):
+    postcommit_before_request()
+    for instance in instances:
+        tasks.enqueue_ban(instance)
+    for task in postcommit_queue().values():
+        task()
+
+
+def main():
+    nodes = [FakeNode('n{:04d}'.format(i)) for i in range(NODE_COUNT)]
+    rows = []
+    for name, func in (('one by one', ban_one_by_one), ('aggregated', ban_aggregated)):
+        with StubServer(lambda request: respond(request), latency=LATENCY) as server:
+            hosts = [server.url, server.url.replace('127.0.0.1', 'localhost')]
+            with mock.patch('website.settings.ENABLE_VARNISH', True), \
+                    mock.patch('website.settings.VARNISH_SERVERS', hosts), \
+                    mock.patch('website.settings.VARNISH_BAN_TIMEOUT', 1):
+                with timed() as timer:
+                    func(nodes)
+            rows.append((name, server.counts.get('BAN', 0), '{:.3f}'.format(timer.elapsed)))
+    print_results(
+        'Banning {} nodes from {} varnish servers'.format(NODE_COUNT, 2),
+        rows,
+        ('strategy', 'BAN requests', 'seconds'),
+    )
+
+
+if __name__ == '__main__':
+    main()
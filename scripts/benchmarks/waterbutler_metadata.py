@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Compare requests to WaterButler, writes and timings of listing a GitHub
+folder of 200 unchanged files 20 times, asking WaterButler and saving every file
+node on each listing (the old behaviour) and through the metadata cache,
+saving only file nodes whose metadata changed. WaterButler answers after
+200 ms.
+
+    python -m scripts.benchmarks.waterbutler_metadata
+"""
+import json
+import os
+
+import mock
+
+from scripts.benchmarks import StubServer, benchmark_database, print_results, respond, timed
+
+FILES = 200
+LISTINGS = 20
+LATENCY = 0.2
+
+METADATA = json.dumps({'data': [
+    {'attributes': {
+        'kind': 'file',
+        'name': 'file{}'.format(i),
+        'path': '/file{}'.format(i),
+        'materialized': '/file{}'.format(i),
+        'provider': 'github',
+        'etag': 'etag{}'.format(i),
+        'modified': None,
+        'size': 1024,
+        'extra': {},
+    }}
+    for i in range(FILES)
+]})
+
+
+def folder(request):
+    respond(request, body=METADATA, content_type='application/json')
+
+
+def main():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.base.settings')
+    with benchmark_database():
+        from website import settings
+        from website.files.models import FileNode, StoredFileNode
+        from website.models import Node
+        from api.nodes import utils
+        from api.nodes.views import WaterButlerMixin
+        from tests.factories import ProjectFactory, UserFactory
+        from tests.utils import count_queries
+
+        user = UserFactory()
+        project = ProjectFactory(creator=user)
+        request = mock.Mock(user=user, COOKIES={}, META={}, query_params={})
+
+        class Listing(WaterButlerMixin):
+            def __init__(self):
+                self.request = request
+
+            def get_node(self, check_object_permissions=True):
+                return project
+
+            def check_object_permissions(self, request, obj):
+                pass
+
+        def legacy_listing():
+            items = utils.request_waterbutler_metadata(project, '/', 'github', request)
+            for item in items:
+                attrs = item['attributes']
+                file_node = FileNode.resolve_class('github', FileNode.FILE).get_or_create(project, attrs['path'])
+                file_node.update(None, attrs, user=user)
+
+        def cached_listing():
+            items, _ = utils.get_waterbutler_metadata(project, '/', 'github', request)
+            Listing().get_file_items(items)
+
+        rows = []
+        for name, listing in (('every listing', legacy_listing), ('cached', cached_listing)):
+            StoredFileNode.remove()
+            utils.metadata_cache.clear()
+            with StubServer(folder, latency=LATENCY) as server, \
+                    mock.patch.object(settings, 'WATERBUTLER_URL', server.url), \
+                    mock.patch.object(settings, 'WATERBUTLER_METADATA_CACHE_ENABLED', True), \
+                    mock.patch.object(Node, 'get_addon', return_value=mock.Mock(configured=True)):
+                listing()  # Creates the file nodes
+                with count_queries() as counter, timed() as timer:
+                    for _ in range(LISTINGS - 1):
+                        listing()
+            writes = sum(1 for query in counter.queries if query[1] != 'find')
+            rows.append((name, server.counts.get('GET', 0), writes, '{:.2f}'.format(timer.elapsed * 1000 / (LISTINGS - 1))))
+        print_results(
+            '{} listings of {} unchanged files'.format(LISTINGS, FILES),
+            rows,
+            ('strategy', 'WaterButler requests', 'writes', 'ms/listing'),
+        )
+
+
+if __name__ == '__main__':
+    main()
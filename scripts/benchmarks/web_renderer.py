@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Compare view calls and timings of rendering a page embedding 300 templates
+that ask for 30 distinct URLs, calling the view of every embed and replacing
+each embed with a scan of the whole page (the old behaviour) and with view
+calls memoized per request and a single splicing pass. Views take 2 ms.
+
+    python -m scripts.benchmarks.web_renderer
+"""
+import shutil
+import tempfile
+import time
+
+import lxml.html
+import mock
+
+from scripts.benchmarks import print_results, timed
+
+EMBEDS = 300
+URLS = 30
+VIEW_LATENCY = 0.002
+
+EMBED = '''<div class="row">
+    <p>Component {i} of a project with a description long enough to be realistic.</p>
+    <div mod-meta='{{"tpl": "child.html", "uri": "/api/v1/project/node{url}/summary/", "replace": true}}'></div>
+</div>
+'''
+
+
+def view(url, view_kwargs=None):
+    time.sleep(VIEW_LATENCY)
+    return {'title': url}
+
+
+def main():
+    from framework import routing
+    from framework.flask import app
+    from framework.routing import WebRenderer, render_mako_string
+
+    class LegacyWebRenderer(WebRenderer):
+
+        def _render(self, data, template_name=None):
+            rendered = self.renderer(self.template_dir, template_name or self.template_name, data, trust=self.trust)
+            html = lxml.html.fragment_fromstring(rendered, create_parent='remove')
+            for element in html.findall('.//*[@mod-meta]'):
+                template_rendered, _ = self.render_element(element, data)
+                rendered = rendered.replace(lxml.html.tostring(element), template_rendered)
+            return rendered
+
+    template_dir = tempfile.mkdtemp()
+    try:
+        with open('{}/parent.html'.format(template_dir), 'w') as fp:
+            fp.write(''.join(EMBED.format(i=i, url=i % URLS) for i in range(EMBEDS)))
+        with open('{}/child.html'.format(template_dir), 'w') as fp:
+            fp.write('<span>${title}</span>')
+
+        rows = []
+        for name, renderer_class, memoized in (
+            ('every embed', LegacyWebRenderer, False),
+            ('memoized, one pass', WebRenderer, True),
+        ):
+            renderer = renderer_class('parent.html', render_mako_string, template_dir=template_dir)
+            # Without a request context to memoize them on, every embed calls its view
+            request_ctx_stack = routing._request_ctx_stack if memoized else mock.Mock(top=None)
+            with app.test_request_context(), mock.patch('framework.routing.call_url', side_effect=view):
+                renderer({})  # Compiles the templates
+            with app.test_request_context(), \
+                    mock.patch('framework.routing.call_url', side_effect=view) as mock_call_url, \
+                    mock.patch('framework.routing._request_ctx_stack', request_ctx_stack), \
+                    timed() as timer:
+                renderer({})
+            rows.append((name, mock_call_url.call_count, '{:.3f}'.format(timer.elapsed)))
+        print_results(
+            'Page embedding {} templates of {} URLs'.format(EMBEDS, URLS),
+            rows,
+            ('strategy', 'view calls', 'seconds'),
+        )
+    finally:
+        shutil.rmtree(template_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Compare timings of rendering large, code-heavy wiki pages on every view (the
+old behaviour) and through the render cache, as a page view, a comment and a
+search update of the node would.
+
+    python -m scripts.benchmarks.wiki_render
+"""
+from scripts.benchmarks import benchmark_database, print_results, timed
+
+PAGES = 20
+VIEWS = 10
+SECTION = '''
+## Section {i}
+
+Some *text* linking to [[page {i}]] and http://example.com/{i}.
+
+```python
+def function_{i}(values):
+    """Sum the squares of values"""
+    return sum(value ** 2 for value in values if value % {i} == 0)
+```
+'''
+
+
+def main():
+    with benchmark_database():
+        from framework.auth import Auth
+        from website.addons.wiki import render_cache
+        from tests.factories import AuthUserFactory, ProjectFactory
+
+        user = AuthUserFactory()
+        project = ProjectFactory(creator=user)
+        content = ''.join(SECTION.format(i=i) for i in range(1, 101))
+        for i in range(PAGES):
+            project.update_node_wiki('page {}'.format(i), content, Auth(user))
+        pages = [project.get_wiki_page('page {}'.format(i)) for i in range(PAGES)]
+
+        rows = []
+        for name, before_view in (
+            ('render on every view', render_cache.cache.clear),
+            ('cached', lambda: None),
+        ):
+            render_cache.cache.clear()
+            with timed() as timer:
+                for _ in range(VIEWS):
+                    for page in pages:
+                        before_view()
+                        page.html(project)
+                        before_view()
+                        page.raw_text(project)
+            rows.append((name, '{:.2f}'.format(timer.elapsed * 1000 / (VIEWS * PAGES))))
+        print_results(
+            '{} views of {} pages of {} KB'.format(VIEWS, PAGES, len(content) / 1024),
+            rows,
+            ('strategy', 'ms/view'),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Unset the root target of comments on files and wiki pages that were deleted
+before comments were hidden on deletion (see `Comment.hide_for_deleted_target`),
+so that comment lists no longer need to check the target of every comment.
+"""
+import sys
+import logging
+
+from modularodm import Q
+
+from framework.transactions.context import TokuTransaction
+from scripts import utils as script_utils
+from website.app import init_app
+from website.project.model import Comment
+
+logger = logging.getLogger(__name__)
+
+
+def get_deleted_root_target_ids():
+    comments = Comment.find(Q('page', 'in', [Comment.FILES, Comment.WIKI]) & Q('root_target', 'ne', None))
+    root_target_ids = set()
+    for comment in comments:
+        root_target = comment.root_target
+        if root_target._id not in root_target_ids and (root_target.referent is None or root_target.referent.is_deleted):
+            root_target_ids.add(root_target._id)
+    return root_target_ids
+
+
+def do_migration():
+    root_target_ids = get_deleted_root_target_ids()
+    for root_target_id in root_target_ids:
+        Comment.hide_for_deleted_target(root_target_id)
+    logger.info('Hid the comments on {} deleted files and wiki pages'.format(len(root_target_ids)))
+
+
+def main(dry=True):
+    init_app(set_backends=True, routes=False)
+    with TokuTransaction():
+        do_migration()
+        if dry:
+            raise Exception('Abort Transaction - Dry Run')
+
+
+if __name__ == '__main__':
+    dry = '--dry' in sys.argv
+    if not dry:
+        script_utils.add_file_logger(logger, __file__)
+    main(dry=dry)
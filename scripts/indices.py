@@ -37,6 +37,10 @@ db['node'].create_index([
     ('institution_id', ASCENDING),
 ])
 
+db['searchindexqueue'].create_index([
+    ('enqueued', ASCENDING),
+])
+
 # mongodb does not support indexes on parallel array's
 #
 # db['node'].create_index([
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Populate `materialized_path` and `ancestor_ids` of existing OSF Storage file nodes.
+
+OSF Storage used to store an empty materialized path and compute it by loading
+every ancestor of a file node. Lineages are computed in memory from the stored
+`parent` links, and only file nodes whose stored lineage differs are written.
+"""
+import sys
+import logging
+
+from framework.transactions.context import TokuTransaction
+from scripts import utils as script_utils
+from scripts.populate_node_ancestors import get_lineages
+from website.app import init_app
+from website.files.models import StoredFileNode
+
+logger = logging.getLogger(__name__)
+
+
+def get_materialized_path(file_node_id, lineage, documents):
+    if not lineage:
+        return '/'
+    names = [documents[_id]['name'] for _id in lineage[1:]] + [documents[file_node_id]['name']]
+    path = '/' + '/'.join(names)
+    return path if documents[file_node_id]['is_file'] else path + '/'
+
+
+def do_migration():
+    collection = StoredFileNode._storage[0].store
+    documents = {
+        document['_id']: document
+        for document in collection.find(
+            {'provider': 'osfstorage'},
+            {'parent': True, 'name': True, 'is_file': True, 'materialized_path': True, 'ancestor_ids': True},
+        )
+    }
+    parents = {_id: document.get('parent') for _id, document in documents.iteritems()}
+
+    count = 0
+    for file_node_id, lineage in get_lineages(parents).iteritems():
+        document = documents[file_node_id]
+        if document.get('parent') and not lineage:
+            logger.warn('Skipping {}, its parent {} does not exist'.format(file_node_id, document['parent']))
+            continue
+        materialized_path = get_materialized_path(file_node_id, lineage, documents)
+        if document.get('materialized_path') != materialized_path or (document.get('ancestor_ids') or []) != lineage:
+            collection.update(
+                {'_id': file_node_id},
+                {'$set': {'materialized_path': materialized_path, 'ancestor_ids': lineage}},
+            )
+            count += 1
+    logger.info('Updated lineages of {} of {} file nodes'.format(count, len(documents)))
+
+
+def main(dry=True):
+    init_app(set_backends=True, routes=False)
+    with TokuTransaction():
+        do_migration()
+        if dry:
+            raise Exception('Abort Transaction - Dry Run')
+
+
+if __name__ == '__main__':
+    dry = '--dry' in sys.argv
+    if not dry:
+        script_utils.add_file_logger(logger, __file__)
+    main(dry=dry)
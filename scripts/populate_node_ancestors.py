@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Populate `Node.ancestor_ids` for existing nodes.
+
+The lineage of every node is computed in memory from the stored `parent_node`
+links, and only nodes whose stored lineage differs are written. Once every node
+has been written, subtree lookups start using the lineage (see
+`website.project.ancestor_index`).
+"""
+import sys
+import logging
+
+from framework.mongo import database as db
+from framework.transactions.context import TokuTransaction
+from scripts import utils as script_utils
+from website.app import init_app
+from website.project import ancestor_index
+
+logger = logging.getLogger(__name__)
+
+
+def get_lineages(parents):
+    """Map every node id to the ids of its ancestors, root first.
+
+    :param dict parents: node id => parent node id (or None)
+    """
+    lineages = {}
+    for node_id in parents:
+        path = []
+        current = node_id
+        while current is not None and current not in lineages:
+            path.append(current)
+            current = parents.get(current)
+            if current not in parents:
+                current = None
+            elif current in path:
+                logger.error('Cycle in node tree at {}'.format(current))
+                current = None
+        lineage = list(lineages[current]) + [current] if current is not None else []
+        for _id in reversed(path):
+            lineages[_id] = lineage
+            lineage = lineage + [_id]
+    return lineages
+
+
+def do_migration():
+    documents = db.node.find({}, {'parent_node': True, 'ancestor_ids': True})
+    parents, current = {}, {}
+    for document in documents:
+        parents[document['_id']] = document.get('parent_node')
+        current[document['_id']] = document.get('ancestor_ids') or []
+
+    count = 0
+    for node_id, lineage in get_lineages(parents).iteritems():
+        if current[node_id] != lineage:
+            db.node.update({'_id': node_id}, {'$set': {'ancestor_ids': lineage}})
+            count += 1
+    logger.info('Updated ancestors of {} of {} nodes'.format(count, len(parents)))
+    ancestor_index.mark_populated()
+
+
+def main(dry=True):
+    init_app(set_backends=True, routes=False)
+    with TokuTransaction():
+        do_migration()
+        if dry:
+            raise Exception('Abort Transaction - Dry Run')
+
+
+if __name__ == '__main__':
+    dry = '--dry' in sys.argv
+    if not dry:
+        script_utils.add_file_logger(logger, __file__)
+    main(dry=dry)
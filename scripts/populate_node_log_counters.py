@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Populate the log counters (see `website.project.log_counters`) of existing
+nodes.
+
+Logs are read once, in order of node from the (node, date) index, and the
+counter of every node with logs is set to its number of logs and the date of
+its latest one.
+"""
+import sys
+import itertools
+import logging
+import operator
+
+from framework.mongo import database as db
+from framework.transactions.context import TokuTransaction
+from scripts import utils as script_utils
+from website.app import init_app
+from website.project import log_counters
+
+logger = logging.getLogger(__name__)
+
+
+def do_migration():
+    logs = db.nodelog.find({'node': {'$ne': None}}, {'node': True, 'date': True}).sort([('node', 1), ('date', -1)])
+    count = 0
+    for node_id, node_logs in itertools.groupby(logs, key=operator.itemgetter('node')):
+        latest = next(node_logs)
+        log_counters.reset(node_id, 1 + sum(1 for _ in node_logs), latest.get('date'))
+        count += 1
+    logger.info('Populated the log counters of {} nodes'.format(count))
+
+
+def main(dry=True):
+    init_app(set_backends=True, routes=False)
+    with TokuTransaction():
+        do_migration()
+        if dry:
+            raise Exception('Abort Transaction - Dry Run')
+
+
+if __name__ == '__main__':
+    dry = '--dry' in sys.argv
+    if not dry:
+        script_utils.add_file_logger(logger, __file__)
+    main(dry=dry)
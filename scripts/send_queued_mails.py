@@ -30,11 +30,13 @@ def main(dry_run=True):
 
     logger.info('Emails being sent at {0}'.format(datetime.utcnow().isoformat()))
 
+    # Collect the mails to send them together on pooled connections
+    batch = mails.MailBatch()
     for mail in emails_to_be_sent:
         if not dry_run:
             with TokuTransaction():
                 try:
-                    sent_ = mail.send_mail()
+                    sent_ = mail.send_mail(mailer=batch)
                     message = 'Email of type {0} sent to {1}'.format(mail.email_type, mail.to_addr) if sent_ else \
                         'Email of type {0} failed to be sent to {1}'.format(mail.email_type, mail.to_addr)
                     logger.info(message)
@@ -44,6 +46,7 @@ def main(dry_run=True):
                     pass
         else:
             logger.info('Email of type {} will be sent to {}'.format(mail.email_type, mail.to_addr))
+    batch.send()
 
 
 def find_queued_mails_ready_to_be_sent():
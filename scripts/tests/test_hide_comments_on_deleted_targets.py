@@ -0,0 +1,34 @@
+from nose.tools import *  # flake8: noqa
+
+from website.project.model import Comment
+
+from scripts.hide_comments_on_deleted_targets import do_migration
+from api_tests import utils as test_utils
+from tests.base import OsfTestCase
+from tests.factories import CommentFactory, ProjectFactory
+
+
+class TestHideCommentsOnDeletedTargets(OsfTestCase):
+
+    def test_do_migration(self):
+        project = ProjectFactory()
+        deleted_file = test_utils.create_test_file(project, project.creator, filename='deleted')
+        kept_file = test_utils.create_test_file(project, project.creator, filename='kept')
+        deleted_comment = CommentFactory(node=project, target=deleted_file.get_guid(), page='files')
+        kept_comment = CommentFactory(node=project, target=kept_file.get_guid(), page='files')
+        node_comment = CommentFactory(node=project, page='node')
+        guid = deleted_file.get_guid()
+
+        # Comments on files deleted before their root target was unset on deletion
+        deleted_file.delete()
+        Comment._storage[0].store.update(
+            {'_id': deleted_comment._id},
+            {'$set': {'root_target': [guid._id, 'guid']}}
+        )
+        Comment._clear_caches()
+
+        do_migration()
+
+        assert_is_none(Comment.load(deleted_comment._id).root_target)
+        assert_equal(Comment.load(kept_comment._id).root_target._id, kept_file.get_guid()._id)
+        assert_equal(Comment.load(node_comment._id).root_target._id, project._id)
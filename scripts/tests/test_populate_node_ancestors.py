@@ -0,0 +1,31 @@
+from nose.tools import *  # flake8: noqa
+
+from website.project import ancestor_index
+from website.project.model import Node
+
+from scripts.populate_node_ancestors import do_migration, get_lineages
+from tests.base import OsfTestCase
+from tests.factories import NodeFactory, ProjectFactory
+
+
+class TestPopulateNodeAncestors(OsfTestCase):
+
+    def test_get_lineages(self):
+        lineages = get_lineages({'a': None, 'b': 'a', 'c': 'b', 'x': 'missing'})
+        assert_equal(lineages, {'a': [], 'b': ['a'], 'c': ['a', 'b'], 'x': []})
+
+    def test_do_migration(self):
+        project = ProjectFactory()
+        child = NodeFactory(parent=project)
+        grandchild = NodeFactory(parent=child)
+        Node._storage[0].store.update({}, {'$set': {'ancestor_ids': []}}, multi=True)
+        Node._clear_caches()
+
+        assert_false(ancestor_index.is_populated())
+
+        do_migration()
+
+        assert_equal(Node.load(child._id).ancestor_ids, [project._id])
+        assert_equal(Node.load(grandchild._id).ancestor_ids, [project._id, child._id])
+        assert_true(ancestor_index.is_populated())
+        ancestor_index._populated = False
@@ -0,0 +1,29 @@
+import datetime
+
+from nose.tools import *  # flake8: noqa
+
+from website.project import log_counters
+
+from scripts.populate_node_log_counters import do_migration
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+
+
+class TestPopulateNodeLogCounters(OsfTestCase):
+
+    def test_do_migration(self):
+        project = ProjectFactory()
+        project.add_log('file_added', params={'node': project._id}, auth=None)
+        other = ProjectFactory()
+        log_counters._collection().remove({})
+
+        do_migration()
+
+        counters = {counter['_id']: counter for counter in log_counters._collection().find()}
+        assert_equal(counters[project._id]['count'], len(project.logs))
+        assert_equal(counters[other._id]['count'], len(other.logs))
+        assert_almost_equal(
+            counters[project._id]['last_logged'],
+            project.logs[-1].date,
+            delta=datetime.timedelta(milliseconds=1)
+        )
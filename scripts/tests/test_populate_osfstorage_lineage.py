@@ -0,0 +1,31 @@
+from nose.tools import *  # flake8: noqa
+
+from website.files.models import OsfStorageFile, StoredFileNode
+
+from scripts.osfstorage.populate_lineage import do_migration
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+
+
+class TestPopulateOsfStorageLineage(OsfTestCase):
+
+    def test_do_migration(self):
+        project = ProjectFactory()
+        root = project.get_addon('osfstorage').get_root()
+        folder = root.append_folder('Cloud')
+        child = folder.append_file('Carp')
+        StoredFileNode._storage[0].store.update(
+            {'provider': 'osfstorage'},
+            {'$set': {'materialized_path': '', 'ancestor_ids': []}},
+            multi=True,
+        )
+        StoredFileNode._clear_caches()
+
+        do_migration()
+
+        stored = StoredFileNode._storage[0].store.find_one({'_id': child._id})
+        assert_equal(stored['materialized_path'], '/Cloud/Carp')
+        assert_equal(stored['ancestor_ids'], [root._id, folder._id])
+        assert_equal(StoredFileNode._storage[0].store.find_one({'_id': folder._id})['materialized_path'], '/Cloud/')
+        assert_equal(StoredFileNode._storage[0].store.find_one({'_id': root._id})['materialized_path'], '/')
+        assert_equal(OsfStorageFile.load(child._id).materialized_path, '/Cloud/Carp')
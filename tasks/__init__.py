@@ -412,10 +412,10 @@ def elasticsearch(ctx):
         print('Your system is not recognized, you will have to start elasticsearch manually')
 
 @task
-def migrate_search(ctx, delete=False, index=settings.ELASTIC_INDEX):
-    """Migrate the search-enabled models."""
+def migrate_search(ctx, delete=False, index=settings.ELASTIC_INDEX, workers=None, resume=False, chunk_size=500):
+    """Migrate the search-enabled models. Pass --workers to reindex in parallel."""
     from website.search_migration.migrate import migrate
-    migrate(delete, index=index)
+    migrate(delete, index=index, workers=int(workers) if workers else None, resume=resume, chunk_size=int(chunk_size))
 
 
 @task
@@ -5,12 +5,16 @@ Unit tests for analytics logic in framework/analytics/__init__.py
 
 import unittest
 
+import mock
+
 from nose.tools import *  # flake8: noqa  (PEP8 asserts)
 from flask import Flask
 
 from datetime import datetime
 
 from framework import analytics, sessions
+from framework.analytics import counter_buffer
+from framework.analytics.visits import VisitFilter, record_visit
 from framework.sessions import session
 
 from tests.base import OsfTestCase
@@ -40,6 +44,59 @@ class TestAnalytics(OsfTestCase):
         assert_equal(user.get_activity_points(db=self.db), 1)
 
 
+class TestVisitFilter(unittest.TestCase):
+
+    def test_added_pages_are_found(self):
+        visits = VisitFilter()
+        pages = ['node:{}'.format(i) for i in range(500)]
+        for page in pages:
+            visits.add(page)
+        decoded = VisitFilter(visits.encode())
+        for page in pages:
+            assert_in(page, decoded)
+
+    def test_false_positives_are_rare(self):
+        visits = VisitFilter()
+        for i in range(500):
+            visits.add('node:{}'.format(i))
+        false_positives = sum('file:{}'.format(i) in visits for i in range(1000))
+        assert_less(false_positives, 20)
+
+    def test_encoded_size_is_fixed(self):
+        visits = VisitFilter()
+        empty_size = len(visits.encode())
+        for i in range(5000):
+            visits.add('node:{}'.format(i))
+        assert_equal(len(visits.encode()), empty_size)
+
+
+class TestRecordVisit(unittest.TestCase):
+
+    def test_first_and_repeat_visits(self):
+        data = {}
+        assert_equal(record_visit(data, 'node:abc12', '2016/05/04'), (True, True))
+        assert_equal(record_visit(data, 'node:abc12', '2016/05/04'), (False, False))
+        assert_equal(record_visit(data, 'node:def34', '2016/05/04'), (True, True))
+
+    def test_daily_rollover(self):
+        data = {}
+        record_visit(data, 'node:abc12', '2016/05/04')
+        assert_equal(record_visit(data, 'node:abc12', '2016/05/05'), (False, True))
+        assert_equal(data['visits']['date'], '2016/05/05')
+        assert_equal(record_visit(data, 'node:abc12', '2016/05/05'), (False, False))
+
+    def test_legacy_page_lists_are_folded_in(self):
+        data = {
+            'visited': ['node:abc12', 'node:def34'],
+            'visited_by_date': {'date': '2016/05/04', 'pages': ['node:abc12']},
+        }
+        assert_equal(record_visit(data, 'node:abc12', '2016/05/04'), (False, False))
+        assert_equal(record_visit(data, 'node:def34', '2016/05/04'), (False, True))
+        assert_not_in('visited', data)
+        assert_not_in('visited_by_date', data)
+        assert_in('node:abc12', VisitFilter(data['visits']['all']))
+
+
 class UpdateCountersTestCase(OsfTestCase):
 
     def setUp(self):
@@ -81,7 +138,7 @@ class TestUpdateCounters(UpdateCountersTestCase):
 
         page = 'download:{0}:{1}'.format(self.node, self.fid)
 
-        session.data['visited'].append(page)
+        assert_in(page, VisitFilter(session.data['visits']['all']))
         download_file_(node=self.node, fid=self.fid)
 
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, self.fid), db=self.db)
@@ -102,7 +159,7 @@ class TestUpdateCounters(UpdateCountersTestCase):
 
         page = 'download:{0}:{1}'.format(self.node, self.fid)
 
-        session.data['visited'].append(page)
+        assert_in(page, VisitFilter(session.data['visits']['all']))
         session.data['auth_user_id'] = self.userid
         download_file_(node=self.node, fid=self.fid)
 
@@ -124,7 +181,7 @@ class TestUpdateCounters(UpdateCountersTestCase):
 
         page = 'download:{0}:{1}'.format(self.node, self.fid)
 
-        session.data['visited'].append(page)
+        assert_in(page, VisitFilter(session.data['visits']['all']))
         session.data['auth_user_id'] = "asv12uey821vavshl"
         download_file_(node=self.node, fid=self.fid)
 
@@ -146,7 +203,7 @@ class TestUpdateCounters(UpdateCountersTestCase):
 
         page = 'download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid)
 
-        session.data['visited'].append(page)
+        assert_in(page, VisitFilter(session.data['visits']['all']))
         download_file_version_(node=self.node, fid=self.fid, vid=self.vid)
 
         count = analytics.get_basic_counters('download:{0}:{1}:{2}'.format(self.node, self.fid, self.vid), db=self.db)
@@ -183,7 +240,7 @@ class TestUpdateCounters(UpdateCountersTestCase):
 
         page = 'download:{0}:{1}'.format(self.node, fid1)
 
-        session.data['visited'].append(page)
+        assert_in(page, VisitFilter(session.data['visits']['all']))
         download_file_(node=self.node, fid=fid1)
         download_file_(node=self.node, fid=fid2)
 
@@ -191,3 +248,58 @@ class TestUpdateCounters(UpdateCountersTestCase):
         assert_equal(count, (1, 2))
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node, fid2), db=self.db)
         assert_equal(count, (1, 1))
+
+
+class TestCounterBuffer(OsfTestCase):
+
+    def setUp(self):
+        super(TestCounterBuffer, self).setUp()
+        self.buffer = counter_buffer.CounterBuffer(flush_interval=60, max_keys=100)
+        self.patches = [
+            mock.patch('website.settings.ANALYTICS_BUFFER_ENABLED', True),
+            mock.patch.object(counter_buffer, 'counter_buffer', self.buffer),
+            mock.patch.object(counter_buffer.CounterBuffer, '_ensure_flusher'),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.collection = self.db['pagecounters']
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        super(TestCounterBuffer, self).tearDown()
+
+    def test_increments_are_merged_per_key(self):
+        for _ in range(10):
+            counter_buffer.increment(self.collection, 'node:abc12', {'total': 1, 'unique': 0})
+        counter_buffer.increment(self.collection, 'node:def34', {'total': 1})
+        assert_is_none(self.collection.find_one({'_id': 'node:abc12'}))
+        with mock.patch.object(self.buffer, '_write', wraps=self.buffer._write) as mock_write:
+            assert_equal(self.buffer.flush(), 2)
+        assert_equal(mock_write.call_count, 1)
+        assert_equal(self.collection.find_one({'_id': 'node:abc12'})['total'], 10)
+        assert_equal(self.collection.find_one({'_id': 'node:def34'})['total'], 1)
+        assert_equal(self.buffer.flush(), 0)
+
+    def test_readers_see_pending_increments(self):
+        self.collection.update({'_id': 'node:abc12'}, {'$inc': {'total': 5, 'unique': 3}}, upsert=True)
+        counter_buffer.increment(self.collection, 'node:abc12', {'total': 2, 'unique': 1})
+        counter_buffer.increment(self.collection, 'node:def34', {'total': 1, 'unique': 1})
+        assert_equal(analytics.get_basic_counters('node:abc12', db=self.db), (4, 7))
+        assert_equal(analytics.get_basic_counters('node:def34', db=self.db), (1, 1))
+        self.buffer.flush()
+        assert_equal(analytics.get_basic_counters('node:abc12', db=self.db), (4, 7))
+
+    def test_flushes_when_full(self):
+        for i in range(100):
+            counter_buffer.increment(self.collection, 'node:{}'.format(i), {'total': 1})
+        assert_equal(self.collection.count(), 100)
+        assert_equal(self.buffer.stats['flushes'], 1)
+
+    def test_failed_writes_are_kept(self):
+        counter_buffer.increment(self.collection, 'node:abc12', {'total': 1})
+        with mock.patch.object(self.buffer, '_write', side_effect=Exception('down')):
+            assert_equal(self.buffer.flush(), 0)
+        counter_buffer.increment(self.collection, 'node:abc12', {'total': 1})
+        self.buffer.flush()
+        assert_equal(self.collection.find_one({'_id': 'node:abc12'})['total'], 2)
@@ -0,0 +1,85 @@
+"""
+Tests for the process-wide MongoDB client pool in framework.mongo.handlers
+"""
+import gc
+import threading
+from unittest import TestCase
+
+import mock
+from nose.tools import *  # flake8: noqa
+
+from framework.mongo.handlers import ClientPool
+
+
+class Owner(object):
+    pass
+
+
+@mock.patch('framework.mongo.handlers.pymongo.MongoClient')
+class TestClientPool(TestCase):
+
+    def test_acquire_is_idempotent_per_owner(self, mock_client):
+        pool = ClientPool(MAX_CLIENTS=2, wait_timeout=0)
+        owner = Owner()
+        assert_is(pool.acquire(owner), pool.acquire(owner))
+        assert_equal(pool.get_status()['in_use'], 1)
+        mock_client.return_value.start_request.assert_called_once_with()
+
+    def test_single_client_is_shared(self, mock_client):
+        pool = ClientPool(MAX_CLIENTS=2, wait_timeout=0)
+        first, second = Owner(), Owner()
+        assert_is(pool.acquire(first), pool.acquire(second))
+        assert_equal(mock_client.call_count, 1)
+        assert_equal(mock_client.call_args[1]['max_pool_size'], 2)
+
+    def test_release_ends_request_and_frees_slot(self, mock_client):
+        pool = ClientPool(MAX_CLIENTS=1, wait_timeout=0)
+        owner = Owner()
+        pool.acquire(owner)
+        pool.release(owner)
+        mock_client.return_value.end_request.assert_called_once_with()
+        assert_equal(pool.get_status()['in_use'], 0)
+
+    def test_extraneous_release(self, mock_client):
+        pool = ClientPool(MAX_CLIENTS=1, wait_timeout=0)
+        with assert_raises(ClientPool.ExtraneousReleaseError):
+            pool.release(Owner())
+
+    def test_exhausted_pool_times_out(self, mock_client):
+        pool = ClientPool(MAX_CLIENTS=1, wait_timeout=0.01)
+        first, second = Owner(), Owner()
+        pool.acquire(first)
+        with assert_raises(ClientPool.PoolExhaustedError):
+            pool.acquire(second)
+        assert_equal(pool.get_status()['exhausted'], 1)
+
+    def test_waiter_gets_released_slot(self, mock_client):
+        pool = ClientPool(MAX_CLIENTS=1, wait_timeout=5)
+        first = Owner()
+        pool.acquire(first)
+        timer = threading.Timer(0.05, pool.release, args=(first, ))
+        timer.start()
+        pool.acquire(Owner())
+        timer.join()
+        status = pool.get_status()
+        assert_equal(status['in_use'], 1)
+        assert_greater(status['acquire_wait_max'], 0)
+
+    def test_dead_owner_lease_is_reclaimed(self, mock_client):
+        pool = ClientPool(MAX_CLIENTS=1, wait_timeout=0)
+        owner = Owner()
+        pool.acquire(owner)
+        del owner
+        gc.collect()
+        assert_equal(pool.get_status()['in_use'], 0)
+        assert_equal(pool.get_status()['reclaimed'], 1)
+        pool.acquire(Owner())
+
+    def test_idle_pool_is_disconnected(self, mock_client):
+        pool = ClientPool(MAX_CLIENTS=1, wait_timeout=0, idle_timeout=0)
+        owner = Owner()
+        pool.acquire(owner)
+        pool.release(owner)
+        pool.acquire(owner)
+        mock_client.return_value.disconnect.assert_called_once_with()
+        assert_equal(pool.get_status()['evicted'], 1)
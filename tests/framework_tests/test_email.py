@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import asyncore
+import smtpd
+import threading
 import unittest
 import smtplib
 
@@ -6,8 +9,9 @@ import mock
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
 import sendgrid
 
-from framework.email.tasks import send_email, _send_with_sendgrid
-from website import settings
+from framework.email import transport
+from framework.email.tasks import send_email, send_many, _send_with_sendgrid
+from website import mails, settings
 from tests.base import fake
 
 # Check if local mail server is running
@@ -76,5 +80,152 @@ class TestEmail(unittest.TestCase):
         assert_false(ret)
 
 
+
+class StubSMTPServer(smtpd.SMTPServer):
+    """SMTP server on a free local port keeping the messages it receives"""
+
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.messages = []
+
+    @property
+    def address(self):
+        return '{}:{}'.format(*self.socket.getsockname())
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.messages.append((mailfrom, rcpttos, data))
+
+
+def make_message(to_addr='baz@quux.com'):
+    return {
+        'from_addr': 'foo@bar.com',
+        'to_addr': to_addr,
+        'subject': 'no subject',
+        'message': '<h1>Greetings!</h1>',
+        'ttls': False,
+        'login': False,
+    }
+
+
+@mock.patch('website.settings.USE_EMAIL', True)
+@mock.patch('website.settings.SENDGRID_API_KEY', None)
+@mock.patch('website.settings.MAIL_SEND_CONCURRENCY', 1)
+class TestPooledSMTPTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubSMTPServer()
+        self.thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+        self.server_patch = mock.patch('website.settings.MAIL_SERVER', self.server.address)
+        self.server_patch.start()
+        transport.smtp_pool.clear()
+        self.stats = dict(transport.stats)
+
+    def tearDown(self):
+        transport.smtp_pool.clear()
+        self.server_patch.stop()
+        asyncore.close_all()
+        self.thread.join(1)
+
+    def opened(self):
+        return transport.stats['connections_opened'] - self.stats['connections_opened']
+
+    def test_send_many_reuses_connection(self):
+        results = send_many([make_message('user{}@quux.com'.format(i)) for i in range(5)])
+        assert_equal(results, [True] * 5)
+        assert_equal(len(self.server.messages), 5)
+        assert_equal(self.server.messages[0][1], ['user0@quux.com'])
+        assert_equal(self.opened(), 1)
+        assert_equal(transport.stats['sent'] - self.stats['sent'], 5)
+
+    @mock.patch('website.settings.MAIL_SMTP_MAX_MESSAGES', 2)
+    def test_connections_are_replaced_after_max_messages(self):
+        send_many([make_message() for _ in range(5)])
+        assert_equal(len(self.server.messages), 5)
+        assert_equal(self.opened(), 3)
+
+    def test_reconnects_after_connection_is_dropped(self):
+        assert_true(send_email(**make_message()))
+        connection = transport.smtp_pool._idle.values()[0][0]
+        connection.sock.close()
+
+        assert_true(send_email(**make_message()))
+        assert_equal(len(self.server.messages), 2)
+        assert_equal(self.opened(), 2)
+        assert_equal(transport.stats['reconnects'] - self.stats['reconnects'], 1)
+
+    @mock.patch('website.settings.MAIL_SEND_CONCURRENCY', 3)
+    def test_send_many_sends_concurrently(self):
+        results = send_many([make_message() for _ in range(6)])
+        assert_equal(results, [True] * 6)
+        assert_equal(len(self.server.messages), 6)
+        assert_less_equal(self.opened(), 3)
+
+    @mock.patch('framework.email.tasks._send')
+    def test_send_many_continues_after_failure(self, mock_send):
+        mock_send.side_effect = [True, Exception('Boom'), True]
+        results = send_many([make_message() for _ in range(3)])
+        assert_equal(results, [True, False, True])
+        assert_equal(transport.stats['failed'] - self.stats['failed'], 1)
+
+
+class TestMailBatch(unittest.TestCase):
+
+    @mock.patch('website.settings.USE_EMAIL', True)
+    @mock.patch('website.settings.USE_CELERY', False)
+    @mock.patch('framework.email.tasks.send_emails')
+    def test_batch_sends_collected_mails_together(self, mock_send_emails):
+        batch = mails.MailBatch()
+        mails.send_mail('foo@bar.com', mails.TEST, mailer=batch, name='Foo')
+        mails.send_mail('baz@quux.com', mails.TEST, mailer=batch, name='Baz')
+        assert_false(mock_send_emails.called)
+
+        batch.send()
+
+        messages = mock_send_emails.call_args[0][0]
+        assert_equal([message['to_addr'] for message in messages], ['foo@bar.com', 'baz@quux.com'])
+        assert_equal(batch.messages, [])
+
+    @mock.patch('website.settings.USE_EMAIL', True)
+    @mock.patch('website.settings.USE_CELERY', True)
+    @mock.patch('website.settings.MAIL_SEND_BATCH_SIZE', 2)
+    @mock.patch('framework.email.tasks.send_emails.apply_async')
+    def test_batch_is_split_into_tasks(self, mock_apply_async):
+        batch = mails.MailBatch()
+        for i in range(5):
+            mails.send_mail('user{}@quux.com'.format(i), mails.TEST, mailer=batch, name='Foo')
+        batch.send()
+        assert_equal(
+            [len(call[1]['kwargs']['messages']) for call in mock_apply_async.call_args_list],
+            [2, 2, 1],
+        )
+
+    @mock.patch('website.settings.USE_EMAIL', True)
+    @mock.patch('website.settings.USE_CELERY', True)
+    @mock.patch('website.settings.MAIL_SEND_BATCH_SIZE', 2)
+    @mock.patch('framework.email.tasks.send_emails.apply_async')
+    def test_link_is_called_after_the_task_sending_its_mails(self, mock_apply_async):
+        batch = mails.MailBatch()
+        for i in range(3):
+            mails.send_mail('user{}@quux.com'.format(i), mails.TEST, mailer=batch, name='Foo')
+        batch.send(link=lambda start, stop: (start, stop))
+        assert_equal(
+            [call[1]['link'] for call in mock_apply_async.call_args_list],
+            [[(0, 2)], [(2, 3)]],
+        )
+
+    @mock.patch('website.settings.USE_EMAIL', True)
+    @mock.patch('website.settings.USE_CELERY', False)
+    @mock.patch('framework.email.tasks.send_emails')
+    def test_link_is_called_with_whether_each_mail_was_sent(self, mock_send_emails):
+        mock_send_emails.return_value = [True, False]
+        callback = mock.Mock()
+        batch = mails.MailBatch()
+        mails.send_mail('foo@bar.com', mails.TEST, mailer=batch, name='Foo')
+        mails.send_mail('baz@quux.com', mails.TEST, mailer=batch, name='Baz')
+        batch.send(link=lambda start, stop: callback)
+        callback.assert_called_once_with([True, False])
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,6 +9,7 @@ import os
 
 import flask
 from lxml.html import fragment_fromstring
+import mock
 import werkzeug.wrappers
 
 from framework.exceptions import HTTPError, http
@@ -319,6 +320,70 @@ class WebRendererTemplateTestCase(OsfTestCase):
         )
 
 
+    @mock.patch('framework.routing.call_url', return_value={})
+    def test_embeds_are_spliced_in_order(self, mock_call_url):
+        self.app.app.preprocess_request()
+
+        r = WebRenderer(
+            'nested_parent_many.html',
+            render_mako_string,
+            template_dir=TEMPLATES_PATH,
+        )
+
+        resp = r({})
+
+        self.assertEqual(resp.data.count('<p>child template content</p>'), 3)
+        self.assertNotIn('<div mod-meta', resp.data)
+        self.assertIn('"}\'><p>child template content</p></span>', resp.data)
+
+    @mock.patch('framework.routing.call_url', return_value={})
+    def test_embedded_urls_are_called_once_per_request(self, mock_call_url):
+        self.app.app.preprocess_request()
+
+        r = WebRenderer(
+            'nested_parent_many.html',
+            render_mako_string,
+            template_dir=TEMPLATES_PATH,
+        )
+
+        r({})
+
+        mock_call_url.assert_called_once_with('/api/v1/embedded/', view_kwargs={})
+
+    @mock.patch('framework.routing.call_url', return_value={})
+    def test_embedded_urls_are_not_memoized_across_requests(self, mock_call_url):
+        r = WebRenderer(
+            'nested_parent_many.html',
+            render_mako_string,
+            template_dir=TEMPLATES_PATH,
+        )
+
+        # Both requests are pushed within the app context of the test's request
+        for _ in range(2):
+            with self.app.app.test_request_context():
+                r({})
+
+        self.assertEqual(mock_call_url.call_count, 2)
+
+    @mock.patch('framework.routing.call_url', return_value={})
+    def test_embed_timings_are_recorded(self, mock_call_url):
+        self.app.app.preprocess_request()
+
+        r = WebRenderer(
+            'nested_parent_many.html',
+            render_mako_string,
+            template_dir=TEMPLATES_PATH,
+        )
+
+        r({})
+
+        timings = flask._request_ctx_stack.top.embed_timings
+        self.assertEqual([timing['memoized'] for timing in timings], [False, True, False])
+        self.assertEqual([timing['uri'] for timing in timings], ['/api/v1/embedded/', '/api/v1/embedded/', None])
+        for timing in timings:
+            self.assertGreaterEqual(timing['render'], 0)
+
+
 class JSONRendererEncoderTestCase(unittest.TestCase):
 
     def test_encode_custom_class(self):
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import mock
+import time
 import unittest
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
 import httpretty
@@ -202,6 +203,99 @@ class TestCASClient(OsfTestCase):
         assert 0
 
 
+@mock.patch('website.settings.CAS_TOKEN_CACHE_ENABLED', True)
+@mock.patch('framework.auth.cas.CasClient.profile')
+class TestCASTokenCache(OsfTestCase):
+
+    def setUp(self):
+        super(TestCASTokenCache, self).setUp()
+        cas.token_cache.clear()
+        self.response = cas.CasResponse(authenticated=True, user='abc12')
+
+    def test_profile_is_cached(self, mock_profile):
+        mock_profile.return_value = self.response
+        assert_equal(cas.get_profile('token'), self.response)
+        assert_equal(cas.get_profile('token'), self.response)
+        assert_equal(mock_profile.call_count, 1)
+        assert_equal(cas.token_cache.stats['hits'], 1)
+
+    @mock.patch('website.settings.CAS_TOKEN_CACHE_TTL', 0)
+    def test_profile_expires(self, mock_profile):
+        mock_profile.return_value = self.response
+        cas.get_profile('token')
+        with mock.patch('framework.auth.cas.time.time', return_value=time.time() + 1):
+            cas.get_profile('token')
+        assert_equal(mock_profile.call_count, 2)
+
+    def test_rejected_token_is_cached(self, mock_profile):
+        mock_profile.side_effect = cas.CasHTTPError(401, 'Unauthorized', {}, '')
+        for _ in range(2):
+            with assert_raises(cas.CasHTTPError):
+                cas.get_profile('token')
+        assert_equal(mock_profile.call_count, 1)
+        assert_equal(cas.token_cache.stats['negative_hits'], 1)
+
+    def test_cas_failure_is_not_cached(self, mock_profile):
+        mock_profile.side_effect = cas.CasHTTPError(502, 'Bad Gateway', {}, '')
+        for _ in range(2):
+            with assert_raises(cas.CasHTTPError):
+                cas.get_profile('token')
+        assert_equal(mock_profile.call_count, 2)
+
+    @mock.patch('website.settings.CAS_TOKEN_CACHE_SIZE', 2)
+    def test_least_recently_used_tokens_are_evicted(self, mock_profile):
+        mock_profile.return_value = self.response
+        for token in ('a', 'b', 'a', 'c', 'a'):
+            cas.get_profile(token)
+        assert_equal(mock_profile.call_count, 3)
+        assert_equal(cas.token_cache.stats['evictions'], 1)
+
+    @mock.patch('framework.auth.cas.requests.post')
+    def test_revoking_token_invalidates_it(self, mock_post, mock_profile):
+        mock_post.return_value = mock.Mock(status_code=204)
+        mock_profile.return_value = self.response
+        cas.get_profile('token')
+        cas.get_profile('other-token')
+        cas.get_client().revoke_tokens({'token': 'token'})
+        cas.get_profile('token')
+        cas.get_profile('other-token')
+        assert_equal(mock_profile.call_count, 3)
+
+    @mock.patch('framework.auth.cas.requests.post')
+    def test_revoking_application_tokens_clears_cache(self, mock_post, mock_profile):
+        mock_post.return_value = mock.Mock(status_code=204)
+        mock_profile.return_value = self.response
+        cas.get_profile('token')
+        cas.get_client().revoke_application_tokens('client_id', 'client_secret')
+        assert_equal(len(cas.token_cache), 0)
+
+
+    def test_token_revoked_by_another_process_is_not_served(self, mock_profile):
+        mock_profile.return_value = self.response
+        cas.get_profile('token')
+        cas.get_profile('other-token')
+        cas.TokenCache().revoke('token')
+        cas.get_profile('token')
+        cas.get_profile('other-token')
+        assert_equal(mock_profile.call_count, 3)
+
+    def test_application_tokens_revoked_by_another_process_are_not_served(self, mock_profile):
+        mock_profile.return_value = self.response
+        cas.get_profile('token')
+        cas.TokenCache().revoke()
+        cas.get_profile('token')
+        assert_equal(mock_profile.call_count, 2)
+
+    @mock.patch('framework.auth.cas.requests.post')
+    def test_failed_revocation_keeps_token_cached(self, mock_post, mock_profile):
+        mock_post.return_value = mock.Mock(status_code=500, headers={}, content='')
+        mock_profile.return_value = self.response
+        cas.get_profile('token')
+        with assert_raises(cas.CasHTTPError):
+            cas.get_client().revoke_tokens({'token': 'token'})
+        cas.get_profile('token')
+        assert_equal(mock_profile.call_count, 1)
+
 class TestCASTicketAuthentication(OsfTestCase):
 
     def setUp(self):
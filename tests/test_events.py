@@ -50,45 +50,6 @@ class TestEventNotImplemented(OsfTestCase):
         event = self.event.event_type
 
 
-class TestListOfFiles(OsfTestCase):
-    """
-    List files given a list
-    """
-    def setUp(self):
-        super(TestListOfFiles, self).setUp()
-        self.tree = {
-            'kind': 'folder',
-            'path': 'a',
-            'children': [
-                {
-                    'kind': 'folder',
-                    'path': 'b',
-                    'children': [
-                        {
-                            'kind': 'file',
-                            'path': 'e'
-                        },
-                        {
-                            'kind': 'file',
-                            'path': 'f'
-                        }
-                    ]
-                },
-                {
-                    'kind': 'file',
-                    'path': 'c'
-                },
-                {
-                    'kind': 'file',
-                    'path': 'd'
-                }
-            ]
-        }
-
-    def test_list_of_files(self):
-        assert_equal(['e', 'f', 'c', 'd'], utils.list_of_files(self.tree))
-
-
 class TestEventExists(OsfTestCase):
     # Add all possible called events here to ensure that the Event class can
     #  call them.
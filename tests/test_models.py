@@ -38,6 +38,7 @@ from website.profile.utils import serialize_user
 from website.project.tasks import on_node_updated
 from website.project.spam.model import SpamStatus
 from website.project.signals import contributor_added
+from website.project import log_counters
 from website.project.model import (
     Node, NodeLog, Pointer, ensure_schemas, has_anonymous_link,
     get_pointer_parent, MetaSchema, DraftRegistration
@@ -3428,6 +3429,56 @@ class TestProject(OsfTestCase):
 
         assert_equal(self.project.date_modified, self.project.date_created)
 
+    def test_log_count(self):
+        count = len(self.project.logs)
+        assert_equal(self.project.log_count, count)
+
+        self.project.add_log('file_added', params={'node': self.project._id}, auth=self.auth)
+
+        assert_equal(self.project.log_count, count + 1)
+        assert_equal(len(self.project.logs), count + 1)
+
+    def test_last_logged_keeps_latest_date(self):
+        latest = self.project.logs[-1].date
+        past = latest - datetime.timedelta(days=1)
+        self.project.add_log('file_added', params={'node': self.project._id}, auth=self.auth, log_date=past)
+
+        # Stored dates have millisecond precision
+        assert_almost_equal(self.project.date_modified, latest, delta=datetime.timedelta(milliseconds=1))
+        assert_almost_equal(self.project.last_logged, latest, delta=datetime.timedelta(milliseconds=1))
+
+    def test_add_log_does_not_load_logs(self):
+        self.project.log_count  # initialize the counter
+        with mock.patch.object(Node, 'logs', new_callable=mock.PropertyMock) as mock_logs:
+            self.project.add_log('file_added', params={'node': self.project._id}, auth=self.auth)
+        assert_false(mock_logs.called)
+
+    def test_log_counter_is_initialized_from_logs(self):
+        count = len(self.project.logs)
+        log_counters._collection().remove({'_id': self.project._id})
+
+        assert_equal(self.project.log_count, count)
+        self.project.add_log('file_added', params={'node': self.project._id}, auth=self.auth)
+        assert_equal(self.project.log_count, count + 1)
+
+    def test_last_logged_moves_forward(self):
+        later = self.project.last_logged + datetime.timedelta(days=1)
+        self.project.add_log('file_added', params={'node': self.project._id}, auth=self.auth, log_date=later)
+
+        assert_almost_equal(self.project.last_logged, later, delta=datetime.timedelta(milliseconds=1))
+
+    def test_concurrent_initialization_keeps_highest_count(self):
+        count = self.project.log_count
+        log_counters.reset(self.project._id, count + 5, self.project.last_logged)
+
+        log_counters.initialize(self.project._id)
+
+        assert_equal(self.project.log_count, count + 5)
+
+    def test_fork_counts_cloned_logs(self):
+        fork = self.project.fork_node(self.auth)
+        assert_equal(fork.log_count, len(fork.logs))
+
     def test_replace_contributor(self):
         contrib = UserFactory()
         self.project.add_contributor(contrib, auth=Auth(self.project.creator))
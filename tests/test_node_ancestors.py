@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Tests for the materialized node lineage (`Node.ancestor_ids`)."""
+from nose.tools import *  # flake8: noqa
+
+from framework.auth import Auth
+from website.project import ancestor_index
+from website.project.model import Node
+from website.util.permissions import ADMIN, READ
+
+from tests.base import OsfTestCase
+from tests.factories import AuthUserFactory, NodeFactory, ProjectFactory
+from tests.utils import count_queries
+
+
+class TestNodeAncestors(OsfTestCase):
+
+    def setUp(self):
+        super(TestNodeAncestors, self).setUp()
+        self.user = AuthUserFactory()
+        self.project = ProjectFactory(creator=self.user)
+        self.child = NodeFactory(creator=self.user, parent=self.project)
+        self.grandchild = NodeFactory(creator=self.user, parent=self.child)
+        ancestor_index.mark_populated()
+
+    def tearDown(self):
+        super(TestNodeAncestors, self).tearDown()
+        ancestor_index._populated = False
+
+    def test_ancestor_ids_are_set_on_save(self):
+        assert_equal(self.project.ancestor_ids, [])
+        assert_equal(self.child.ancestor_ids, [self.project._id])
+        assert_equal(self.grandchild.ancestor_ids, [self.project._id, self.child._id])
+
+    def test_parents_and_depth(self):
+        assert_equal(self.grandchild.parents, [self.child, self.project])
+        assert_equal(self.grandchild.depth, 2)
+        assert_equal(self.project.parents, [])
+        assert_equal(self.project.depth, 0)
+
+    def test_parents_is_a_single_query(self):
+        with count_queries() as counter:
+            self.grandchild.parents
+        assert_equal(counter.count, 1)
+
+    def test_is_admin_parent(self):
+        stranger = AuthUserFactory()
+        assert_true(self.grandchild.is_admin_parent(self.user))
+        assert_false(self.grandchild.is_admin_parent(stranger))
+        self.project.add_contributor(stranger, permissions=[READ, 'write', ADMIN], auth=Auth(self.user), save=True)
+        assert_true(self.grandchild.is_admin_parent(stranger))
+
+    def test_admin_contributor_ids_from_ancestors(self):
+        admin = AuthUserFactory()
+        self.project.add_contributor(admin, permissions=[READ, 'write', ADMIN], auth=Auth(self.user), save=True)
+        self.grandchild.reload()
+        assert_equal(self.grandchild.admin_contributor_ids, {admin._id})
+        assert_equal(self.grandchild.admin_contributors, [admin])
+
+    def test_get_primary_descendants_skips_deleted_branches(self):
+        sibling = NodeFactory(creator=self.user, parent=self.project)
+        self.child.is_deleted = True
+        self.child.save()
+        assert_equal(self.project.get_primary_descendants(), [sibling])
+
+    def test_has_permission_on_children(self):
+        contrib = AuthUserFactory()
+        assert_false(self.project.has_permission_on_children(contrib, READ))
+        self.grandchild.add_contributor(contrib, auth=Auth(self.user), save=True)
+        assert_true(self.project.has_permission_on_children(contrib, READ))
+
+    def test_find_readable_descendants(self):
+        contrib = AuthUserFactory()
+        self.grandchild.add_contributor(contrib, auth=Auth(self.user), save=True)
+        assert_equal(list(self.project.find_readable_descendants(Auth(contrib))), [self.grandchild])
+
+    def test_moving_a_subtree_updates_descendants(self):
+        other = ProjectFactory(creator=self.user)
+        self.project.nodes.remove(self.child)
+        self.project.save()
+        other.nodes.append(self.child)
+        other.save()
+        self.grandchild.reload()
+        assert_equal(self.grandchild.ancestor_ids, [other._id, self.child._id])
+
+    def test_fork_lineage(self):
+        fork = self.project.fork_node(Auth(self.user))
+        forked_child = fork.nodes[0]
+        assert_equal(forked_child.ancestor_ids, [fork._id])
+        assert_equal(forked_child.nodes[0].ancestor_ids, [fork._id, forked_child._id])
+
+
+class TestNodeAncestorsBeforeBackfill(OsfTestCase):
+
+    def setUp(self):
+        super(TestNodeAncestorsBeforeBackfill, self).setUp()
+        ancestor_index._populated = False
+        self.user = AuthUserFactory()
+        self.project = ProjectFactory(creator=self.user)
+        self.child = NodeFactory(creator=self.user, parent=self.project)
+        self.grandchild = NodeFactory(creator=self.user, parent=self.child)
+        # Nodes created before `ancestor_ids` existed
+        Node._storage[0].store.update({}, {'$set': {'ancestor_ids': []}}, multi=True)
+        Node._clear_caches()
+        self.project = Node.load(self.project._id)
+
+    def test_descendants_of_a_root_are_walked(self):
+        contrib = AuthUserFactory()
+        # Saving the grandchild indexes it, but not the child above it
+        Node.load(self.grandchild._id).add_contributor(contrib, auth=Auth(self.user), save=True)
+
+        assert_false(self.project._has_descendant_index)
+        assert_true(self.project.has_permission_on_children(contrib, READ))
+        assert_equal([node._id for node in self.project.find_readable_descendants(Auth(contrib))], [self.grandchild._id])
+        assert_equal(
+            [node._id for node in self.project.get_descendants_recursive()],
+            [self.child._id, self.grandchild._id]
+        )
@@ -13,7 +13,7 @@ from framework.auth import Auth
 from framework.auth.core import User
 from framework.guid.model import Guid
 
-from website.notifications.tasks import get_users_emails, send_users_email, group_by_node, remove_notifications
+from website.notifications.tasks import get_users_emails, iter_users_emails, send_users_email, group_by_node, remove_notifications
 from website.notifications import constants
 from website.notifications.model import NotificationDigest
 from website.notifications.model import NotificationSubscription
@@ -28,6 +28,7 @@ from website.util import web_url_for
 from tests import factories
 from tests.base import capture_signals
 from tests.base import OsfTestCase, NotificationTestCase
+from tests.utils import assert_max_queries, count_queries
 
 
 class TestNotificationsModels(OsfTestCase):
@@ -1196,6 +1197,53 @@ class TestCompileSubscriptions(NotificationTestCase):
         subs = emails.compile_subscriptions(node5, 'file_updated')
         assert_equal(subs, {'email_transactional': [], 'email_digest': [self.user_1._id], 'none': []})
 
+    def test_file_subscription_overrides_node_subscription(self):
+        self.shared_sub.email_transactional.append(self.user_1)
+        self.shared_sub.save()
+        file_sub = factories.NotificationSubscriptionFactory(
+            _id=self.shared_node._id + '_xyz42_file_updated',
+            owner=self.shared_node,
+            event_name='xyz42_file_updated'
+        )
+        file_sub.save()
+        file_sub.none.append(self.user_1)
+        file_sub.save()
+        subs = emails.compile_subscriptions(self.shared_node, 'file_updated', 'xyz42_file_updated')
+        assert_equal(subs, {'email_transactional': [], 'email_digest': [], 'none': [self.user_1._id]})
+
+    def test_admin_of_parent_is_notified_on_child(self):
+        # user_4 has no permission on the child but is an admin of the project above it
+        self.base_project.add_contributor(self.user_4, permissions='admin', save=True)
+        self.base_sub.email_digest.append(self.user_4)
+        self.base_sub.save()
+        node = factories.NodeFactory(parent=self.private_node)
+        subs = emails.compile_subscriptions(node, 'file_updated')
+        assert_equal(subs['email_digest'], [self.user_4._id])
+
+    def test_query_count_does_not_grow_with_depth_or_subscribers(self):
+        node = self.shared_node
+        for _ in range(4):
+            node = factories.NodeFactory(parent=node, creator=self.user_1)
+            subscription = factories.NotificationSubscriptionFactory(
+                _id=node._id + '_file_updated',
+                owner=node,
+                event_name='file_updated'
+            )
+            subscription.save()
+            for _ in range(5):
+                user = factories.UserFactory()
+                node.add_contributor(user, permissions='read', save=True)
+                subscription.email_transactional.append(user)
+            subscription.save()
+        Node._clear_caches()
+        User._clear_caches()
+        node = Node.load(node._id)
+        with count_queries() as counter:
+            subs = emails.compile_subscriptions(node, 'file_updated')
+        assert_equal(len(subs['email_transactional']), 5)
+        # One query for the ancestors and one for the subscriptions
+        assert_max_queries(counter, 2)
+
 
 class TestMoveSubscription(NotificationTestCase):
     def setUp(self):
@@ -1456,14 +1504,6 @@ class TestSendEmails(NotificationTestCase):
         mock_store.assert_called_with([self.project.creator._id], 'email_transactional', 'comments', user,
                                       self.node, time_now, target_user=user)
 
-    def test_check_node_node_none(self):
-        subs = emails.check_node(None, 'comments')
-        assert_equal(subs, {'email_transactional': [], 'email_digest': [], 'none': []})
-
-    def test_check_node_one(self):
-        subs = emails.check_node(self.project, 'comments')
-        assert_equal(subs, {'email_transactional': [self.project.creator._id], 'email_digest': [], 'none': []})
-
     @mock.patch('website.project.views.comment.notify')
     def test_check_user_comment_reply_subscription_if_email_not_sent_to_target_user(self, mock_notify):
         # user subscribed to comment replies
@@ -1611,6 +1651,8 @@ class TestSendDigest(OsfTestCase):
             }
         ]
 
+        expected.sort(key=lambda group: group['user_id'])
+
         assert_equal(len(user_groups), 2)
         assert_equal(user_groups, expected)
         digest_ids = [d._id, d2._id, d3._id]
@@ -1662,6 +1704,8 @@ class TestSendDigest(OsfTestCase):
             }
         ]
 
+        expected.sort(key=lambda group: group['user_id'])
+
         assert_equal(len(user_groups), 2)
         assert_equal(user_groups, expected)
         digest_ids = [d._id, d2._id, d3._id]
@@ -1695,7 +1739,103 @@ class TestSendDigest(OsfTestCase):
         assert_equal(kwargs['name'], user.fullname)
         message = group_by_node(user_groups[last_user_index]['info'])
         assert_equal(kwargs['message'], message)
-        assert_equal(kwargs['callback'], remove_notifications(email_notification_ids=email_notification_ids))
+        assert_equal(NotificationDigest.find(Q('_id', 'in', email_notification_ids)).count(), 0)
+
+    def make_digests(self, users, send_type='email_digest'):
+        return [
+            factories.NotificationDigestFactory(
+                user_id=user._id,
+                send_type=send_type,
+                timestamp=self.timestamp,
+                message='Hello',
+                node_lineage=[self.project._id]
+            )
+            for user in users
+        ]
+
+    def test_iter_users_emails_chunks_users(self):
+        users = [factories.UserFactory() for _ in range(5)]
+        self.make_digests(users + users[:2])
+
+        chunks = list(iter_users_emails('email_digest', chunk_size=2))
+
+        assert_equal([len(chunk) for chunk in chunks], [2, 2, 1])
+        user_ids = [group['user_id'] for chunk in chunks for group in chunk]
+        assert_equal(user_ids, sorted(user._id for user in users))
+        assert_equal(
+            [len(group['info']) for chunk in chunks for group in chunk],
+            [2 if user_id in (users[0]._id, users[1]._id) else 1 for user_id in user_ids]
+        )
+
+    @mock.patch('website.settings.NOTIFICATION_DIGEST_CHUNK_SIZE', 2)
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_removes_digests_of_each_sent_chunk(self, mock_send_mail):
+        users = sorted((factories.UserFactory() for _ in range(3)), key=lambda user: user._id)
+        self.make_digests(users)
+        transactional = self.make_digests(users[:1], send_type='email_transactional')
+
+        def fail_on_last_user(**kwargs):
+            if kwargs['to_addr'] == users[2].username:
+                raise Exception('Boom')
+        mock_send_mail.side_effect = fail_on_last_user
+
+        with assert_raises(Exception):
+            send_users_email('email_digest')
+
+        # The first chunk was sent and its digests removed, the rest is kept for the next run
+        remaining = NotificationDigest.find(Q('send_type', 'eq', 'email_digest'))
+        assert_equal([digest.user_id for digest in remaining], [users[2]._id])
+        assert_true(NotificationDigest.load(transactional[0]._id))
+
+        mock_send_mail.side_effect = None
+        mock_send_mail.reset_mock()
+        result = send_users_email('email_digest')
+
+        assert_equal(result['users'], 1)
+        assert_equal(mock_send_mail.call_args[1]['to_addr'], users[2].username)
+        assert_equal(NotificationDigest.find(Q('send_type', 'eq', 'email_digest')).count(), 0)
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_keeps_digests_of_unknown_users(self, mock_send_mail):
+        digest = self.make_digests([self.user_1])[0]
+        digest.user_id = 'nouser'
+        digest.save()
+
+        send_users_email('email_digest')
+
+        assert_false(mock_send_mail.called)
+        assert_true(NotificationDigest.load(digest._id))
+
+    @mock.patch('website.settings.USE_EMAIL', True)
+    @mock.patch('website.settings.USE_CELERY', False)
+    @mock.patch('website.mails.mails.Mail.html', mock.Mock(return_value='<p>Digest</p>'))
+    @mock.patch('framework.email.tasks.send_emails')
+    def test_send_users_email_keeps_digests_of_unsent_emails(self, mock_send_emails):
+        users = sorted((factories.UserFactory() for _ in range(2)), key=lambda user: user._id)
+        digests = self.make_digests(users)
+        mock_send_emails.return_value = [True, False]
+
+        send_users_email('email_digest')
+
+        remaining = NotificationDigest.find(Q('send_type', 'eq', 'email_digest'))
+        assert_equal([digest._id for digest in remaining], [digests[1]._id])
+
+    @mock.patch('website.settings.USE_EMAIL', True)
+    @mock.patch('website.settings.USE_CELERY', True)
+    @mock.patch('website.mails.mails.Mail.html', mock.Mock(return_value='<p>Digest</p>'))
+    @mock.patch('framework.email.tasks.send_emails.apply_async')
+    def test_send_users_email_removes_digests_after_the_send_task(self, mock_apply_async):
+        users = sorted((factories.UserFactory() for _ in range(2)), key=lambda user: user._id)
+        digests = self.make_digests(users)
+
+        send_users_email('email_digest')
+
+        # Nothing is removed until the task sending the emails is done
+        assert_equal(NotificationDigest.find(Q('send_type', 'eq', 'email_digest')).count(), 2)
+        link = mock_apply_async.call_args[1]['link'][0]
+        link([False, True])
+        remaining = NotificationDigest.find(Q('send_type', 'eq', 'email_digest'))
+        assert_equal([digest._id for digest in remaining], [digests[0]._id])
 
     def test_remove_sent_digest_notifications(self):
         d = factories.NotificationDigestFactory(
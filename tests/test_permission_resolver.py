@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Tests for the request-scoped permission cache."""
+import mock
+from nose.tools import *  # flake8: noqa
+
+from framework.auth import Auth
+from website.project import permission_resolver
+from website.util.permissions import ADMIN, READ, WRITE
+
+from tests.base import OsfTestCase
+from tests.factories import AuthUserFactory, NodeFactory, PrivateLinkFactory, ProjectFactory
+from tests.utils import count_queries
+
+
+class TestPermissionResolver(OsfTestCase):
+
+    def setUp(self):
+        super(TestPermissionResolver, self).setUp()
+        self.admin = AuthUserFactory()
+        self.project = ProjectFactory(creator=self.admin)
+        self.child = NodeFactory(creator=self.admin, parent=self.project)
+        self.grandchild = NodeFactory(creator=self.admin, parent=self.child)
+        self.user = AuthUserFactory()
+
+    def test_is_admin_parent_is_memoized(self):
+        assert_false(self.grandchild.is_admin_parent(self.user))
+        with count_queries() as counter:
+            assert_false(self.grandchild.is_admin_parent(self.user))
+            assert_false(self.grandchild.has_permission(self.user, READ))
+        assert_equal(counter.count, 0)
+
+    def test_add_permission_invalidates(self):
+        assert_false(self.grandchild.is_admin_parent(self.user))
+        self.project.add_permission(self.user, ADMIN)
+        self.project.save()
+        assert_true(self.grandchild.is_admin_parent(self.user))
+
+    def test_remove_permission_invalidates(self):
+        self.project.add_contributor(self.user, permissions=[READ, WRITE, ADMIN], auth=Auth(self.admin), save=True)
+        assert_true(self.grandchild.is_admin_parent(self.user))
+        self.project.remove_permission(self.user, ADMIN, save=True)
+        assert_false(self.grandchild.is_admin_parent(self.user))
+
+    def test_set_permissions_invalidates(self):
+        self.project.add_contributor(self.user, permissions=[READ], auth=Auth(self.admin), save=True)
+        assert_false(self.grandchild.is_admin_parent(self.user))
+        self.project.set_permissions(self.user, [READ, WRITE, ADMIN], save=True)
+        assert_true(self.grandchild.is_admin_parent(self.user))
+
+    def test_resolve_subtree_needs_no_further_queries(self):
+        resolver = permission_resolver.get_resolver()
+        resolver.resolve_subtree(self.project, self.admin)
+        with count_queries() as counter:
+            assert_true(self.child.is_admin_parent(self.admin))
+            assert_true(self.grandchild.is_admin_parent(self.admin))
+        assert_equal(counter.count, 0)
+
+    def test_private_link_keys_are_invalidated_by_new_links(self):
+        assert_equal(self.project.private_link_keys_active, [])
+        link = PrivateLinkFactory()
+        link.nodes.append(self.project)
+        link.save()
+        assert_equal(self.project.private_link_keys_active, [link.key])
+
+    def test_nothing_is_cached_outside_of_requests(self):
+        with mock.patch('website.project.permission_resolver.get_cache_key', return_value=permission_resolver.dummy_request):
+            resolver = permission_resolver.get_resolver()
+            assert_is_instance(resolver, permission_resolver._NullResolver)
+            assert_false(self.grandchild.is_admin_parent(self.user))
+            self.project.add_permission(self.user, ADMIN)
+            self.project.save()
+            assert_true(self.grandchild.is_admin_parent(self.user))
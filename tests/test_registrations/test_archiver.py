@@ -7,6 +7,8 @@ import itertools
 import random
 import copy
 import re
+import threading
+import time
 
 import celery
 import mock  # noqa
@@ -153,6 +155,9 @@ class MockAddon(mock.MagicMock, StorageAddonBase):
     def _get_file_tree(self, user, version):
         return FILE_TREE
 
+    def _get_fileobj_child_metadata(self, filenode, user, cookie=None, version=None):
+        return FILE_TREE['children']
+
     def after_register(self, *args):
         return None, None
 
@@ -404,6 +409,49 @@ class TestStorageAddonBase(ArchiverTestCase):
         for addon in [a for a in settings.ADDONS_ARCHIVABLE if a not in ['wiki', 'forward']]:
             self._test_addon(addon)
 
+    def test__get_file_tree_lists_folders_concurrently(self):
+        listing = {'current': 0, 'most': 0}
+        lock = threading.Lock()
+
+        def list_folder(filenode, user, cookie=None, version=None):
+            with lock:
+                listing['current'] += 1
+                listing['most'] = max(listing['most'], listing['current'])
+            time.sleep(0.05)
+            with lock:
+                listing['current'] -= 1
+            if filenode['path'] != '/':
+                return [{'path': filenode['path'] + '/file', 'name': 'file', 'kind': 'file', 'size': 8}]
+            return [{'path': '/{}'.format(i), 'name': str(i), 'kind': 'folder'} for i in range(6)]
+
+        addon = self.src.get_addon('osfstorage')
+        with mock.patch.object(StorageAddonBase, '_get_fileobj_child_metadata', side_effect=list_folder):
+            file_tree = addon._get_file_tree(user=self.user)
+        assert_equal(len(file_tree['children']), 6)
+        assert_true(all(len(folder['children']) == 1 for folder in file_tree['children']))
+        assert_greater(listing['most'], 1)
+
+    def test__get_file_tree_resolves_the_cookie_once(self):
+        def list_folder(filenode, user, cookie=None, version=None):
+            assert_is_none(user)
+            assert_equal(cookie, 'cookie')
+            if filenode['path'] != '/':
+                return []
+            return [{'path': '/{}'.format(i), 'name': str(i), 'kind': 'folder'} for i in range(6)]
+
+        addon = self.src.get_addon('osfstorage')
+        with mock.patch.object(StorageAddonBase, '_get_fileobj_child_metadata', side_effect=list_folder) as mock_list, \
+                mock.patch.object(self.user, 'get_or_create_cookie', return_value='cookie') as mock_cookie:
+            addon._get_file_tree(user=self.user)
+        assert_equal(mock_list.call_count, 7)
+        assert_equal(mock_cookie.call_count, 1)
+
+    def test__get_file_tree_raises_listing_errors(self):
+        addon = self.src.get_addon('osfstorage')
+        with mock.patch.object(StorageAddonBase, '_get_fileobj_child_metadata', side_effect=HTTPError(503)):
+            with assert_raises(HTTPError):
+                addon._get_file_tree(user=self.user)
+
 class TestArchiverTasks(ArchiverTestCase):
 
     @use_fake_addons
@@ -432,12 +480,25 @@ class TestArchiverTasks(ArchiverTestCase):
         assert_equal(res.target_name, 'dropbox')
         assert_equal(res.disk_usage, 128 + 256)
 
+    def test_stat_addon_sums_folders_as_they_are_listed(self):
+        def list_folder(filenode, user, cookie=None, version=None):
+            if filenode['path'] != '/':
+                return [{'path': filenode['path'] + '/file', 'name': 'file', 'kind': 'file', 'size': 8}]
+            return [{'path': '/{}'.format(i), 'name': str(i), 'kind': 'folder'} for i in range(6)]
+
+        with mock.patch.object(StorageAddonBase, '_get_fileobj_child_metadata', side_effect=list_folder), \
+                mock.patch.object(StorageAddonBase, '_get_file_tree') as mock_file_tree:
+            res = stat_addon('osfstorage', self.archive_job._id)
+        assert_false(mock_file_tree.called)
+        assert_equal(res.num_files, 6)
+        assert_equal(res.disk_usage, 6 * 8)
+        assert_equal(len(res.targets[0].targets), 6)
+
     @use_fake_addons
     @mock.patch('website.archiver.tasks.archive_addon.delay')
     def test_archive_node_pass(self, mock_archive_addon):
         settings.MAX_ARCHIVE_SIZE = 1024 ** 3
-        with mock.patch.object(StorageAddonBase, '_get_file_tree') as mock_file_tree:
-            mock_file_tree.return_value = FILE_TREE
+        with mock.patch.object(StorageAddonBase, '_get_fileobj_child_metadata', return_value=FILE_TREE['children']):
             results = [stat_addon(addon, self.archive_job._id) for addon in ['osfstorage', 'dropbox']]
         with mock.patch.object(celery, 'group') as mock_group:
             archive_node(results, self.archive_job._id)
@@ -463,14 +524,9 @@ class TestArchiverTasks(ArchiverTestCase):
     def test_archive_node_does_not_archive_empty_addons(self, mock_archive_addon):
         with mock.patch.object(self.src, 'get_addon') as mock_get_addon:
             mock_addon = MockAddon()
-            def empty_file_tree(user, version):
-                return {
-                    'path': '/',
-                    'kind': 'folder',
-                    'name': 'Fake',
-                    'children': []
-                }
-            setattr(mock_addon, '_get_file_tree', empty_file_tree)
+            def empty_folder(filenode, user, cookie=None, version=None):
+                return []
+            setattr(mock_addon, '_get_fileobj_child_metadata', empty_folder)
             mock_get_addon.return_value = mock_addon
             results = [stat_addon(addon, self.archive_job._id) for addon in ['osfstorage']]
             archive_node(results, job_pk=self.archive_job._id)
@@ -482,8 +538,7 @@ class TestArchiverTasks(ArchiverTestCase):
         settings.MAX_ARCHIVE_SIZE = 100
         self.archive_job.initiator.system_tags.append(NO_ARCHIVE_LIMIT)
         self.archive_job.initiator.save()
-        with mock.patch.object(StorageAddonBase, '_get_file_tree') as mock_file_tree:
-            mock_file_tree.return_value = FILE_TREE
+        with mock.patch.object(StorageAddonBase, '_get_fileobj_child_metadata', return_value=FILE_TREE['children']):
             results = [stat_addon(addon, self.archive_job._id) for addon in ['osfstorage', 'dropbox']]
         with mock.patch.object(celery, 'group') as mock_group:
             archive_node(results, self.archive_job._id)
@@ -951,6 +1006,32 @@ class TestArchiverUtils(ArchiverTestCase):
         for patch in patches.values():
             patch.stop()
 
+    def test_find_registration_file(self):
+        file_tree = file_tree_factory(3, 3, 3)
+        selected = select_files_from_tree(file_tree)
+        osfstorage = self.src.get_addon('osfstorage')
+        mocked = mock.Mock(return_value=file_tree)
+        with mock.patch.object(osfstorage, '_get_file_tree', mocked), \
+                mock.patch.object(self.dst, 'get_addon', mock.Mock(return_value=osfstorage)):
+            for sha256, selected_file in selected.items():
+                value = {'sha256': sha256, 'nodeId': self.src._id, 'selectedFileName': selected_file['name']}
+                assert_equal(archiver_utils.find_registration_file(value, self.dst), (selected_file, self.dst._id))
+            value = {'sha256': sha256, 'nodeId': self.src._id, 'selectedFileName': 'renamed'}
+            assert_equal(archiver_utils.find_registration_file(value, self.dst), (None, None))
+        assert_equal(mocked.call_count, 1)
+
+    def test_release_file_maps(self):
+        osfstorage = self.src.get_addon('osfstorage')
+        mocked = mock.Mock(return_value=file_tree_factory(2, 2, 2))
+        with mock.patch.object(osfstorage, '_get_file_tree', mocked), \
+                mock.patch.object(self.dst, 'get_addon', mock.Mock(return_value=osfstorage)):
+            archiver_utils.get_file_index(self.dst)
+            archiver_utils.release_file_maps(self.dst)
+            assert_not_in(self.dst._id, archiver_utils._file_indexes)
+            assert_not_in(self.dst._id, archiver_utils._file_maps)
+            archiver_utils.get_file_index(self.dst)
+        assert_equal(mocked.call_count, 2)
+
 
 class TestArchiverListeners(ArchiverTestCase):
 
@@ -2,6 +2,8 @@
 # encoding: utf-8
 
 import os
+import threading
+import time
 from types import NoneType
 from xmlrpclib import DateTime
 
@@ -295,7 +297,7 @@ class TestRubeus(OsfTestCase):
         collector = rubeus.NodeFileCollector(
             self.project, Auth(user=UserFactory())
         )
-        nodes = collector._collect_components(self.project, visited=[])
+        nodes = collector._collect_components(self.project, visited=set())
         assert_equal(len(nodes), 0)
 
     def test_serialized_pointer_has_flag_indicating_its_a_pointer(self):
@@ -319,6 +321,7 @@ serialized = {
     }
 }
 mock_addon.config.get_hgrid_data.return_value = [serialized]
+mock_addon.config.prefetch_hgrid_data = None
 
 
 class TestSerializingNodeWithAddon(OsfTestCase):
@@ -335,6 +338,11 @@ class TestSerializingNodeWithAddon(OsfTestCase):
         ret = self.serializer._collect_addons(self.project)
         assert_equal(ret, [serialized])
 
+    def test_collect_addons_records_latency(self):
+        self.serializer._collect_addons(self.project)
+        assert_equal(len(self.serializer.addon_latency), 1)
+        assert_equal(self.serializer.addon_latency[0]['status'], 'ok')
+
     def test_sort_by_name(self):
         files = [
             {'name': 'F.png'},
@@ -386,3 +394,81 @@ class TestSerializingNodeWithAddon(OsfTestCase):
                 'fetch': None,
             },
         )
+
+
+def make_slow_addon(node, delay=0.2, error=None, threads=None):
+    def prefetch_hgrid_data(addon, auth, **kwargs):
+        def fetch():
+            time.sleep(delay)
+            if error:
+                raise error
+            return node._id
+        return fetch
+
+    def get_hgrid_data(addon, auth, prefetched=None, **kwargs):
+        if threads is not None:
+            threads.append(threading.current_thread())
+        return [dict(serialized, name=prefetched)]
+    addon = mock.Mock()
+    addon.owner = node
+    addon.config.short_name = 'slowaddon'
+    addon.config.full_name = 'Slow Addon'
+    addon.config.prefetch_hgrid_data.side_effect = prefetch_hgrid_data
+    addon.config.get_hgrid_data.side_effect = get_hgrid_data
+    return addon
+
+
+class TestCollectingAddonsConcurrently(OsfTestCase):
+
+    def setUp(self):
+        super(TestCollectingAddonsConcurrently, self).setUp()
+        self.auth = AuthFactory()
+        self.project = ProjectFactory(creator=self.auth.user)
+        self.components = [NodeFactory(parent=self.project, creator=self.auth.user) for _ in range(4)]
+
+    def test_addons_of_components_are_fetched_at_once(self):
+        with mock.patch('website.project.model.Node.get_addons', lambda node: [make_slow_addon(node)]):
+            start = time.time()
+            collector = rubeus.NodeFileCollector(node=self.project, auth=self.auth)
+            root = collector.to_hgrid()[0]
+            elapsed = time.time() - start
+
+        assert_less(elapsed, 0.2 * 5)
+        assert_equal(root['children'][0]['name'], self.project._id)
+        assert_equal(
+            [child['children'][0]['name'] for child in root['children'][1:]],
+            [component._id for component in self.components],
+        )
+        assert_equal(len(collector.addon_latency), 5)
+        assert_true(all(each['status'] == 'ok' for each in collector.addon_latency))
+
+    def test_hgrid_data_is_serialized_on_the_request_thread(self):
+        threads = []
+        with mock.patch('website.project.model.Node.get_addons', lambda node: [make_slow_addon(node, delay=0, threads=threads)]):
+            rubeus.NodeFileCollector(node=self.project, auth=self.auth).to_hgrid()
+
+        assert_equal(len(threads), 5)
+        assert_true(all(thread is threading.current_thread() for thread in threads))
+
+    @mock.patch('website.settings.HGRID_ADDON_TIMEOUTS', {'default': 0.1})
+    def test_slow_addons_are_unavailable(self):
+        with mock.patch('website.project.model.Node.get_addons', lambda node: [make_slow_addon(node, delay=0.5)]):
+            collector = rubeus.NodeFileCollector(node=self.project, auth=self.auth)
+            root = collector.to_hgrid()[0]
+
+        assert_true(root['children'][0]['unavailable'])
+        assert_equal(root['children'][0]['name'], 'Slow Addon is currently unavailable')
+        assert_equal(collector.addon_latency[0]['status'], 'timeout')
+
+    @mock.patch('website.util.rubeus.sentry.log_exception')
+    def test_failing_addons_are_unavailable(self, mock_log_exception):
+        def get_addons(node):
+            return [make_slow_addon(node, delay=0, error=Exception() if node._id == self.project._id else None)]
+        with mock.patch('website.project.model.Node.get_addons', get_addons):
+            collector = rubeus.NodeFileCollector(node=self.project, auth=self.auth)
+            root = collector.to_hgrid()[0]
+
+        assert_true(root['children'][0]['unavailable'])
+        assert_equal(root['children'][1]['children'][0]['name'], self.components[0]._id)
+        assert_equal([each['status'] for each in collector.addon_latency], ['error'] + ['ok'] * 4)
+        assert_true(mock_log_exception.called)
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import os
 import time
+import shutil
+import tempfile
 import unittest
 import logging
 import functools
@@ -15,14 +18,16 @@ from website import settings
 import website.search.search as search
 from website.search import elastic_search
 from website.search.util import build_query
+from website.search_migration import reindex
 from website.search_migration.migrate import migrate
-from website.models import Retraction, NodeLicense, Tag
+from website.addons.wiki.model import NodeWikiPage
+from website.models import Node, Retraction, NodeLicense, Tag, User
 
 from tests import factories
 from tests.base import OsfTestCase
 from tests.test_search import SearchTestCase
 from tests.test_features import requires_search
-from tests.utils import mock_archive, run_celery_tasks
+from tests.utils import assert_max_queries, count_queries, mock_archive, run_celery_tasks
 
 TEST_INDEX = 'test'
 
@@ -864,6 +869,122 @@ class TestSearchMigration(SearchTestCase):
             assert_equal(var[settings.ELASTIC_INDEX + '_v{}'.format(n + 1)]['aliases'].keys()[0], settings.ELASTIC_INDEX)
             assert not var.get(settings.ELASTIC_INDEX + '_v{}'.format(n))
 
+class TestNodeBatchSerialization(SearchTestCase):
+
+    def setUp(self):
+        super(TestNodeBatchSerialization, self).setUp()
+        self.institution = factories.InstitutionFactory()
+        self.parent = factories.ProjectFactory(is_public=True)
+        self.parent.node_license = factories.NodeLicenseRecordFactory()
+        self.parent.save()
+
+    def make_nodes(self, count):
+        nodes = []
+        for i in range(count):
+            node = factories.NodeFactory(title='Batched {}'.format(i), parent=self.parent, is_public=True)
+            auth = Auth(node.creator)
+            node.add_contributor(factories.UserFactory(), auth=auth)
+            node._affiliated_institutions.append(self.institution.node)
+            node.update_node_wiki('home', 'Wiki of node {}'.format(i), auth)
+            node.get_addon('osfstorage').get_root().append_file('Batched {}.txt'.format(i))
+            node.save()
+            nodes.append(node)
+        return nodes
+
+    def count_serialization_queries(self, nodes):
+        for model in (Node, User, NodeWikiPage):
+            model._clear_caches()
+        with count_queries() as counter:
+            batch = elastic_search.NodeBatch(nodes)
+            list(elastic_search.node_actions(nodes, elastic_search.INDEX, batch=batch))
+            list(elastic_search.file_actions(batch.files, elastic_search.INDEX, batch=batch))
+        return counter
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        small = self.count_serialization_queries(self.make_nodes(2))
+        large = self.count_serialization_queries(self.make_nodes(10))
+        assert_max_queries(large, small.count)
+
+    def test_batch_serialization_matches_single_serialization(self):
+        nodes = self.make_nodes(3)
+        batch = elastic_search.NodeBatch(nodes)
+        for node in nodes:
+            category = elastic_search.get_doctype_from_node(node)
+            batched = elastic_search.serialize_node(node, category, batch=batch)
+            assert_equal(batched, elastic_search.serialize_node(node, category))
+            assert_equal(batched['license']['id'], self.parent.node_license.id)
+            assert_equal(batched['affiliated_institutions'], [self.institution.name])
+            assert_equal(len(batched['contributors']), 2)
+            assert_in('home', batched['wikis'])
+        for file_ in batch.files:
+            assert_equal(elastic_search.serialize_file(file_, batch=batch), elastic_search.serialize_file(file_))
+
+    def test_bulk_update_search_indexes_nodes_and_files(self):
+        nodes = self.make_nodes(3)
+        search.delete_index(elastic_search.INDEX)
+        search.create_index(elastic_search.INDEX)
+        with mock.patch('website.search.elastic_search.update_file') as mock_update_file:
+            Node.bulk_update_search(nodes, index=elastic_search.INDEX)
+        assert_false(mock_update_file.called)
+        assert_equal(len(query('Batched')['results']), 3)
+        assert_equal(len(query_file('Batched')['results']), 3)
+
+    def test_bulk_update_search_removes_private_nodes(self):
+        nodes = self.make_nodes(2)
+        nodes[0].is_public = False
+        nodes[0].save()
+        Node.bulk_update_search(nodes, index=elastic_search.INDEX)
+        results = query('Batched')['results']
+        assert_equal([result['id'] for result in results], [nodes[1]._id])
+
+
+class TestParallelReindex(SearchTestCase):
+
+    def setUp(self):
+        super(TestParallelReindex, self).setUp()
+        self.checkpoint_dir = tempfile.mkdtemp()
+        self.projects = [factories.ProjectFactory(title='Reindexed {}'.format(i), is_public=True) for i in range(5)]
+        search.delete_index(elastic_search.INDEX)
+        search.create_index(elastic_search.INDEX)
+
+    def tearDown(self):
+        super(TestParallelReindex, self).tearDown()
+        shutil.rmtree(self.checkpoint_dir)
+
+    def run_range(self, doc_type, lower, upper, number=0):
+        checkpoint_path = os.path.join(self.checkpoint_dir, '{}-{}.json'.format(doc_type, number))
+        return reindex.reindex_range((doc_type, lower, upper, elastic_search.INDEX, checkpoint_path, 2, 2, 1))
+
+    def test_ranges_cover_every_node(self):
+        ranges = next(each for each in reindex.get_doc_types() if each.name == 'node').split(3)
+        assert_equal(ranges[0][0], None)
+        assert_equal(ranges[-1][1], None)
+        indexed = sum(self.run_range('node', lower, upper, number)[1] for number, (lower, upper) in enumerate(ranges))
+        assert_equal(indexed, len(self.projects))
+        assert_equal(len(query('Reindexed')['results']), len(self.projects))
+
+    def test_finished_range_is_skipped_on_resume(self):
+        assert_equal(self.run_range('node', None, None), ('node', len(self.projects)))
+        with mock.patch('website.search_migration.reindex._bulk') as mock_bulk:
+            assert_equal(self.run_range('node', None, None), ('node', 0))
+        assert_false(mock_bulk.called)
+
+    def test_range_resumes_after_checkpoint(self):
+        ordered = sorted(project._id for project in self.projects)
+        checkpoint_path = os.path.join(self.checkpoint_dir, 'node-0.json')
+        reindex.Checkpoint(checkpoint_path, 'node', None, None).save(last_id=ordered[1], count=2)
+        assert_equal(self.run_range('node', None, None), ('node', len(ordered) - 2))
+
+    def test_users_and_files_are_indexed(self):
+        self.projects[0].get_addon('osfstorage').get_root().append_file('Reindexed.txt')
+        search.delete_index(elastic_search.INDEX)
+        search.create_index(elastic_search.INDEX)
+        self.run_range('user', None, None)
+        self.run_range('file', None, None)
+        assert_equal(len(query_user(self.projects[0].creator.fullname)['results']), 1)
+        assert_equal(len(query_file('Reindexed.txt')['results']), 1)
+
+
 class TestSearchFiles(SearchTestCase):
 
     def setUp(self):
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+import mock
+from nose.tools import *  # flake8: noqa (PEP8 asserts)
+
+from website.search import index_queue
+from website.search import search
+
+from tests import factories
+from tests.base import OsfTestCase
+
+
+class TestIndexQueue(OsfTestCase):
+
+    def setUp(self):
+        super(TestIndexQueue, self).setUp()
+        index_queue.get_collection().remove()
+        self.use_celery = mock.patch('website.settings.USE_CELERY', True)
+        self.use_celery.start()
+        self.bulk_update_search = mock.patch('website.search.search.bulk_update_search')
+        self.mock_bulk_update_search = self.bulk_update_search.start()
+
+    def tearDown(self):
+        self.bulk_update_search.stop()
+        self.use_celery.stop()
+        index_queue.get_collection().remove()
+        super(TestIndexQueue, self).tearDown()
+
+    def age_entries(self, seconds):
+        index_queue.get_collection().update(
+            {},
+            {'$set': {'enqueued': datetime.datetime.utcnow() - datetime.timedelta(seconds=seconds)}},
+            multi=True,
+        )
+
+    def test_repeated_updates_collapse(self):
+        for _ in range(5):
+            index_queue.enqueue('node', 'abc12')
+        index_queue.enqueue('node', 'def34')
+        assert_equal(index_queue.get_collection().count(), 2)
+
+    def test_node_saves_are_queued(self):
+        node = factories.ProjectFactory(is_public=True)
+        with mock.patch('website.search.search.search_engine.update_node') as mock_update_node:
+            node.title = 'Queued'
+            node.save()
+        assert_false(mock_update_node.called)
+        assert_equal(index_queue.get_collection().find({'doc_id': node._id}).count(), 1)
+
+    def test_flush_waits_for_the_window(self):
+        index_queue.enqueue('node', 'abc12')
+        assert_equal(index_queue.flush(), 0)
+        assert_equal(index_queue.get_collection().count(), 1)
+
+    def test_flush_indexes_waiting_nodes_in_bulk(self):
+        nodes = [factories.ProjectFactory(is_public=True) for _ in range(3)]
+        index_queue.get_collection().remove()
+        for node in nodes:
+            index_queue.enqueue('node', node._id)
+        self.age_entries(60)
+        assert_equal(index_queue.flush(), 3)
+        assert_equal(self.mock_bulk_update_search.call_count, 1)
+        indexed = self.mock_bulk_update_search.call_args[0][0]
+        assert_equal(set(node._id for node in indexed), set(node._id for node in nodes))
+        assert_false(self.mock_bulk_update_search.call_args[1]['refresh'])
+        assert_equal(index_queue.get_collection().count(), 0)
+
+    def test_update_during_flush_stays_queued(self):
+        index_queue.enqueue('node', 'abc12')
+        self.age_entries(60)
+        self.mock_bulk_update_search.side_effect = lambda *args, **kwargs: index_queue.enqueue('node', 'abc12')
+        index_queue.flush()
+        assert_equal(index_queue.get_collection().count(), 1)
+
+    def test_flush_is_limited_to_flush_size(self):
+        for i in range(5):
+            index_queue.enqueue('node', 'node{}'.format(i))
+        self.age_entries(60)
+        with mock.patch('website.settings.SEARCH_INDEX_QUEUE_FLUSH_SIZE', 2):
+            assert_equal(index_queue.flush(), 5)
+        assert_equal(self.mock_bulk_update_search.call_count, 3)
+
+    @mock.patch('website.search.index_queue.enqueue_task')
+    def test_deep_queue_is_flushed_right_away(self, mock_enqueue_task):
+        with mock.patch('website.settings.SEARCH_INDEX_QUEUE_MAX_DEPTH', 2):
+            for i in range(3):
+                index_queue.enqueue('node', 'node{}'.format(i))
+            assert_equal(mock_enqueue_task.call_count, 1)
+            assert_equal(index_queue.flush(), 3)
+
+    def test_status_reports_depth(self):
+        index_queue.enqueue('user', 'abc12')
+        index_queue.enqueue('user', 'abc12')
+        status = index_queue.get_status()
+        assert_equal(status['depth'], 1)
+        assert_greater_equal(status['collapsed'], 1)
+
+    def test_queue_is_bypassed_without_celery(self):
+        with mock.patch('website.settings.USE_CELERY', False):
+            with mock.patch('website.search.search.search_engine.update_user') as mock_update_user:
+                search.update_user(factories.UserFactory())
+        assert_true(mock_update_user.called)
+        assert_equal(index_queue.get_collection().find({'doc_type': 'user'}).count(), 0)
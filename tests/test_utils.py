@@ -221,6 +221,13 @@ class TestUrlForHelpers(unittest.TestCase):
         assert_in('cookie=cookie', url)
         assert_in('provider=provider', url)
 
+    def test_waterbutler_url_for_explicit_cookie(self):
+        user = mock.Mock()
+        url = waterbutler_url_for('upload', 'provider', 'path', mock.Mock(_id='_id'), user=user, cookie='cookie', view_only=True)
+
+        assert_false(user.get_or_create_cookie.called)
+        assert_in('cookie=cookie', url)
+
     def test_waterbutler_url_for_cookie_not_required(self):
         with self.app.test_request_context():
             url = waterbutler_url_for('upload', 'provider', 'path', mock.Mock(_id='_id'))
@@ -3996,6 +3996,7 @@ class TestFileViews(OsfTestCase):
         expected = rubeus.to_hgrid(self.project, auth=Auth(self.user))
         data = res.json['data']
         assert_equal(len(data), len(expected))
+        assert_in('addonLatency', res.json['meta'])
 
 
 class TestTagViews(OsfTestCase):
@@ -4420,5 +4421,18 @@ class TestUserConfirmSignal(OsfTestCase):
 
         assert_equal(mock_signals.signals_sent(), set([auth.signals.user_confirmed]))
 
+
+class TestStatusMetrics(OsfTestCase):
+
+    def test_metrics_are_not_exposed_by_default(self):
+        res = self.app.get('/api/v1/status/metrics/', expect_errors=True)
+        assert_equal(res.status_code, 404)
+
+    @mock.patch('website.settings.ENABLE_STATUS_METRICS', True)
+    def test_metrics_are_exposed_when_enabled(self):
+        res = self.app.get('/api/v1/status/metrics/')
+        assert_equal(res.status_code, 200)
+        assert_in('cas_token_cache', res.json)
+
 if __name__ == '__main__':
     unittest.main()
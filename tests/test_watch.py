@@ -12,6 +12,7 @@ from framework.exceptions import HTTPError
 from tests.base import OsfTestCase
 from tests.factories import (UserFactory, ProjectFactory,
                              WatchConfigFactory)
+from website.models import NodeLog
 from website.views import paginate
 import math
 
@@ -63,15 +64,12 @@ class TestWatching(OsfTestCase):
         assert_equal(n_watched_now, n_watched_then - 1)
         assert_false(self.user.is_watching(self.project))
 
-    @unittest.skip("Won't work because the old log's id doesn't encode the "
-                   "correct log date")
     def test_get_recent_log_ids(self):
         self._watch_project(self.project)
         log_ids = list(self.user.get_recent_log_ids())
         assert_equal(self.last_log._id, log_ids[0])
-        # This part won't work
-        # TODO(sloria): Rethink.
-        assert_equal(len(log_ids), 1)
+        # The project creation log and the last log; the old log is too old
+        assert_equal(len(log_ids), 2)
 
     def test_get_recent_log_ids_since(self):
         self._watch_project(self.project)
@@ -79,6 +77,35 @@ class TestWatching(OsfTestCase):
         log_ids = list(self.user.get_recent_log_ids(since=since))
         assert_equal(len(log_ids), 3)
 
+    def test_get_recent_log_ids_merges_watched_projects(self):
+        other = ProjectFactory(creator=self.user)
+        self._watch_project(self.project)
+        self._watch_project(other)
+        now = dt.datetime.utcnow()
+        for days in (5, 3, 1):
+            for project in (self.project, other):
+                project.add_log(
+                    'tag_added',
+                    params={'project': project._primary_key},
+                    auth=self.consolidate_auth,
+                    log_date=now - dt.timedelta(days=days, minutes=1 if project is other else 0),
+                    save=True,
+                )
+
+        log_ids = list(self.user.get_recent_log_ids())
+
+        dates = [NodeLog.load(log_id).date for log_id in log_ids]
+        assert_equal(dates, sorted(dates, reverse=True))
+        assert_equal(len(log_ids), 9)
+
+    def test_get_recent_log_ids_pages(self):
+        self._watch_project(self.project)
+        log_ids = list(self.user.get_recent_log_ids())
+        assert_equal(list(self.user.get_recent_log_ids(start=1, limit=1)), log_ids[1:2])
+
+    def test_get_recent_log_ids_without_watched_projects(self):
+        assert_equal(list(self.user.get_recent_log_ids()), [])
+
     def test_get_daily_digest_log_ids(self):
         self._watch_project(self.project)
         day_log_ids = list(self.user.get_daily_digest_log_ids())
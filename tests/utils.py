@@ -210,3 +210,52 @@ def unique(factory):
 def run_celery_tasks():
     yield
     celery_teardown_request()
+
+
+class QueryCounter(object):
+
+    def __init__(self):
+        self.queries = []
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+
+@contextlib.contextmanager
+def count_queries():
+    """Count the MongoDB read and write operations issued inside the block.
+
+    Example usage:
+    with count_queries() as counter:
+        node.parents
+    assert_equal(counter.count, 1)
+    """
+    from pymongo.collection import Collection
+
+    counter = QueryCounter()
+
+    def make_counted(name, original):
+        def counted(self, *args, **kwargs):
+            counter.queries.append((self.name, name, args))
+            return original(self, *args, **kwargs)
+        return counted
+
+    # `find_one` is implemented on top of `find` in pymongo 2.x
+    patches = [
+        mock.patch.object(Collection, name, make_counted(name, getattr(Collection, name)))
+        for name in ('find', 'insert', 'update', 'remove', 'aggregate', 'find_and_modify')
+    ]
+    for patch in patches:
+        patch.start()
+    try:
+        yield counter
+    finally:
+        for patch in patches:
+            patch.stop()
+
+
+def assert_max_queries(counter, maximum):
+    assert counter.count <= maximum, 'Expected at most {} queries, got {}:\n{}'.format(
+        maximum, counter.count, '\n'.join(repr(query) for query in counter.queries)
+    )
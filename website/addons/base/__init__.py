@@ -3,12 +3,10 @@ import glob
 import importlib
 import mimetypes
 import os
-from time import sleep
 
 from bson import ObjectId
 from mako.lookup import TemplateLookup
 import markupsafe
-import requests
 
 from modularodm import fields
 from modularodm import Q
@@ -23,7 +21,7 @@ from framework.mongo import StoredObject
 from framework.routing import process_rules
 
 from website import settings
-from website.addons.base import serializer, logger
+from website.addons.base import file_tree, serializer, logger
 from website.project.model import Node, User
 from website.util import waterbutler_url_for
 
@@ -68,7 +66,7 @@ class AddonConfig(object):
                  added_default=None, added_mandatory=None,
                  node_settings_model=None, user_settings_model=None, include_js=None, include_css=None,
                  widget_help=None, views=None, configs=None, models=None,
-                 has_hgrid_files=False, get_hgrid_data=None, max_file_size=None, high_max_file_size=None,
+                 has_hgrid_files=False, get_hgrid_data=None, prefetch_hgrid_data=None, max_file_size=None, high_max_file_size=None,
                  accept_extensions=True, description='', url=None,
                  node_settings_template=None, user_settings_template=None,
                  **kwargs):
@@ -107,6 +105,10 @@ class AddonConfig(object):
         self.has_hgrid_files = has_hgrid_files
         # WARNING: get_hgrid_data can return None if the addon is added but has no credentials.
         self.get_hgrid_data = get_hgrid_data  # if has_hgrid_files and not get_hgrid_data rubeus.make_dummy()
+        # Optional; returns a function making the remote requests of get_hgrid_data, which is run
+        # alongside those of other addons and must not use the database or the request. Its result
+        # is passed to get_hgrid_data as `prefetched`. See rubeus.NodeFileCollector
+        self.prefetch_hgrid_data = prefetch_hgrid_data
         self.max_file_size = max_file_size
         self.high_max_file_size = high_max_file_size
         self.accept_extensions = accept_extensions
@@ -772,37 +774,40 @@ class StorageAddonBase(object):
             'metadata',
             **kwargs
         )
-        res = requests.get(metadata_url)
+        file_tree.get_rate_budget(self.config.short_name).acquire()
+        res = file_tree.get_session().get(metadata_url)
         if res.status_code != 200:
             raise HTTPError(res.status_code, data={
                 'error': res.json(),
             })
-        # TODO: better throttling?
-        sleep(1.0 / 5.0)
         return res.json().get('data', [])
 
-    def _get_file_tree(self, filenode=None, user=None, cookie=None, version=None):
-        """
-        Recursively get file metadata
-        """
-        filenode = filenode or {
+    def _file_tree_root(self):
+        return {
             'path': '/',
             'kind': 'folder',
             'name': self.root_node.name,
         }
-        if filenode.get('kind') == 'file':
-            return filenode
-        elif 'size' in filenode:
-            return filenode
-        kwargs = {
-            'version': version,
-            'cookie': cookie,
-        }
-        filenode['children'] = [
-            self._get_file_tree(child, user, cookie=cookie)
-            for child in self._get_fileobj_child_metadata(filenode, user, **kwargs)
-        ]
-        return filenode
+
+    def _get_file_tree(self, filenode=None, user=None, cookie=None, version=None):
+        """
+        Get file metadata, listing the folders of the tree concurrently
+        """
+        filenode = filenode or self._file_tree_root()
+        return file_tree.FileTreeWalker(self, user, cookie=cookie, version=version).build(filenode)
+
+    def _walk_file_tree(self, filenode, user=None, cookie=None, version=None):
+        """
+        Yield ``(folder, children)`` for each folder of the tree as it is listed
+        """
+        return file_tree.FileTreeWalker(self, user, cookie=cookie, version=version).walk(filenode)
+
+    def _iter_files(self, filenode=None, user=None, cookie=None, version=None):
+        """
+        Yield the metadata of each file in the tree as its folder is listed
+        """
+        filenode = filenode or self._file_tree_root()
+        return file_tree.FileTreeWalker(self, user, cookie=cookie, version=version).iter_files(filenode)
 
 class AddonOAuthNodeSettingsBase(AddonNodeSettingsBase):
     _meta = {
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Concurrent walking of addon file trees through WaterButler.
+
+WaterButler lists one folder per request. Rather than listing folders one at a
+time with a fixed pause between requests, a `FileTreeWalker` keeps up to
+`FILE_TREE_WORKERS` listings in flight on pooled keep-alive sessions, paced by
+a `RateBudget` shared by every walk of the same provider in the process, and
+yields listings as they arrive so callers can consume a tree without waiting
+for, or holding, all of it.
+"""
+import sys
+import time
+import Queue
+import threading
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+import requests
+import six
+from requests.adapters import HTTPAdapter
+
+from website import settings
+
+
+class RateBudget(object):
+    """Token bucket allowing `rate` acquisitions a second, with bursts of up to
+    `rate` acquisitions after a quiet period.
+    """
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.tokens = self.rate
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.time()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_budgets = {}
+_budgets_lock = threading.Lock()
+
+
+def get_rate_budget(provider):
+    with _budgets_lock:
+        if provider not in _budgets:
+            limits = settings.FILE_TREE_RATE_LIMITS
+            _budgets[provider] = RateBudget(limits.get(provider, limits['default']))
+        return _budgets[provider]
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """The keep-alive session shared by the walkers of the process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=settings.FILE_TREE_WORKERS)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def needs_listing(filenode):
+    """Whether `filenode` is a folder whose children have to be requested."""
+    return filenode.get('kind') != 'file' and 'size' not in filenode and 'children' not in filenode
+
+
+class FileTreeWalker(object):
+    """Walk the file tree of a `StorageAddonBase`, listing up to `workers`
+    folders at once.
+    """
+
+    def __init__(self, addon, user, cookie=None, version=None, workers=None):
+        self.addon = addon
+        # Resolved once on the calling thread: looking up the user's session
+        # from each worker would query, and maybe create, a session per listing
+        if cookie is None and user is not None:
+            cookie = user.get_or_create_cookie()
+        self.cookie = cookie
+        self.version = version
+        self.workers = workers or settings.FILE_TREE_WORKERS
+
+    def list_folder(self, filenode):
+        return self.addon._get_fileobj_child_metadata(filenode, None, cookie=self.cookie, version=self.version)
+
+    def _list(self, filenode, results):
+        try:
+            results.put((filenode, self.list_folder(filenode), None))
+        except Exception:
+            results.put((filenode, None, sys.exc_info()))
+
+    def walk(self, root):
+        """Yield ``(folder, children)`` for `root` and every folder below it,
+        in the order the listings complete. Folders that already carry their
+        size or children are not listed.
+        """
+        if not needs_listing(root):
+            return
+        pending = deque([root])
+        results = Queue.Queue()
+        in_flight = 0
+        pool = ThreadPool(self.workers)
+        try:
+            while pending or in_flight:
+                while pending and in_flight < self.workers:
+                    pool.apply_async(self._list, (pending.popleft(), results))
+                    in_flight += 1
+                folder, children, exc_info = results.get()
+                in_flight -= 1
+                if exc_info:
+                    six.reraise(*exc_info)
+                pending.extend(child for child in children if needs_listing(child))
+                yield folder, children
+        finally:
+            pool.terminate()
+
+    def iter_files(self, root):
+        """Yield the metadata of every file below `root`, without keeping the
+        listings of the folders already walked.
+        """
+        if root.get('kind') == 'file':
+            yield root
+            return
+        stack = [root]
+        while stack:
+            folder = stack.pop()
+            if 'children' in folder:
+                children_of = [(folder, folder['children'])]
+            else:
+                children_of = self.walk(folder)
+            for _, children in children_of:
+                for child in children:
+                    if child.get('kind') == 'file':
+                        yield child
+                    elif 'children' in child:
+                        stack.append(child)
+
+    def build(self, root):
+        """Walk the tree below `root`, attaching the children of each folder
+        to it, and return `root`.
+        """
+        for folder, children in self.walk(root):
+            folder['children'] = children
+        return root
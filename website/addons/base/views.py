@@ -30,6 +30,7 @@ from website import settings
 from website.addons.base import StorageAddonBase
 from website.addons.base import exceptions
 from website.addons.base import signals as file_signals
+from website.files import metadata_changes
 from website.files.models import FileNode, StoredFileNode, TrashedFileNode
 from website.models import Node, NodeLog, User
 from website.profile.utils import get_gravatar
@@ -465,6 +466,20 @@ def addon_delete_file_node(self, node, user, event_type, payload):
                 file_node.delete(user=user)
 
 
+@file_signals.file_updated.connect
+def record_file_metadata_change(self, node, user, event_type, payload):
+    """Bump the version of the files of the providers changed, so that the
+    API stops serving cached metadata of them.
+    """
+    if 'source' in payload and 'destination' in payload:
+        changed = [(payload[each]['nid'], payload[each]['provider']) for each in ('source', 'destination')]
+    else:
+        changed = [(node._id, payload.get('provider'))]
+    for node_id, provider in set(changed):
+        if provider and provider != 'osfstorage':
+            metadata_changes.record_change(node_id, provider)
+
+
 @must_be_valid_project
 def addon_view_or_download_file_legacy(**kwargs):
     query_params = request.args.to_dict()
@@ -30,6 +30,7 @@ INCLUDE_CSS = {}
 
 HAS_HGRID_FILES = True
 GET_HGRID_DATA = views.github_hgrid_data
+PREFETCH_HGRID_DATA = views.github_prefetch_hgrid_data
 
 # Note: Even though GitHub supports file sizes over 1 MB, uploads and
 # downloads through their API are capped at 1 MB.
@@ -27,6 +27,9 @@ class GitHubClient(object):
         else:
             self.gh3 = github3.GitHub()
 
+        # Repos and branches fetched ahead by `prefetch`
+        self._prefetched = {}
+
         # Caching libary
         if github_settings.CACHE:
             self.gh3._session.mount('https://api.github.com/user', default_adapter)
@@ -49,11 +52,27 @@ class GitHubClient(object):
         :return: Dict of repo information
             See http://developer.github.com/v3/repos/#get
         """
+        if (user, repo) in self._prefetched:
+            return self._prefetched[(user, repo)]
         rv = self.gh3.repository(user, repo)
         if rv:
             return rv
         raise NotFoundError
 
+    def prefetch(self, user, repo, branches=()):
+        """Fetch a repo and, for each of `branches`, that branch or all of
+        them if None, so that the `repo` and `branches` calls asking for them
+        are answered without requests.
+
+        :param str user: GitHub user name
+        :param str repo: GitHub repo name
+        :param list branches: Branch names or None
+        """
+        fetched = {(user, repo): self.repo(user, repo)}
+        for branch in branches:
+            fetched[(user, repo, branch)] = list(self.branches(user, repo, branch))
+        self._prefetched.update(fetched)
+
     def repos(self):
         return self.gh3.iter_repos(type='all', sort='full_name')
 
@@ -80,6 +99,8 @@ class GitHubClient(object):
         :return: List of branch dicts
             http://developer.github.com/v3/repos/#list-branches
         """
+        if (user, repo, branch) in self._prefetched:
+            return list(self._prefetched[(user, repo, branch)])
         if branch:
             return [self.repo(user, repo).branch(branch)]
         return self.repo(user, repo).iter_branches() or []
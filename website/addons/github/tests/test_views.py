@@ -169,6 +169,25 @@ class TestGithubViews(OsfTestCase):
             github_mock.branches.return_value
         )
 
+    @mock.patch('website.addons.github.model.GitHubNodeSettings.complete', mock.PropertyMock(return_value=True))
+    @mock.patch('github3.repos.Repository.iter_branches')
+    @mock.patch('github3.github.GitHub.repository')
+    def test_hgrid_data_from_prefetched_connection_makes_no_requests(self, mock_repository, mock_iter_branches):
+        mock_repository.return_value = self.github.repo.return_value
+        mock_iter_branches.return_value = iter(self.github.branches.return_value)
+        prefetch = views.github_prefetch_hgrid_data(self.node_settings, self.consolidated_auth)
+        connection = prefetch()
+        mock_repository.reset_mock()
+        mock_iter_branches.reset_mock()
+
+        data = views.github_hgrid_data(self.node_settings, self.consolidated_auth, prefetched=connection)
+        assert_false(mock_repository.called)
+        assert_false(mock_iter_branches.called)
+        assert_equal(
+            data[0]['branches'],
+            [each.name for each in self.github.branches.return_value]
+        )
+
     def test_before_fork(self):
         url = self.project.api_url + 'fork/before/'
         res = self.app.get(url, auth=self.user.auth).maybe_follow()
@@ -186,13 +186,36 @@ def github_root_folder(*args, **kwargs):
 
     return github_hgrid_data(node_settings, auth=auth, **data)
 
-def github_hgrid_data(node_settings, auth, **kwargs):
+def github_prefetch_hgrid_data(node_settings, auth, **kwargs):
+    """Return a function fetching the repo and branches `github_hgrid_data` asks for"""
+    if not node_settings.complete:
+        return None
+
+    connection = GitHubClient(external_account=node_settings.external_account)
+    user, repo = node_settings.user, node_settings.repo
+    branches = []
+    if not node_settings.owner.is_registration:
+        branches.append(None)
+    if kwargs.get('sha'):
+        branches.append(kwargs.get('branch'))
+
+    def prefetch():
+        try:
+            connection.prefetch(user, repo, branches)
+        except (NotFoundError, GitHubError):
+            # Left to github_hgrid_data to report
+            return None
+        return connection
+    return prefetch
+
+
+def github_hgrid_data(node_settings, auth, prefetched=None, **kwargs):
 
     # Quit if no repo linked
     if not node_settings.complete:
         return
 
-    connection = GitHubClient(external_account=node_settings.external_account)
+    connection = prefetched or GitHubClient(external_account=node_settings.external_account)
 
     # Initialize repo here in the event that it is set in the privacy check
     # below. This potentially saves an API call in _check_permissions, below.
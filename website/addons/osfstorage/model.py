@@ -4,7 +4,10 @@ import logging
 
 from modularodm import fields
 
+from framework.celery_tasks.handlers import enqueue_task
+
 from website.files import utils as files_utils
+from website.files.tasks import copy_file_tree
 from website.files.models import OsfStorageFolder
 from website.addons.osfstorage import settings
 from website.addons.base import AddonNodeSettingsBase, StorageAddonBase
@@ -47,7 +50,13 @@ class OsfStorageNodeSettings(StorageAddonBase, AddonNodeSettingsBase):
         if not self.root_node:
             self.on_add()
 
-        clone.root_node = files_utils.copy_files(self.get_root(), clone.owner).stored_object
+        copier = files_utils.TreeCopier(self.get_root(), clone.owner)
+        if copier.count() > settings.ASYNC_COPY_THRESHOLD:
+            # Fork the root right away and copy everything below it in the background
+            clone.root_node = copier.copy_root().stored_object
+            enqueue_task(copy_file_tree.si(self.root_node._id, fork._id, copier.copy_id))
+        else:
+            clone.root_node = copier.copy().stored_object
         clone.save()
 
         return clone, None
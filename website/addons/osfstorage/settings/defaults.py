@@ -19,3 +19,8 @@ WATERBUTLER_SETTINGS = {
 WATERBUTLER_RESOURCE = 'folder'
 
 DISK_SAVING_MODE = settings.DISK_SAVING_MODE
+
+# File nodes copied per insert when forking
+COPY_BATCH_SIZE = 1000
+# Forks of trees with more file nodes than this get their files copied in the background
+ASYNC_COPY_THRESHOLD = 10000
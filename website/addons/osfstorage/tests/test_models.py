@@ -5,12 +5,14 @@ import unittest
 from nose.tools import *  # noqa
 
 from tests.factories import ProjectFactory, NodeFactory, CommentFactory
+from tests.utils import count_queries
 
 from website.addons.osfstorage.tests import factories
 from website.addons.osfstorage.tests.utils import StorageTestCase
 
 import datetime
 
+from modularodm import Q
 from modularodm import exceptions as modm_errors
 
 
@@ -18,6 +20,7 @@ from website.files import models
 from website.addons.osfstorage import utils
 from website.addons.osfstorage import settings
 from website.files.exceptions import FileNodeCheckedOutError
+from website.files.utils import TreeCopier
 
 
 class TestOsfstorageFileNode(StorageTestCase):
@@ -294,6 +297,76 @@ class TestOsfstorageFileNode(StorageTestCase):
         assert_equal(to_move.name, 'Tuna')
         assert_equal(moved.parent, move_to)
 
+    def test_lineage_is_stored(self):
+        root = self.node_settings.get_root()
+        folder = root.append_folder('Cloud')
+        child = folder.append_file('Carp')
+        stored = models.StoredFileNode._storage[0].store.find_one({'_id': child._id})
+        assert_equal(stored['materialized_path'], '/Cloud/Carp')
+        assert_equal(stored['ancestor_ids'], [root._id, folder._id])
+
+    def test_move_folder_updates_descendant_lineage(self):
+        root = self.node_settings.get_root()
+        to_move = root.append_folder('Carp')
+        child = to_move.append_folder('Tuna').append_file('Cod')
+        move_to = root.append_folder('Cloud')
+
+        to_move.move_under(move_to, name='Koi')
+        child.reload()
+
+        assert_equal(child.materialized_path, '/Cloud/Koi/Tuna/Cod')
+        assert_equal(child.ancestor_ids[:3], [root._id, move_to._id, to_move._id])
+
+    def test_copy_folder_lineage(self):
+        root = self.node_settings.get_root()
+        to_copy = root.append_folder('Carp')
+        to_copy.append_file('Cod')
+        copy_to = root.append_folder('Cloud')
+
+        copied = to_copy.copy_under(copy_to)
+        copied_child = list(copied.children)[0]
+
+        assert_equal(copied_child.materialized_path, '/Cloud/Carp/Cod')
+        assert_equal(copied_child.ancestor_ids, [root._id, copy_to._id, copied._id])
+
+    def test_restore_folder_lineage(self):
+        root = self.node_settings.get_root()
+        folder = root.append_folder('Cloud')
+        child = folder.append_file('Carp')
+        trashed = folder.delete()
+
+        restored = trashed.restore()
+        restored_child = models.OsfStorageFile.load(child._id)
+
+        assert_equal(restored_child.materialized_path, '/Cloud/Carp')
+        assert_equal(restored_child.ancestor_ids, [root._id, restored._id])
+
+    def test_get_lineage(self):
+        folder = self.node_settings.get_root()
+        for i in range(20):
+            folder = folder.append_folder('Folder {}'.format(i))
+        child = folder.append_file('Carp')
+        models.StoredFileNode._clear_caches()
+        child = models.OsfStorageFile.load(child._id)
+
+        with count_queries() as counter:
+            lineage = child.get_lineage()
+
+        assert_equal(counter.count, 1)
+        assert_equal(len(lineage), 22)
+        assert_equal(lineage[0], child)
+        assert_equal(lineage[-1], self.node_settings.get_root())
+        assert_equal([each.name for each in lineage[-2::-1]], ['Folder {}'.format(i) for i in range(20)] + ['Carp'])
+
+    def test_materialized_path_of_unmigrated_file(self):
+        child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
+        models.StoredFileNode._storage[0].store.update({}, {'$set': {'materialized_path': '', 'ancestor_ids': []}}, multi=True)
+        models.StoredFileNode._clear_caches()
+        child = models.OsfStorageFile.load(child._id)
+
+        assert_equal(child.materialized_path, '/Cloud/Carp')
+        assert_equal([each.name for each in child.get_lineage()], ['Carp', 'Cloud', ''])
+
     @unittest.skip
     def test_move_folder(self):
         pass
@@ -539,6 +612,89 @@ class TestNodeSettingsModel(StorageTestCase):
         assert_equal(cloned_record.versions, record.versions)
         assert_true(fork_node_settings.root_node)
 
+    def test_after_fork_copies_tree(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        record = folder.append_folder('Carp').append_file('Deep')
+
+        fork = self.project.fork_node(self.auth_obj)
+        fork_root = fork.get_addon('osfstorage').get_root()
+
+        cloned_folder = fork_root.find_child_by_name('Cloud')
+        cloned_record = cloned_folder.find_child_by_name('Carp').find_child_by_name('Deep')
+        assert_equal(cloned_record.node, fork)
+        assert_equal(cloned_record.copied_from, record.stored_object)
+        assert_equal(cloned_record.materialized_path, '/Cloud/Carp/Deep')
+        assert_equal(cloned_record.ancestor_ids, [fork_root._id, cloned_folder._id, cloned_record.parent._id])
+        assert_equal([each.name for each in cloned_record.get_lineage()], ['Deep', 'Carp', 'Cloud', self.project._id])
+
+    @mock.patch('website.addons.osfstorage.settings.ASYNC_COPY_THRESHOLD', 1)
+    @mock.patch('website.addons.osfstorage.model.enqueue_task')
+    def test_after_fork_copies_large_trees_in_background(self, mock_enqueue):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        folder.append_file('Carp')
+
+        fork = self.project.fork_node(self.auth_obj)
+        fork_root = fork.get_addon('osfstorage').get_root()
+
+        assert_equal(list(fork_root.children), [])
+        assert_equal(mock_enqueue.call_count, 1)
+        mock_enqueue.call_args[0][0]()
+        assert_equal(fork_root.find_child_by_name('Cloud').find_child_by_name('Carp').materialized_path, '/Cloud/Carp')
+
+
+class TestTreeCopier(StorageTestCase):
+
+    def setUp(self):
+        super(TestTreeCopier, self).setUp()
+        self.root = self.node_settings.get_root()
+        self.folder = self.root.append_folder('Cloud')
+        for i in range(5):
+            self.folder.append_file('file{}'.format(i))
+            self.folder.append_folder('folder{}'.format(i)).append_file('file')
+        self.target = ProjectFactory()
+        self.target_root = self.target.get_addon('osfstorage').get_root()
+
+    def test_count(self):
+        assert_equal(TreeCopier(self.root, self.target).count(), 16)
+        assert_equal(TreeCopier(self.folder, self.target).count(), 15)
+
+    def test_copy_into_folder(self):
+        copied = TreeCopier(self.folder, self.target, parent=self.target_root, name='Carp', batch_size=2).copy()
+
+        assert_equal(copied.parent, self.target_root.stored_object)
+        assert_equal(copied.materialized_path, '/Carp/')
+        assert_equal(len(list(copied.children)), 10)
+        copied_file = copied.find_child_by_name('folder3').find_child_by_name('file')
+        assert_equal(copied_file.materialized_path, '/Carp/folder3/file')
+        assert_equal(copied_file.ancestor_ids, [self.target_root._id, copied._id, copied_file.parent._id])
+        assert_equal(models.StoredFileNode.find(Q('node', 'eq', self.target)).count(), 17)
+
+    def test_copy_is_resumable(self):
+        copier = TreeCopier(self.folder, self.target, parent=self.target_root)
+        copier.copy_root()
+        models.StoredFileNode._storage[0].store.insert(
+            dict(
+                models.StoredFileNode._storage[0].store.find_one({'_id': self.folder.find_child_by_name('file2')._id}),
+                _id=copier.new_id(self.folder.find_child_by_name('file2')._id),
+                parent=copier.new_id(self.folder._id),
+                node=self.target._id,
+            )
+        )
+
+        TreeCopier(self.folder, self.target, parent=self.target_root, copy_id=copier.copy_id).copy()
+
+        assert_equal(models.StoredFileNode.find(Q('node', 'eq', self.target)).count(), 17)
+        assert_equal(len(list(self.target_root.find_child_by_name('Cloud').children)), 10)
+
+    def test_copy_reuses_versions(self):
+        record = self.folder.find_child_by_name('file0')
+        record.versions.append(factories.FileVersionFactory())
+        record.save()
+
+        copied = TreeCopier(self.folder, self.target, parent=self.target_root).copy()
+
+        assert_equal(copied.find_child_by_name('file0').versions, record.versions)
+
 
 class TestOsfStorageFileVersion(StorageTestCase):
 
@@ -3,7 +3,6 @@ from __future__ import unicode_literals
 import httplib
 import logging
 
-from modularodm import Q
 from modularodm.storage.base import KeyExistsException
 
 from flask import request
@@ -105,16 +104,7 @@ def osfstorage_move_hook(source, destination, name=None, **kwargs):
 @must_be_signed
 @decorators.autoload_filenode(default_root=True)
 def osfstorage_get_lineage(file_node, node_addon, **kwargs):
-    #TODO Profile
-    list(models.OsfStorageFolder.find(Q('node', 'eq', node_addon.owner)))
-
-    lineage = []
-
-    while file_node:
-        lineage.append(file_node.serialize())
-        file_node = file_node.parent
-
-    return {'data': lineage}
+    return {'data': [each.serialize() for each in file_node.get_lineage()]}
 
 
 @must_be_signed
@@ -20,6 +20,7 @@ from framework.mongo import utils as mongo_utils
 
 from website import settings
 from website.addons.base import AddonNodeSettingsBase
+from website.addons.wiki import render_cache
 from website.addons.wiki import utils as wiki_utils
 from website.addons.wiki.settings import WIKI_CHANGE_DATE
 from website.project.commentable import Commentable
@@ -235,6 +236,9 @@ class NodeWikiPage(GuidStoredObject, Commentable):
 
     def html(self, node):
         """The cleaned HTML of the page"""
+        return render_cache.get_rendered(self, node, 'html', functools.partial(self._render_html, node))
+
+    def _render_html(self, node):
         sanitized_content = render_content(self.content, node=node)
         try:
             return linkify(
@@ -248,7 +252,10 @@ class NodeWikiPage(GuidStoredObject, Commentable):
     def raw_text(self, node):
         """ The raw text of the page, suitable for using in a test search"""
 
-        return sanitize(self.html(node), tags=[], strip=True)
+        return render_cache.get_rendered(
+            self, node, 'text',
+            lambda: sanitize(self.html(node), tags=[], strip=True),
+        )
 
     def get_draft(self, node):
         """
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Cache of rendered wiki pages.
+
+Rendering a page runs markdown with Pygments highlighting and bleach over the
+whole content, which is slow for large pages, and the same page is rendered for
+every view, every comment on it and every search update of its node. Rendered
+HTML and text are cached by page id. Each entry records a fingerprint of
+everything the output depends on (the content, the node links are built for
+and `RENDERER_VERSION`). An entry whose fingerprint does not match is treated as
+a miss, so an edited page is never served stale even before it is invalidated.
+
+Entries are kept in an in-process LRU of `WIKI_RENDER_CACHE_SIZE` pages, and,
+when `WIKI_RENDER_CACHE_SHARED` is set, in the ``wikirendercache`` collection so
+that they are shared between processes.
+"""
+import collections
+import hashlib
+import threading
+
+import markdown
+import pygments
+
+from framework import metrics
+from framework.mongo import database
+from website import settings
+from website.addons.wiki import settings as wiki_settings
+
+# Bump when a change to `render_content` or `NodeWikiPage.html` changes its output
+RENDERER_VERSION = 1
+
+COLLECTION = 'wikirendercache'
+
+
+class RenderCache(object):
+    """Thread-safe LRU of rendered pages, keyed by page id"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, page_id, fingerprint):
+        with self._lock:
+            entry = self._entries.pop(page_id, None)
+            if entry is None or entry['fingerprint'] != fingerprint:
+                self.stats['misses'] += 1
+                return None
+            self._entries[page_id] = entry  # Most recently used
+            self.stats['hits'] += 1
+            return entry
+
+    def set(self, page_id, entry):
+        with self._lock:
+            self._set(page_id, entry)
+
+    def update(self, page_id, fingerprint, **values):
+        """Add `values` to the entry of `page_id`, replacing it if its fingerprint
+        does not match, and return the entry
+        """
+        with self._lock:
+            entry = self._entries.get(page_id)
+            if entry is None or entry['fingerprint'] != fingerprint:
+                entry = {'_id': page_id, 'fingerprint': fingerprint}
+            entry = dict(entry, **values)
+            self._set(page_id, entry)
+            return entry
+
+    def _set(self, page_id, entry):
+        self._entries.pop(page_id, None)
+        self._entries[page_id] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def invalidate(self, page_ids):
+        with self._lock:
+            for page_id in page_ids:
+                self._entries.pop(page_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = RenderCache(wiki_settings.WIKI_RENDER_CACHE_SIZE)
+
+
+def get_collection():
+    return database[COLLECTION]
+
+
+def get_fingerprint(page, node):
+    content = page.content or ''
+    return hashlib.sha1('\0'.join([
+        str(RENDERER_VERSION),
+        markdown.version,
+        pygments.__version__,
+        repr(sorted(settings.WIKI_WHITELIST.items())),
+        str(node._id),
+        content.encode('utf-8') if isinstance(content, unicode) else content,
+    ])).hexdigest()
+
+
+def get_rendered(page, node, key, render):
+    """Return the cached `key` ('html' or 'text') of `page` rendered for `node`,
+    calling `render()` and caching its result on a miss.
+    """
+    fingerprint = get_fingerprint(page, node)
+    entry = cache.get(page._id, fingerprint)
+    if entry is None and wiki_settings.WIKI_RENDER_CACHE_SHARED:
+        entry = get_collection().find_one({'_id': page._id, 'fingerprint': fingerprint})
+        if entry is not None:
+            cache.set(page._id, entry)
+    if entry is not None and key in entry:
+        return entry[key]
+
+    value = render()
+    entry = cache.update(page._id, fingerprint, **{key: value})
+    if wiki_settings.WIKI_RENDER_CACHE_SHARED:
+        get_collection().save(entry)
+    return value
+
+
+def invalidate(*pages):
+    """Drop the rendered versions of `pages`"""
+    page_ids = [page._id for page in pages if page]
+    cache.invalidate(page_ids)
+    if wiki_settings.WIKI_RENDER_CACHE_SHARED and page_ids:
+        get_collection().remove({'_id': {'$in': page_ids}})
+
+
+def get_status():
+    return dict(cache.stats, size=len(cache))
+
+
+metrics.register('wiki_render_cache', get_status)
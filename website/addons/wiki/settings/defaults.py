@@ -11,3 +11,8 @@ SHAREJS_DB_URL = 'mongodb://{}:{}/{}'.format(settings.DB_HOST, settings.DB_PORT,
 
 # TODO: Change to release date for wiki change
 WIKI_CHANGE_DATE = datetime.datetime.utcfromtimestamp(1423760098)
+
+# Number of rendered wiki pages cached per process
+WIKI_RENDER_CACHE_SIZE = 500
+# Also cache rendered pages in the database, shared by all processes
+WIKI_RENDER_CACHE_SHARED = False
@@ -17,6 +17,7 @@ from tests.factories import (
 )
 
 from website.exceptions import NodeStateError
+from website.addons.wiki import render_cache
 from website.addons.wiki import settings
 from website.addons.wiki import views
 from website.addons.wiki.exceptions import InvalidVersionError
@@ -71,6 +72,77 @@ class TestNodeWikiPageModel(OsfTestCase):
         # node.wiki_pages_current and node.wiki_pages_versions
         assert_false(ver.is_current)
 
+
+class TestWikiRenderCache(OsfTestCase):
+
+    def setUp(self):
+        super(TestWikiRenderCache, self).setUp()
+        render_cache.cache.clear()
+        self.user = AuthUserFactory()
+        self.project = ProjectFactory(creator=self.user)
+        self.project.update_node_wiki('home', '# Hello\n\n[[other page]]', Auth(self.user))
+        self.page = self.project.get_wiki_page('home')
+
+    @mock.patch('website.addons.wiki.model.render_content', wraps=render_content)
+    def test_html_is_rendered_once(self, mock_render):
+        html = self.page.html(self.project)
+        assert_equal(self.page.html(self.project), html)
+        assert_equal(self.page.raw_text(self.project), self.page.raw_text(self.project))
+        assert_in('/{}/wiki/other page/'.format(self.project._id), html)
+        assert_equal(mock_render.call_count, 1)
+
+    @mock.patch('website.addons.wiki.model.render_content', wraps=render_content)
+    def test_html_is_rendered_again_for_new_content(self, mock_render):
+        self.page.html(self.project)
+        self.page.content = 'Bye'
+        assert_in('Bye', self.page.html(self.project))
+        assert_equal(mock_render.call_count, 2)
+
+    def test_html_is_rendered_again_for_other_node(self):
+        fork = ProjectFactory()
+        self.page.html(self.project)
+        assert_in('/{}/wiki/other page/'.format(fork._id), self.page.html(fork))
+
+    @mock.patch('website.addons.wiki.render_cache.invalidate')
+    def test_update_invalidates_previous_version(self, mock_invalidate):
+        self.project.update_node_wiki('home', 'Bye', Auth(self.user))
+        mock_invalidate.assert_called_once_with(self.page)
+
+    @mock.patch('website.addons.wiki.render_cache.invalidate')
+    def test_rename_invalidates_page(self, mock_invalidate):
+        self.project.update_node_wiki('Other', 'Hello', Auth(self.user))
+        page = self.project.get_wiki_page('Other')
+        self.project.rename_node_wiki('Other', 'Another', Auth(self.user))
+        mock_invalidate.assert_called_once_with(page)
+
+    @mock.patch('website.addons.wiki.render_cache.invalidate')
+    def test_delete_invalidates_page(self, mock_invalidate):
+        self.project.delete_node_wiki('home', Auth(self.user))
+        mock_invalidate.assert_called_once_with(self.page)
+
+    def test_invalidate(self):
+        self.page.html(self.project)
+        render_cache.invalidate(self.page)
+        assert_not_in(self.page._id, render_cache.cache._entries)
+
+    def test_least_recently_used_pages_are_evicted(self):
+        cache = render_cache.RenderCache(2)
+        for page_id in ('a', 'b', 'c'):
+            cache.update(page_id, 'fingerprint', html=page_id)
+        assert_is_none(cache.get('a', 'fingerprint'))
+        assert_equal(cache.get('c', 'fingerprint')['html'], 'c')
+        assert_equal(cache.stats['evictions'], 1)
+
+    @mock.patch('website.addons.wiki.render_cache.wiki_settings.WIKI_RENDER_CACHE_SHARED', True)
+    def test_shared_cache(self):
+        html = self.page.html(self.project)
+        render_cache.cache.clear()
+        with mock.patch('website.addons.wiki.model.render_content') as mock_render:
+            assert_equal(self.page.html(self.project), html)
+        assert_false(mock_render.called)
+        render_cache.invalidate(self.page)
+        assert_is_none(render_cache.get_collection().find_one({'_id': self.page._id}))
+
 class TestWikiViews(OsfTestCase):
 
     def setUp(self):
@@ -124,8 +124,15 @@ def stat_addon(addon_short_name, job_pk):
     job = ArchiveJob.load(job_pk)
     src, dst, user = job.info()
     src_addon = src.get_addon(addon_name)
+    root = src_addon._file_tree_root()
     try:
-        file_tree = src_addon._get_file_tree(user=user, version=version)
+        # Sum up each folder as it is listed rather than holding the whole tree
+        aggregate = utils.aggregate_file_tree_metadata(
+            addon_short_name,
+            root,
+            user,
+            listings=src_addon._walk_file_tree(root, user=user, version=version),
+        )
     except HTTPError as e:
         dst.archive_job.update_target(
             addon_short_name,
@@ -136,7 +143,7 @@ def stat_addon(addon_short_name, job_pk):
     result = AggregateStatResult(
         src_addon._id,
         addon_short_name,
-        targets=[utils.aggregate_file_tree_metadata(addon_short_name, file_tree, user)],
+        targets=[aggregate],
     )
     return result
 
@@ -304,13 +311,11 @@ def archive_success(dst_pk, job_pk):
 
     :param str dst_pk: primary key of registration Node
 
-    note:: At first glance this task makes redundant calls to utils.get_file_map (which
-    returns a generator yielding  (<sha256>, <file_metadata>) pairs) on the dst Node. Two
-    notes about utils.get_file_map: 1) this function memoizes previous results to reduce
-    overhead and 2) this function returns a generator that lazily fetches the file metadata
-    of child Nodes (it is possible for a selected file to belong to a child Node) using a
-    non-recursive DFS. Combined this allows for a relatively effient implementation with
-    seemingly redundant calls.
+    note:: Selected files are looked up with utils.find_registration_file, which indexes
+    the files of the dst Node and its primary descendants (it is possible for a selected
+    file to belong to a child Node) by sha256 the first time it is called, so each lookup
+    is a dictionary access. The file maps and index are released once all schemas have
+    been migrated.
     """
     create_app_context()
     dst = Node.load(dst_pk)
@@ -319,9 +324,12 @@ def archive_success(dst_pk, job_pk):
     # questions. These files are references to files on the unregistered Node, and
     # consequently we must migrate those file paths after archiver has run. Using
     # sha256 hashes is a convenient way to identify files post-archival.
-    for schema in dst.registered_schema:
-        if schema.has_files:
-            utils.migrate_file_metadata(dst, schema)
+    try:
+        for schema in dst.registered_schema:
+            if schema.has_files:
+                utils.migrate_file_metadata(dst, schema)
+    finally:
+        utils.release_file_maps(dst)
     job = ArchiveJob.load(job_pk)
     if not job.sent:
         job.sent = True
@@ -1,4 +1,4 @@
-import functools
+import collections
 
 from framework.auth import Auth
 
@@ -132,29 +132,62 @@ def link_archive_provider(node, user):
     addon.on_add()
     node.save()
 
-def aggregate_file_tree_metadata(addon_short_name, fileobj_metadata, user):
-    """Recursively traverse the addon's file tree and collect metadata in AggregateStatResult
+def aggregate_file_tree_metadata(addon_short_name, fileobj_metadata, user, listings=()):
+    """Traverse the addon's file tree and collect metadata in AggregateStatResult
 
     :param src_addon: AddonNodeSettings instance of addon being examined
     :param fileobj_metadata: file or folder metadata of current point of reference
     in file tree
     :param user: archive initatior
-    :return: top-most recursive call returns AggregateStatResult containing addon file tree metadata
+    :param listings: ``(folder, children)`` pairs for the folders of the tree
+    whose children aren't attached to them, e.g. from
+    `StorageAddonBase._walk_file_tree`; each listing is summed up as it
+    arrives and not kept
+    :return: AggregateStatResult containing addon file tree metadata
     """
-    disk_usage = fileobj_metadata.get('size')
     if fileobj_metadata['kind'] == 'file':
-        result = StatResult(
-            target_name=fileobj_metadata['name'],
-            target_id=fileobj_metadata['path'].lstrip('/'),
-            disk_usage=disk_usage or 0,
-        )
-        return result
+        return _file_stat_result(fileobj_metadata)
+    # Results of the folders whose listings are still to come, by path
+    unlisted = {}
+
+    def add_children(result, children):
+        # Walk attached children with an explicit stack so deep trees don't hit the recursion limit
+        stack = [(result, children)]
+        while stack:
+            result, children = stack.pop()
+            for child in children:
+                if child['kind'] == 'file':
+                    result.targets.append(_file_stat_result(child))
+                    continue
+                child_result = _folder_stat_result(child)
+                result.targets.append(child_result)
+                if 'children' in child:
+                    stack.append((child_result, child['children']))
+                else:
+                    unlisted[child['path']] = child_result
+
+    root = _folder_stat_result(fileobj_metadata)
+    if 'children' in fileobj_metadata:
+        add_children(root, fileobj_metadata['children'])
     else:
-        return AggregateStatResult(
-            target_id=fileobj_metadata['path'].lstrip('/'),
-            target_name=fileobj_metadata['name'],
-            targets=[aggregate_file_tree_metadata(addon_short_name, child, user) for child in fileobj_metadata.get('children', [])],
-        )
+        unlisted[fileobj_metadata['path']] = root
+    for folder, children in listings:
+        add_children(unlisted.pop(folder['path']), children)
+    return root
+
+def _folder_stat_result(fileobj_metadata):
+    return AggregateStatResult(
+        target_id=fileobj_metadata['path'].lstrip('/'),
+        target_name=fileobj_metadata['name'],
+        targets=[],
+    )
+
+def _file_stat_result(fileobj_metadata):
+    return StatResult(
+        target_name=fileobj_metadata['name'],
+        target_id=fileobj_metadata['path'].lstrip('/'),
+        disk_usage=fileobj_metadata.get('size') or 0,
+    )
 
 def before_archive(node, user):
     link_archive_provider(node, user)
@@ -169,51 +202,68 @@ def _do_get_file_map(file_tree):
     """Reduces a tree of folders and files into a list of (<sha256>, <file_metadata>) pairs
     """
     file_map = []
-    stack = [file_tree]
-    while len(stack):
-        tree_node = stack.pop(0)
+    queue = collections.deque([file_tree])
+    while queue:
+        tree_node = queue.popleft()
         if tree_node['kind'] == 'file':
             file_map.append((tree_node['extra']['hashes']['sha256'], tree_node))
         else:
-            stack = stack + tree_node['children']
+            queue.extend(tree_node['children'])
     return file_map
 
-def _memoize_get_file_map(func):
-    cache = {}
-    @functools.wraps(func)
-    def wrapper(node):
-        if node._id not in cache:
-            osf_storage = node.get_addon('osfstorage')
-            file_tree = osf_storage._get_file_tree(user=node.creator)
-            cache[node._id] = _do_get_file_map(file_tree)
-        return func(node, cache[node._id])
-    return wrapper
-
-@_memoize_get_file_map
-def get_file_map(node, file_map):
+# File maps by node id and file indexes by registration id, kept until the
+# archive job that needs them is done with them; see `release_file_maps`
+_file_maps = {}
+_file_indexes = {}
+
+def _get_node_file_map(node):
+    if node._id not in _file_maps:
+        osf_storage = node.get_addon('osfstorage')
+        file_tree = osf_storage._get_file_tree(user=node.creator)
+        _file_maps[node._id] = _do_get_file_map(file_tree)
+    return _file_maps[node._id]
+
+def _iter_primary_nodes(node):
+    """Yield `node` and its primary descendants, depth first"""
+    stack = [node]
+    while stack:
+        each = stack.pop()
+        yield each
+        stack.extend(reversed(each.nodes_primary))
+
+def get_file_map(node):
+    """Lazily yield (<sha256>, <file_metadata>, <node_id>) for the OSF Storage files
+    of `node` and its primary descendants. The file map of each node is fetched once
+    and reused until `release_file_maps` is called.
     """
-    note:: file_map is injected implictly by the decorator; this method is called like:
+    for each in _iter_primary_nodes(node):
+        for key, value in _get_node_file_map(each):
+            yield (key, value, each._id)
 
-    get_file_map(node)
+def get_file_index(node):
+    """Index the files of `get_file_map(node)` by (<sha256>, <registered_from id>, <name>),
+    keeping the first file found for each key.
     """
-    for (key, value) in file_map:
-        yield (key, value, node._id)
-    for child in node.nodes_primary:
-        for key, value, node_id in get_file_map(child):
-            yield (key, value, node_id)
+    if node._id not in _file_indexes:
+        index = {}
+        for each in _iter_primary_nodes(node):
+            registered_from_id = each.registered_from_id
+            for sha256, value in _get_node_file_map(each):
+                index.setdefault((sha256, registered_from_id, value['name']), (value, each._id))
+        _file_indexes[node._id] = index
+    return _file_indexes[node._id]
+
+def release_file_maps(node):
+    """Drop the cached file maps and index of `node` and its primary descendants"""
+    _file_indexes.pop(node._id, None)
+    for each in _iter_primary_nodes(node):
+        _file_maps.pop(each._id, None)
 
 def find_registration_file(value, node):
-    from website.models import Node
-
-    orig_sha256 = value['sha256']
-    orig_name = value['selectedFileName']
-    orig_node = value['nodeId']
-    file_map = get_file_map(node)
-    for sha256, value, node_id in file_map:
-        registered_from_id = Node.load(node_id).registered_from._id
-        if sha256 == orig_sha256 and registered_from_id == orig_node and orig_name == value['name']:
-            return value, node_id
-    return None, None
+    return get_file_index(node).get(
+        (value['sha256'], value['nodeId'], value['selectedFileName']),
+        (None, None),
+    )
 
 def find_registration_files(values, node):
     ret = []
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Versions of the files of each provider of a node.
+
+The API caches the metadata WaterButler returns in every process (see
+`api.nodes.utils.MetadataCache`), while WaterButler reports changes to the web
+process through `create_waterbutler_log`. Each report bumps the version of
+the files of the provider in `filemetadataversions`; metadata is cached under
+the version current when it was fetched, so that every process stops serving
+it as soon as the files change.
+"""
+from framework.mongo import database
+
+
+def _collection():
+    return database['filemetadataversions']
+
+
+def _key(node_id, provider):
+    return '{}:{}'.format(node_id, provider)
+
+
+def record_change(node_id, provider):
+    _collection().update({'_id': _key(node_id, provider)}, {'$inc': {'version': 1}}, upsert=True)
+
+
+def get_version(node_id, provider):
+    versions = _collection().find_one({'_id': _key(node_id, provider)}) or {}
+    return versions.get('version', 0)
@@ -64,6 +64,7 @@ class TrashedFileNode(StoredObject, Commentable):
     name = fields.StringField(required=True)
     path = fields.StringField(required=True)
     materialized_path = fields.StringField(required=True)
+    ancestor_ids = fields.StringField(list=True)
 
     checkout = fields.AbstractForeignField('User')
     deleted_by = fields.AbstractForeignField('User')
@@ -173,6 +174,11 @@ class StoredFileNode(StoredObject, Commentable):
         'key_or_list': [
             ('parent', pymongo.ASCENDING),
         ]
+    }, {
+        'unique': False,
+        'key_or_list': [
+            ('ancestor_ids', pymongo.ASCENDING),
+        ]
     }]
 
     _id = fields.StringField(primary=True, default=lambda: str(bson.ObjectId()))
@@ -196,6 +202,9 @@ class StoredFileNode(StoredObject, Commentable):
     name = fields.StringField(required=True)
     path = fields.StringField(required=True)
     materialized_path = fields.StringField(required=True)
+    # Ids of the ancestors of this file node, root first
+    # Only maintained by providers that compute materialized_path themselves, see OsfStorageFileNode
+    ancestor_ids = fields.StringField(list=True)
 
     # The User that has this file "checked out"
     # Should only be used for OsfStorage
@@ -544,6 +553,12 @@ class FileNode(object):
         if save:
             self.save()
 
+    def metadata_changed(self, data):
+        """Whether metadata `data` received from waterbutler differs from what
+        is stored, i.e. whether `update` has anything to save
+        """
+        return self.name != data['name'] or self.materialized_path != data['materialized']
+
     def _create_trashed(self, save=True, user=None, parent=None):
         trashed = TrashedFileNode(
             _id=self._id,
@@ -558,6 +573,7 @@ class FileNode(object):
             versions=self.versions,
             last_touched=self.last_touched,
             materialized_path=self.materialized_path,
+            ancestor_ids=self.ancestor_ids,
 
             deleted_by=user
         )
@@ -566,9 +582,13 @@ class FileNode(object):
         return trashed
 
     def _repoint_guids(self, updated):
+        from website.project.model import Comment
+
         for guid in Guid.find(Q('referent', 'eq', self)):
             guid.referent = updated
             guid.save()
+            if updated.is_deleted:
+                Comment.hide_for_deleted_target(guid._id)
 
     def _update_node(self, recursive=True, save=True):
         if self.parent is not None:
@@ -710,6 +730,12 @@ class File(FileNode):
         self.save()
         return version
 
+    def metadata_changed(self, data):
+        return (
+            super(File, self).metadata_changed(data) or
+            not any(entry.get('etag') == data.get('etag') for entry in self.history)
+        )
+
     def get_download_count(self, version=None):
         """Pull the download count from the pagecounter collection
         Limit to version if specified.
@@ -17,6 +17,10 @@ class DataverseFolder(DataverseFileNode, Folder):
 class DataverseFile(DataverseFileNode, File):
     version_identifier = 'version'
 
+    def metadata_changed(self, data):
+        # Updating decides whether the current user may see the file
+        return True
+
     def update(self, revision, data, user=None):
         """Note: Dataverse only has psuedo versions, don't save them
         Dataverse requires a user for the weird check below
@@ -19,6 +19,10 @@ class FigshareFile(FigshareFileNode, File):
     def touch(self, bearer, revision=None, **kwargs):
         return super(FigshareFile, self).touch(bearer, revision=None, **kwargs)
 
+    def metadata_changed(self, data):
+        # Figshare files have no history
+        return FileNode.metadata_changed(self, data)
+
     def update(self, revision, data, user=None):
         """Figshare does not support versioning.
         Always pass revision as None to avoid conflict.
@@ -75,27 +75,55 @@ class OsfStorageFileNode(FileNode):
 
     @property
     def materialized_path(self):
-        """creates the full path to a the given filenode
-        Note: Possibly high complexity/ many database calls
-        USE SPARINGLY
+        """The full path to the given filenode, kept up to date on save
         """
+        if self.stored_object.materialized_path:
+            return self.stored_object.materialized_path
+        # Not saved since lineages were stored; see scripts/osfstorage/populate_lineage.py
+        return self._compute_materialized_path()
+
+    def _compute_materialized_path(self):
         if not self.parent:
             return '/'
-        # Note: ODM cache can be abused here
-        # for highly nested folders calling
-        # list(self.__class__.find(Q(nodesetting),Q(folder))
-        # may result in a massive increase in performance
-        def lineage():
-            current = self
-            while current:
-                yield current
-                current = current.parent
-
-        path = os.path.join(*reversed([x.name for x in lineage()]))
+        path = os.path.join(*reversed([x.name for x in self._walk_lineage()]))
         if self.is_file:
             return '/{}'.format(path)
         return '/{}/'.format(path)
 
+    def _walk_lineage(self):
+        current = self
+        while current:
+            yield current
+            current = current.parent
+
+    def get_lineage(self):
+        """This file node followed by its ancestors, up to and including the root folder.
+        Ancestors are loaded with a single query.
+        """
+        if not self.stored_object.materialized_path:
+            return list(self._walk_lineage())
+        ancestors = {
+            each._id: each
+            for each in OsfStorageFileNode.find(Q('_id', 'in', list(self.ancestor_ids)))
+        }
+        return [self] + [ancestors[_id] for _id in reversed(self.ancestor_ids)]
+
+    def _update_lineage(self):
+        """Store the materialized path and ancestors of this file node, derived from
+        those of its parent. The parent must be up to date, which is why move_under,
+        copy_under and restore save descendants after their ancestors.
+        """
+        parent = self.parent
+        if parent is None:
+            self.ancestor_ids = []
+            self.materialized_path = '/'
+            return
+        if parent.stored_object.materialized_path:
+            self.ancestor_ids = list(parent.ancestor_ids) + [parent._id]
+        else:
+            self.ancestor_ids = [each._id for each in reversed(list(parent._walk_lineage()))]
+        self.materialized_path = '{}{}{}'.format(parent.materialized_path, self.name, '' if self.is_file else '/')
+
     @property
     def path(self):
         """Path is dynamically computed as storedobject.path is stored
@@ -162,7 +190,7 @@ class OsfStorageFileNode(FileNode):
 
     def save(self):
         self.path = ''
-        self.materialized_path = ''
+        self._update_lineage()
         return super(OsfStorageFileNode, self).save()
 
 
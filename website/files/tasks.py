@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from framework.celery_tasks import app as celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, ignore_results=True, max_retries=5, default_retry_delay=60)
+def copy_file_tree(self, src_id, target_node_id, copy_id, parent_id=None, name=None):
+    """Copy an OSF Storage file tree with a `TreeCopier`. Retries pick up where the
+    failed attempt stopped, as they copy with the same `copy_id`.
+    """
+    from website.files.models import FileNode
+    from website.files.utils import TreeCopier
+    from website.models import Node
+
+    src = FileNode.load(src_id)
+    target_node = Node.load(target_node_id)
+    parent = FileNode.load(parent_id) if parent_id else None
+    try:
+        TreeCopier(src, target_node, parent=parent, name=name, copy_id=copy_id).copy()
+    except Exception as exc:
+        logger.exception(exc)
+        self.retry(exc=exc)
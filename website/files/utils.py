@@ -1,4 +1,7 @@
+import hashlib
+
 from modularodm.exceptions import ValidationValueError
+from pymongo.errors import DuplicateKeyError
 
 
 def copy_files(src, target_node, parent=None, name=None):
@@ -27,6 +30,107 @@ def copy_files(src, target_node, parent=None, name=None):
     return cloned
 
 
+class TreeCopier(object):
+    """Copy an OSF Storage file node and everything below it to another node in bulk.
+
+    The tree is read a page of folders at a time, level by level, and copied with
+    one insert per page instead of a clone and a save per file node. Versions and
+    tags are referenced by id as they are by `copy_files`, without loading them.
+    Ids of the copies are derived from `copy_id` and the ids of the originals, so a
+    copy that was interrupted can be finished by running it again with the same
+    `copy_id`: file nodes copied by the earlier run are skipped.
+
+    :param Folder src: The file node to copy
+    :param Node target_node: The node to copy files to
+    :param Folder parent: The folder to attach the copy of src to, if any
+    :param str name: The name of the copy of src, defaults to the name of src
+    """
+    def __init__(self, src, target_node, parent=None, name=None, copy_id=None, batch_size=None):
+        from website.addons.osfstorage import settings as osf_storage_settings
+        assert src.provider == 'osfstorage', 'Only OSF Storage trees can be copied in bulk'
+        assert not parent or not parent.is_file, 'Parent must be a folder'
+        self.src = src
+        self.target_node = target_node
+        self.parent = parent
+        self.name = name
+        self.copy_id = copy_id or '{}:{}'.format(target_node._id, src._id)
+        self.batch_size = batch_size or osf_storage_settings.COPY_BATCH_SIZE
+
+    @property
+    def collection(self):
+        from website.files.models import StoredFileNode
+        return StoredFileNode._storage[0].store
+
+    def new_id(self, _id):
+        return hashlib.md5('{}:{}'.format(self.copy_id, _id)).hexdigest()[:24]
+
+    def count(self):
+        """The number of file nodes below src, as recorded by their stored lineage"""
+        return self.collection.find({'ancestor_ids': self.src._id}).count()
+
+    def copy_root(self):
+        """Copy src alone and return the copy"""
+        from website.files.models import FileNode
+
+        self._copy_documents([self.collection.find_one({'_id': self.src._id})], {})
+        return FileNode.load(self.new_id(self.src._id))
+
+    def copy(self):
+        """Copy src and everything below it and return the copy of src"""
+        from website.files.models import FileNode
+
+        # (ancestor_ids, materialized_path) of the copies of the folders of the current level
+        lineages = self._copy_documents([self.collection.find_one({'_id': self.src._id})], {})
+        while lineages:
+            folder_ids = list(lineages)
+            next_lineages, batch = {}, []
+            for start in range(0, len(folder_ids), self.batch_size):
+                for document in self.collection.find({'parent': {'$in': folder_ids[start:start + self.batch_size]}}):
+                    batch.append(document)
+                    if len(batch) >= self.batch_size:
+                        next_lineages.update(self._copy_documents(batch, lineages))
+                        batch = []
+            next_lineages.update(self._copy_documents(batch, lineages))
+            lineages = next_lineages
+        return FileNode.load(self.new_id(self.src._id))
+
+    def _copy_documents(self, documents, lineages):
+        """Insert copies of `documents`, whose parents have been copied already
+
+        :return dict: lineages of the copied folders, by original id
+        """
+        copied, copied_lineages = [], {}
+        for document in documents:
+            copy = dict(document, _id=self.new_id(document['_id']), node=self.target_node._id, copied_from=document['_id'])
+            if document['_id'] == self.src._id:
+                copy['name'] = self.name or document['name']
+                if self.parent:
+                    copy['parent'] = self.parent._id
+                    ancestor_ids = list(self.parent.ancestor_ids) + [self.parent._id]
+                    parent_path = self.parent.materialized_path
+                else:
+                    copy['parent'] = None
+                    ancestor_ids, parent_path = [], None
+            else:
+                copy['parent'] = self.new_id(document['parent'])
+                parent_ancestor_ids, parent_path = lineages[document['parent']]
+                ancestor_ids = parent_ancestor_ids + [copy['parent']]
+            copy['ancestor_ids'] = ancestor_ids
+            if parent_path is None:
+                copy['materialized_path'] = '/'
+            else:
+                copy['materialized_path'] = '{}{}{}'.format(parent_path, copy['name'], '' if copy['is_file'] else '/')
+            if not copy['is_file']:
+                copied_lineages[document['_id']] = (ancestor_ids, copy['materialized_path'])
+            copied.append(copy)
+        if copied:
+            try:
+                self.collection.insert(copied, continue_on_error=True)
+            except DuplicateKeyError:
+                pass  # Copied by an earlier run of this copy
+        return copied_lineages
+
+
 class GenWrapper(object):
     """A Wrapper for MongoQuerySets
     Overrides __iter__ so for loops will always
@@ -124,6 +124,61 @@ def send_mail(to_addr, mail, mimetype='plain', from_addr=None, mailer=None,
 
             return ret
 
+
+class MailBatch(object):
+    """Mailer for `send_mail` that collects mails to send them together.
+
+    Pass a batch as the `mailer` of `send_mail` calls, then call `send` to send
+    the collected mails on pooled connections with `tasks.send_emails`, in tasks
+    of `MAIL_SEND_BATCH_SIZE` mails when celery is used.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.callbacks = []
+
+    def __call__(self, **kwargs):
+        self.messages.append(kwargs)
+        return True
+
+    def apply_async(self, kwargs, link=None):
+        self.messages.append(kwargs)
+        if link:
+            self.callbacks.append(link)
+
+    def send(self, link=None):
+        """Send the collected mails. Returns whether each was sent, or the
+        async results of the tasks sending them when celery is used.
+
+        :param link: Optional function of the positions ``(start, stop)`` of
+            mails in the batch, returning a signature to call with whether each
+            of those mails was sent once they have been; linked to the task
+            sending them when celery is used
+        """
+        messages, self.messages = self.messages, []
+        callbacks, self.callbacks = self.callbacks, []
+        if not messages:
+            return []
+        if settings.USE_CELERY:
+            size = settings.MAIL_SEND_BATCH_SIZE
+            results = []
+            for start in range(0, len(messages), size):
+                stop = min(start + size, len(messages))
+                links = [link(start, stop)] if link else []
+                # Callbacks are linked to the task sending the last mails
+                if stop == len(messages):
+                    links.extend(callbacks)
+                results.append(tasks.send_emails.apply_async(
+                    kwargs={'messages': messages[start:stop]},
+                    link=links or None,
+                ))
+            return results
+        results = tasks.send_emails(messages)
+        if link:
+            link(0, len(messages))(results)
+        return results
+
+
 # Predefined Emails
 
 TEST = Mail('test', subject='A test email to ${name}', categories=['test'])
@@ -35,12 +35,13 @@ class QueuedMail(StoredObject):
             self._id, self.email_type, self.to_addr, self.send_at
         )
 
-    def send_mail(self):
+    def send_mail(self, mailer=None):
         """
         Grabs the data from this email, checks for user subscription to help mails,
 
         constructs the mail object and checks presend. Then attempts to send the email
         through send_mail()
+        :param mailer: The mailer passed to send_mail, e.g. a `MailBatch`
         :return: boolean based on whether email was sent.
         """
         mail_struct = queue_mail_types[self.email_type]
@@ -52,7 +53,7 @@ class QueuedMail(StoredObject):
         )
         self.data['osf_url'] = settings.DOMAIN
         if presend and self.user.is_active and self.user.osf_mailing_lists.get(settings.OSF_HELP_LIST):
-            send_mail(self.to_addr or self.user.username, mail, mimetype='html', **(self.data or {}))
+            send_mail(self.to_addr or self.user.username, mail, mimetype='html', mailer=mailer, **(self.data or {}))
             self.sent_at = datetime.utcnow()
             self.save()
             return True
@@ -1,4 +1,5 @@
 from babel import dates, core, Locale
+from modularodm import Q
 
 from website import mails
 from website import models as website_models
@@ -97,47 +98,86 @@ def store_emails(recipient_ids, notification_type, event, user, node, timestamp,
         digest.save()
 
 
-def compile_subscriptions(node, event_type, event=None, level=0):
-    """Recurse through node and parents for subscriptions.
+def compile_subscriptions(node, event_type, event=None):
+    """Compile the subscriptions of `node` and its ancestors.
+
+    The subscriptions of the whole lineage are loaded with a single query. A
+    user's notification type comes from the subscription closest to `node`
+    that lists them, a file specific `event` subscription taking precedence
+    over the node's own. Subscriptions on nodes the user cannot read are
+    ignored, as are users who cannot read `node`.
 
     :param node: current node
     :param event_type: Generally node_subscriptions_available
     :param event: Particular event such a file_updated that has specific file subs
-    :param level: How deep the recursion is
     :return: a dict of notification types with lists of users.
     """
-    subscriptions = check_node(node, event_type)
+    lineage = get_lineage_nodes(node)
+    levels = [(lineage_node, utils.to_subscription_key(lineage_node._id, event_type)) for lineage_node in lineage]
     if event:
-        subscriptions = check_node(node, event)  # Gets particular event subscriptions
-        parent_subscriptions = compile_subscriptions(node, event_type, level=level + 1)  # get node and parent subs
-    elif node.parent_id:
-        parent_subscriptions = \
-            compile_subscriptions(website_models.Node.load(node.parent_id), event_type, level=level + 1)
-    else:
-        parent_subscriptions = check_node(None, event_type)
-    for notification_type in parent_subscriptions:
-        p_sub_n = parent_subscriptions[notification_type]
-        p_sub_n.extend(subscriptions[notification_type])
-        for nt in subscriptions:
-            if notification_type != nt:
-                p_sub_n = list(set(p_sub_n).difference(set(subscriptions[nt])))
-        if level == 0:
-            p_sub_n, removed = utils.separate_users(node, p_sub_n)
-        parent_subscriptions[notification_type] = p_sub_n
-    return parent_subscriptions
-
-
-def check_node(node, event):
-    """Return subscription for a particular node and event."""
-    node_subscriptions = {key: [] for key in constants.NOTIFICATION_TYPES}
-    if node:
-        subscription = NotificationSubscription.load(utils.to_subscription_key(node._id, event))
-        for notification_type in node_subscriptions:
-            users = getattr(subscription, notification_type, [])
-            for user in users:
-                if node.has_permission(user, 'read'):
-                    node_subscriptions[notification_type].append(user._id)
-    return node_subscriptions
+        levels.append((node, utils.to_subscription_key(node._id, event)))
+    subscriptions = {
+        subscription._id: subscription
+        for subscription in NotificationSubscription.find(Q('_id', 'in', [key for _, key in levels]))
+    }
+    readers = LineageReaders(lineage)
+
+    # Walk from the top down so that closer subscriptions override farther ones
+    notification_types = {}
+    for level_node, key in levels:
+        subscription = subscriptions.get(key)
+        if subscription is None:
+            continue
+        for notification_type in constants.NOTIFICATION_TYPES:
+            for user_id in getattr(subscription, notification_type)._to_primary_keys():
+                if readers.can_read(level_node, user_id):
+                    notification_types[user_id] = notification_type
+
+    compiled = {key: set() for key in constants.NOTIFICATION_TYPES}
+    for user_id, notification_type in notification_types.items():
+        compiled[notification_type].add(user_id)
+    return {
+        notification_type: sorted(user_ids & readers.readers(node))
+        for notification_type, user_ids in compiled.items()
+    }
+
+
+class LineageReaders(object):
+    """Read permissions on the nodes of a lineage, computed from the nodes'
+    `permissions` without further queries. Like `Node.has_permission`, a user
+    can read a node they have read permission on or that has an ancestor they
+    are an admin of.
+    """
+
+    def __init__(self, lineage):
+        self._readers = {}
+        admins_above = set()
+        for lineage_node in lineage:
+            self._readers[lineage_node._id] = admins_above | set(
+                user_id for user_id, permissions in lineage_node.permissions.items() if 'read' in permissions
+            )
+            admins_above = admins_above | set(
+                user_id for user_id, permissions in lineage_node.permissions.items() if 'admin' in permissions
+            )
+
+    def readers(self, node):
+        return self._readers[node._id]
+
+    def can_read(self, node, user_id):
+        return user_id in self._readers[node._id]
+
+
+def get_lineage_nodes(node):
+    """Return `node` and its ancestors, top most project first."""
+    if not node._has_ancestor_index:
+        return list(reversed(node.parents)) + [node]
+    if not node.ancestor_ids:
+        return [node]
+    ancestors = {
+        ancestor._id: ancestor
+        for ancestor in website_models.Node.find(Q('_id', 'in', list(node.ancestor_ids)))
+    }
+    return [ancestors[ancestor_id] for ancestor_id in node.ancestor_ids if ancestor_id in ancestors] + [node]
 
 
 def get_user_subscriptions(user, event):
@@ -149,6 +189,9 @@ def get_node_lineage(node):
     """ Get a list of node ids in order from the node to top most project
         e.g. [parent._id, node._id]
     """
+    if node._has_ancestor_index:
+        return list(node.ancestor_ids or []) + [node._id]
+
     lineage = [node._id]
 
     while node.parent_id:
@@ -7,18 +7,10 @@ from website.notifications import utils, constants
 def get_file_subs_from_folder(addon, user, kind, path, name):
     """Find the file tree under a specified folder."""
     folder = dict(kind=kind, path=path, name=name)
-    file_tree = addon._get_file_tree(filenode=folder, user=user, version='latest-published')
-    return list_of_files(file_tree)
-
-
-def list_of_files(file_object):
-    files = []
-    if file_object['kind'] == 'file':
-        return [file_object['path']]
-    else:
-        for child in file_object['children']:
-            files.extend(list_of_files(child))
-    return files
+    return [
+        each['path']
+        for each in addon._iter_files(filenode=folder, user=user, version='latest-published')
+    ]
 
 
 def compile_user_lists(files, user, source_node, node):
@@ -60,6 +60,14 @@ class NotificationSubscription(StoredObject):
 
 
 class NotificationDigest(StoredObject):
+    __indices__ = [{
+        'key_or_list': [
+            ('send_type', 1),
+            ('user_id', 1),
+            ('_id', 1)
+        ]
+    }]
+
     _id = fields.StringField(primary=True, default=lambda: str(ObjectId()))
     user_id = fields.StringField(index=True)
     timestamp = fields.DateTimeField()
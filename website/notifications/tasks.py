@@ -1,7 +1,11 @@
 """
 Tasks for making even transactional emails consolidated.
 """
-from bson.code import Code
+import itertools
+import logging
+import operator
+import time
+
 from modularodm import Q
 
 from framework.celery_tasks import app as celery_app
@@ -9,40 +13,115 @@ from framework.mongo import database as db
 from framework.auth.core import User
 from framework.sentry import log_exception
 
-from framework.transactions.context import TokuTransaction
-
 from website.notifications.utils import NotificationsDict
 from website.notifications.model import NotificationDigest
-from website import mails
+from website import mails, settings
+
+logger = logging.getLogger(__name__)
 
 
 @celery_app.task(name='website.notifications.tasks.send_users_email', max_retries=0)
 def send_users_email(send_type):
     """Find pending Emails and amalgamates them into a single Email.
 
+    Users are handled in chunks of `NOTIFICATION_DIGEST_CHUNK_SIZE`; the digests
+    of a user are removed once their email is sent, by `remove_sent_notifications`,
+    so a run that stops halfway or fails to send some emails is resumed by the
+    next one from the users that were not sent their email.
+
     :param send_type
-    :return:
+    :return: dict of the number of users emailed and users per second
+    """
+    start = time.time()
+    users = 0
+    for chunk in iter_users_emails(send_type):
+        batch = mails.MailBatch()
+        # Ids of the digests of each mail in the batch
+        mail_notification_ids = []
+        # Ids of the digests of users with nothing to send, e.g. when emails are disabled
+        unsent_ids = []
+        for group in chunk:
+            user = User.load(group['user_id'])
+            if not user:
+                log_exception()
+                continue
+            info = group['info']
+            notification_ids = [message['_id'] for message in info]
+            sorted_messages = group_by_node(info)
+            queued = len(batch.messages)
+            if sorted_messages:
+                mails.send_mail(
+                    to_addr=user.username,
+                    mimetype='html',
+                    mail=mails.DIGEST,
+                    name=user.fullname,
+                    message=sorted_messages,
+                    mailer=batch,
+                )
+            if len(batch.messages) > queued:
+                mail_notification_ids.append(notification_ids)
+            else:
+                unsent_ids.extend(notification_ids)
+            users += 1
+        batch.send(link=lambda start, stop: remove_sent_notifications.s(mail_notification_ids[start:stop]))
+        remove_notifications(email_notification_ids=unsent_ids)
+    elapsed = time.time() - start
+    users_per_second = round(users / elapsed, 2) if elapsed else None
+    if users:
+        logger.info('Sent {} {} emails in {:.2f}s ({} users/s)'.format(users, send_type, elapsed, users_per_second))
+    return {'users': users, 'users_per_second': users_per_second}
+
+
+@celery_app.task(name='website.notifications.tasks.remove_sent_notifications', max_retries=0)
+def remove_sent_notifications(sent, mail_notification_ids):
+    """Remove the digests of the emails that were sent.
+
+    :param list sent: Whether each email was sent, as returned by `send_emails`;
+        None when emails are disabled
+    :param list mail_notification_ids: Ids of the digests of each email
+    """
+    remove_notifications(email_notification_ids=[
+        notification_id
+        for was_sent, notification_ids in zip(sent, mail_notification_ids)
+        if was_sent is not False
+        for notification_id in notification_ids
+    ])
+
+
+def iter_users_emails(send_type, chunk_size=None):
+    """Yield the emails that need to be sent in lists of up to `chunk_size`
+    users, reading the digests in order of user from an index so that only one
+    chunk is held in memory at a time.
+
+    :param send_type: from NOTIFICATION_TYPES
+    :param int chunk_size: Users per chunk, `NOTIFICATION_DIGEST_CHUNK_SIZE` by default
+    :return: iterator of lists of groups as returned by `get_users_emails`
     """
-    grouped_emails = get_users_emails(send_type)
-    if not grouped_emails:
-        return
-    for group in grouped_emails:
-        user = User.load(group['user_id'])
-        if not user:
-            log_exception()
-            continue
-        info = group['info']
-        notification_ids = [message['_id'] for message in info]
-        sorted_messages = group_by_node(info)
-        if sorted_messages:
-            mails.send_mail(
-                to_addr=user.username,
-                mimetype='html',
-                mail=mails.DIGEST,
-                name=user.fullname,
-                message=sorted_messages,
-                callback=remove_notifications(email_notification_ids=notification_ids)
-            )
+    chunk_size = chunk_size or settings.NOTIFICATION_DIGEST_CHUNK_SIZE
+    digests = db['notificationdigest'].find(
+        {'send_type': send_type},
+        fields=['user_id', 'message', 'node_lineage'],
+        sort=[('user_id', 1), ('_id', 1)],
+    ).batch_size(settings.NOTIFICATION_DIGEST_BATCH_SIZE)
+
+    chunk = []
+    for user_id, user_digests in itertools.groupby(digests, key=operator.itemgetter('user_id')):
+        chunk.append({
+            'user_id': user_id,
+            'info': [
+                {
+                    'message': digest.get('message'),
+                    'node_lineage': digest.get('node_lineage'),
+                    '_id': digest['_id'],
+                }
+                for digest in user_digests
+            ]
+        })
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
 def get_users_emails(send_type):
@@ -65,26 +144,7 @@ def get_users_emails(send_type):
                 'user_id': ...
               }]
     """
-    with TokuTransaction():
-        emails = db['notificationdigest'].group(
-            key={'user_id': 1},
-            condition={
-                'send_type': send_type
-            },
-            initial={'info': []},
-            reduce=Code(
-                """
-                function(curr, result) {
-                    result.info.push({
-                        'message': curr.message,
-                        'node_lineage': curr.node_lineage,
-                        '_id': curr._id
-                    });
-                };
-                """
-            )
-        )
-    return emails
+    return list(itertools.chain.from_iterable(iter_users_emails(send_type)))
 
 
 def group_by_node(notifications):
@@ -105,5 +165,5 @@ def remove_notifications(email_notification_ids=None):
     :param email_notification_ids:
     :return:
     """
-    for email_id in email_notification_ids:
-        NotificationDigest.remove(Q('_id', 'eq', email_id))
+    if email_notification_ids:
+        NotificationDigest.remove(Q('_id', 'in', list(email_notification_ids)))
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Whether `Node.ancestor_ids` has been populated for every node.
+
+`Node.save` keeps the lineage of the nodes it saves up to date, but nodes
+created before `ancestor_ids` existed only get theirs from
+`scripts/populate_node_ancestors.py`. Until then a query on `ancestor_ids` can
+miss descendants, so subtree lookups walk the tree instead. The script records
+here that it has run; the marker never goes away, so a process only has to see
+it once.
+"""
+from framework.mongo import database
+
+MARKER_ID = 'node_ancestor_ids'
+
+_populated = False
+
+
+def _collection():
+    return database['migrationmarkers']
+
+
+def mark_populated():
+    _collection().update({'_id': MARKER_ID}, {'$set': {'done': True}}, upsert=True)
+
+
+def is_populated():
+    global _populated
+    if not _populated:
+        _populated = _collection().find_one({'_id': MARKER_ID}) is not None
+    return _populated
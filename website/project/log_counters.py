@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Per-node counters of logs.
+
+Counting the logs of a node, or finding its latest one, used to load every log
+of the node. Each node instead has a document in `nodelogcounters` holding the
+number of its logs and the date of the latest one, updated with `$inc` and a
+conditional `$set` whenever a log is added to the node (TokuMX 2.0, built on
+MongoDB 2.4, has no `$max`). Counters are kept out of the node document so
+that saving a stale `Node` can not overwrite them.
+
+A node without a counter (created before counters existed, see
+`scripts/populate_node_log_counters.py`) has it computed from its logs the
+first time it is needed.
+"""
+from pymongo.errors import DuplicateKeyError
+
+from framework.mongo import database
+
+
+def _collection():
+    return database['nodelogcounters']
+
+
+def record_log(node_id, date):
+    """Count a log of `date` just saved for node `node_id`.
+
+    :return: The date of the latest log of the node
+    """
+    counter = _collection().find_and_modify({'_id': node_id}, {'$inc': {'count': 1}})
+    if counter is None:
+        # Counts the log just saved
+        counter = initialize(node_id)
+    elif date:
+        set_max(node_id, 'last_logged', date)
+    last_logged = counter.get('last_logged')
+    # Stored dates are truncated to milliseconds; prefer the exact date of the
+    # new log when it is the latest
+    if date and (last_logged is None or last_logged <= date):
+        return date
+    return last_logged
+
+
+def get_counters(node_ids):
+    """Counters of the nodes of `node_ids`, by node id, each a dict of the
+    `count` of logs and the date they were `last_logged`.
+    """
+    node_ids = list(node_ids)
+    counters = {
+        counter['_id']: counter
+        for counter in _collection().find({'_id': {'$in': node_ids}})
+    }
+    for node_id in node_ids:
+        if node_id not in counters:
+            counters[node_id] = initialize(node_id)
+    return counters
+
+
+def get_log_count(node_id):
+    return get_counters([node_id])[node_id]['count']
+
+
+def get_last_logged(node_id):
+    return get_counters([node_id])[node_id].get('last_logged')
+
+
+def count_logs(node_id):
+    """Count the logs of `node_id` and find the date of the latest one."""
+    logs = database['nodelog']
+    count = logs.find({'node': node_id}).count()
+    latest = next(logs.find({'node': node_id}, {'date': True}).sort('date', -1).limit(1), {})
+    return {'_id': node_id, 'count': count, 'last_logged': latest.get('date')}
+
+
+def set_max(node_id, field, value):
+    """Raise `field` of the counter of `node_id` to `value` unless it is higher
+    already, like `$max` does on MongoDB 2.6.
+    """
+    _collection().update(
+        {'_id': node_id, '$or': [{field: {'$lt': value}}, {field: None}]},
+        {'$set': {field: value}},
+    )
+
+
+def initialize(node_id):
+    """Create the counter of `node_id` from its logs. A counter created
+    concurrently keeps the highest values.
+    """
+    counter = count_logs(node_id)
+    try:
+        _collection().insert(dict(counter))
+    except DuplicateKeyError:
+        set_max(node_id, 'count', counter['count'])
+        if counter['last_logged']:
+            set_max(node_id, 'last_logged', counter['last_logged'])
+    return counter
+
+
+def reset(node_id, count, last_logged):
+    _collection().update(
+        {'_id': node_id},
+        {'$set': {'count': count, 'last_logged': last_logged}},
+        upsert=True,
+    )
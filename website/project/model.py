@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import itertools
-import functools
 import os
 import re
 import logging
@@ -62,6 +61,9 @@ from website.project.licenses import (NodeLicense, NodeLicenseRecord)
 from website.project.taxonomies import Subject
 from website.project import signals as project_signals
 from website.project import tasks as node_tasks
+from website.project import ancestor_index
+from website.project import log_counters
+from website.project import permission_resolver
 from website.project.spam.model import SpamMixin
 from website.project.sanctions import (
     DraftRegistrationApproval,
@@ -209,6 +211,17 @@ def get_valid_mentioned_users_guids(comment, contributors):
 class Comment(GuidStoredObject, SpamMixin, Commentable):
 
     __guid_min_length__ = 12
+    __indices__ = [{
+        'key_or_list': [
+            ('node', 1),
+            ('date_created', -1)
+        ]
+    }, {
+        'key_or_list': [
+            ('root_target', 1),
+            ('date_created', -1)
+        ]
+    }]
 
     OVERVIEW = 'node'
     FILES = 'files'
@@ -298,6 +311,13 @@ class Comment(GuidStoredObject, SpamMixin, Commentable):
             return 'wiki'
         return self.node.project_or_component
 
+    @classmethod
+    def hide_for_deleted_target(cls, root_target_id):
+        """Unset the root target of the comments on a file or wiki page that is
+        being deleted, so that comment lists no longer include them.
+        """
+        cls.update(Q('root_target', 'eq', root_target_id), data={'root_target': None})
+
     @classmethod
     def find_n_unread(cls, user, node, page, root_id=None):
         if node.is_contributor(user):
@@ -449,6 +469,11 @@ class NodeLog(StoredObject):
             ('should_hide', 1),
             ('date', -1)
         ]
+    }, {
+        'key_or_list': [
+            ('node', 1),
+            ('date', -1)
+        ]
     }]
 
     date = fields.DateTimeField(default=datetime.datetime.utcnow, index=True)
@@ -583,6 +608,7 @@ class NodeLog(StoredObject):
         log_clone.original_node = original_log.original_node
         log_clone.user = original_log.user
         log_clone.save()
+        log_counters.record_log(node._id, log_clone.date and log_clone.date.replace(tzinfo=None))
         return log_clone
 
     @property
@@ -946,6 +972,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
     registered_from = fields.ForeignField('node', index=True)
     root = fields.ForeignField('node', index=True)
     parent_node = fields.ForeignField('node', index=True)
+    # Materialized lineage: ids of every primary ancestor, root first, parent last.
+    # Kept up to date by `save`; populated for existing nodes by scripts/populate_node_ancestors.py
+    ancestor_ids = fields.StringField(list=True, index=True)
 
     # The node (if any) used as a template for this node's creation
     template_node = fields.ForeignField('node', index=True)
@@ -1013,6 +1042,16 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
         """ List of logs associated with this node"""
         return NodeLog.find(Q('node', 'eq', self._id)).sort('date')
 
+    @property
+    def log_count(self):
+        """Number of logs of this node, read from its log counter"""
+        return log_counters.get_log_count(self._id)
+
+    @property
+    def last_logged(self):
+        """Date of the latest log of this node, read from its log counter"""
+        return log_counters.get_last_logged(self._id)
+
     @property
     def license(self):
         node_license = self.node_license
@@ -1138,7 +1177,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
 
     @property
     def private_link_keys_active(self):
-        return [x.key for x in self.private_links if not x.is_deleted]
+        return permission_resolver.get_resolver().private_link_keys_active(self)
 
     @property
     def private_link_keys_deleted(self):
@@ -1229,9 +1268,19 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
     def is_admin_parent(self, user):
         if self.has_permission(user, 'admin', check_parent=False):
             return True
-        if self.parent_node:
+        if user is None:
+            return False
+        return permission_resolver.get_resolver().has_admin_ancestor(self, user)
+
+    def _has_admin_ancestor(self, user):
+        if not self._has_ancestor_index:
             return self.parent_node.is_admin_parent(user)
-        return False
+        if not self.ancestor_ids:
+            return False
+        return Node.find(
+            Q('_id', 'in', self.ancestor_ids) &
+            Q('permissions.{0}'.format(user._id), 'in', [ADMIN])
+        ).count() > 0
 
     def can_view(self, auth):
         if auth and getattr(auth.private_link, 'anonymous', False):
@@ -1283,6 +1332,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
             if permission in self.permissions[user._id]:
                 raise ValueError('User already has permission {0}'.format(permission))
             self.permissions[user._id].append(permission)
+        permission_resolver.invalidate()
         if save:
             self.save()
 
@@ -1298,6 +1348,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
             self.permissions[user._id].remove(permission)
         except (KeyError, ValueError):
             raise ValueError('User does not have permission {0}'.format(permission))
+        permission_resolver.invalidate()
         if save:
             self.save()
 
@@ -1316,6 +1367,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
                     user._id, self._id,
                 )
             )
+        permission_resolver.invalidate()
         if save:
             self.save()
 
@@ -1329,6 +1381,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
             if ADMIN not in reduced_permissions:
                 raise NodeStateError('Must have at least one registered admin contributor')
         self.permissions[user._id] = permissions
+        permission_resolver.invalidate()
         if save:
             self.save()
 
@@ -1354,6 +1407,13 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
         if self.has_permission(user, permission):
             return True
 
+        if user is not None and self._has_descendant_index:
+            # Without a permission on this node or an admin parent, any match must be explicit
+            return any(
+                permission in node.permissions.get(user._id, [])
+                for node in self.get_primary_descendants()
+            )
+
         for node in self.nodes:
             if not node.primary or node.is_deleted:
                 continue
@@ -1377,19 +1437,31 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
         """ Returns a generator of first descendant node(s) readable by <user>
         in each descendant branch.
         """
-        new_branches = []
-        for node in self.nodes:
-            if not node.primary or node.is_deleted:
-                continue
+        if self._has_descendant_index:
+            descendants = self.get_primary_descendants()
+            children = self._get_primary_children_map(descendants)
+            permission_resolver.get_resolver().resolve_subtree(self, auth.user if auth else None, descendants)
+        else:
+            children = None
 
-            if node.can_view(auth):
-                yield node
+        def _find(parent):
+            if children is not None:
+                nodes = children.get(parent._id, [])
             else:
-                new_branches.append(node)
+                nodes = [node for node in parent.nodes if node.primary and not node.is_deleted]
 
-        for bnode in new_branches:
-            for node in bnode.find_readable_descendants(auth):
-                yield node
+            new_branches = []
+            for node in nodes:
+                if node.can_view(auth):
+                    yield node
+                else:
+                    new_branches.append(node)
+
+            for bnode in new_branches:
+                for node in _find(bnode):
+                    yield node
+
+        return _find(self)
 
     def has_addon_on_children(self, addon):
         """Checks if a given node has a specific addon on child nodes
@@ -1398,6 +1470,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
         if self.has_addon(addon):
             return True
 
+        if self._has_descendant_index:
+            return any(node.has_addon(addon) for node in self.get_primary_descendants())
+
         for node in self.nodes:
             if not node.primary or node.is_deleted:
                 continue
@@ -1430,12 +1505,19 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
 
     @property
     def parents(self):
-        if self.parent_node:
+        """Ancestors of this node, nearest first."""
+        if not self._has_ancestor_index:
             return [self.parent_node] + self.parent_node.parents
-        return []
+        if not self.ancestor_ids:
+            return []
+        by_id = {node._id: node for node in Node.find(Q('_id', 'in', self.ancestor_ids))}
+        return [by_id[_id] for _id in reversed(self.ancestor_ids) if _id in by_id]
 
     @property
-    def admin_contributor_ids(self, contributors=None):
+    def admin_contributor_ids(self):
+        """Ids of the admins of ancestors who are not contributors of this
+        node. Ancestors are loaded with one query from `ancestor_ids`.
+        """
         contributor_ids = self.contributors._to_primary_keys()
         admin_ids = set()
         for parent in self.parents:
@@ -1453,6 +1535,76 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
             key=lambda user: user.family_name,
         )
 
+    @property
+    def _has_ancestor_index(self):
+        # Nodes that have not been saved or backfilled since `ancestor_ids` was
+        # introduced still have an empty lineage despite having a parent
+        return bool(self.ancestor_ids) or not self.parent_node
+
+    @property
+    def _has_descendant_index(self):
+        # A node's own lineage says nothing about its descendants: until every
+        # node has been backfilled, `get_primary_descendants` can miss some
+        return ancestor_index.is_populated()
+
+    def _compute_ancestor_ids(self):
+        parent = self._parent_node
+        if parent is None:
+            return []
+        if parent._has_ancestor_index:
+            return list(parent.ancestor_ids or []) + [parent._id]
+        return [node._id for node in reversed(parent.parents)] + [parent._id]
+
+    def get_primary_descendants(self):
+        """Return every primary descendant of this node with a single query,
+        shallowest first, leaving out deleted nodes and everything below them.
+        """
+        descendants = sorted(
+            Node.find(Q('ancestor_ids', 'eq', self._id)),
+            key=lambda node: (len(node.ancestor_ids), node.date_created)
+        )
+        deleted = {node._id for node in descendants if node.is_deleted}
+        return [
+            node for node in descendants
+            if node._id not in deleted and
+            deleted.isdisjoint(node.ancestor_ids[node.ancestor_ids.index(self._id) + 1:])
+        ]
+
+    def _get_primary_children_map(self, descendants=None):
+        children = {}
+        for node in (descendants if descendants is not None else self.get_primary_descendants()):
+            children.setdefault(node.ancestor_ids[-1], []).append(node)
+        return children
+
+    def update_descendant_ancestors(self):
+        """Rewrite the lineage of every primary descendant after this node's
+        own lineage or children changed. Descendants are read with one query
+        and only those whose lineage differs are written.
+        """
+        if self.is_deleted:
+            return
+        child_ids = [node._id for node in self.nodes_primary if not node.is_deleted]
+        if not child_ids:
+            return
+        lineage = list(self.ancestor_ids or []) + [self._id]
+        descendants = Node.find(
+            Q('_id', 'in', child_ids) |
+            Q('ancestor_ids', 'in', child_ids)
+        )
+        for node in descendants:
+            old = list(node.ancestor_ids or [])
+            if node._id in child_ids:
+                new = lineage
+            else:
+                index = next(i for i, _id in enumerate(old) if _id in child_ids)
+                new = lineage + old[index:]
+            if new != old or (node._id in child_ids and node.parent_node != self):
+                node.ancestor_ids = new
+                node.parent_node = new[-1]
+                # Skip Node.save: nothing but the lineage changed, and each
+                # descendant is already handled by this single pass
+                super(Node, node).save()
+
     def get_visible(self, user):
         if not self.is_contributor(user):
             raise ValueError(u'User {0} not in contributors'.format(user))
@@ -1755,8 +1907,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
         else:
             suppress_log = False
 
-        self.root = self._root._id
         self.parent_node = self._parent_node
+        self.ancestor_ids = self._compute_ancestor_ids()
+        self.root = self.ancestor_ids[0] if self.ancestor_ids else self._id
 
         # If you're saving a property, do it above this super call
         saved_fields = super(Node, self).save(*args, **kwargs)
@@ -1790,6 +1943,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
 
             project_signals.project_created.send(self)
 
+        if 'nodes' in saved_fields or 'ancestor_ids' in saved_fields:
+            self.update_descendant_ancestors()
+
         if saved_fields:
             self.on_update(first_save, saved_fields)
 
@@ -2019,6 +2175,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
 
     @property
     def depth(self):
+        if self._has_ancestor_index:
+            return len(self.ancestor_ids or [])
         return len(self.parents)
 
     def next_descendants(self, auth, condition=lambda auth, node: True):
@@ -2038,6 +2196,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
         return ret
 
     def get_descendants_recursive(self, include=lambda n: True):
+        if self._has_descendant_index:
+            # Load the whole subtree at once so that the walk below is served from the cache
+            self.get_primary_descendants()
         for node in self.nodes:
             if include(node):
                 yield node
@@ -2047,6 +2208,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
                         yield descendant
 
     def get_aggregate_logs_query(self, auth):
+        if self._has_descendant_index:
+            permission_resolver.get_resolver().resolve_subtree(self, auth.user if auth else None)
         ids = [self._id] + [n._id
                             for n in self.get_descendants_recursive()
                             if n.can_view(auth)]
@@ -2257,8 +2420,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
     def bulk_update_search(cls, nodes, index=None):
         from website import search
         try:
-            serialize = functools.partial(search.search.update_node, index=index, bulk=True, async=False)
-            search.search.bulk_update_nodes(serialize, nodes, index=index)
+            search.search.bulk_update_search(nodes, index=index)
         except search.exceptions.SearchUnavailableError as e:
             logger.exception(e)
             log_exception()
@@ -2667,10 +2829,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
             log.date = log_date
         log.save()
 
-        if len(self.logs) == 1:
-            self.date_modified = log.date.replace(tzinfo=None)
-        else:
-            self.date_modified = self.logs[-1].date.replace(tzinfo=None)
+        self.date_modified = log_counters.record_log(self._id, log.date.replace(tzinfo=None))
 
         if save:
             self.save()
@@ -3608,6 +3767,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
         :param content: A string, the posted content.
         :param auth: All the auth information including user, API key.
         """
+        from website.addons.wiki import render_cache
         from website.addons.wiki.model import NodeWikiPage
 
         name = (name or '').strip()
@@ -3624,6 +3784,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
             current = NodeWikiPage.load(self.wiki_pages_current[key])
             version = current.version + 1
             current.save()
+            render_cache.invalidate(current)
             if Comment.find(Q('root_target', 'eq', current._id)).count() > 0:
                 has_comments = True
 
@@ -3678,6 +3839,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
 
         """
         # TODO: Fix circular imports
+        from website.addons.wiki import render_cache
         from website.addons.wiki.exceptions import (
             PageCannotRenameError,
             PageConflictError,
@@ -3704,6 +3866,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
         # rename the page first in case we hit a validation exception.
         old_name = page.page_name
         page.rename(new_name)
+        render_cache.invalidate(page)
 
         # TODO: merge historical records like update (prevents log breaks)
         # transfer the old page versions/current keys to the new name.
@@ -3732,14 +3895,19 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin, Commentable, Spam
         self.save()
 
     def delete_node_wiki(self, name, auth):
+        from website.addons.wiki import render_cache
+
         name = (name or '').strip()
         key = to_mongo_key(name)
         page = self.get_wiki_page(key)
+        render_cache.invalidate(page)
 
         del self.wiki_pages_current[key]
         if key != 'home':
             del self.wiki_pages_versions[key]
 
+        Comment.hide_for_deleted_target(page._id)
+
         self.add_log(
             action=NodeLog.WIKI_DELETED,
             params={
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Request-scoped memoization of node permission checks.
+
+`Node.is_admin_parent` and `Node.private_link_keys_active` are evaluated many
+times per request for the same nodes (`can_view`, `has_permission`, log and
+notification queries, serializer permission fields). A `PermissionResolver`
+is attached to the current Flask or Django request (see
+`framework.mongo.get_cache_key`) and remembers those results until the request
+ends or a permission changes. Outside of a request nothing is cached.
+"""
+import weakref
+
+from modularodm import signals
+
+from framework.mongo import get_cache_key, dummy_request
+
+_resolvers = weakref.WeakKeyDictionary()
+
+
+class PermissionResolver(object):
+
+    def __init__(self):
+        self._admin_ancestor = {}
+        self._private_link_keys = {}
+
+    def has_admin_ancestor(self, node, user):
+        """Whether `user` is an admin on any ancestor of `node`."""
+        key = (node._id, user._id)
+        if key not in self._admin_ancestor:
+            self._admin_ancestor[key] = node._has_admin_ancestor(user)
+        return self._admin_ancestor[key]
+
+    def private_link_keys_active(self, node):
+        if node._id not in self._private_link_keys:
+            self._private_link_keys[node._id] = [x.key for x in node.private_links if not x.is_deleted]
+        return self._private_link_keys[node._id]
+
+    def resolve_subtree(self, node, user, descendants=None):
+        """Compute admin inheritance for `user` on `node` and all of its
+        primary descendants at once, from a single query for the subtree.
+
+        :param list descendants: result of `node.get_primary_descendants()`, if
+            the caller already has it
+        """
+        if user is None:
+            return
+        admin_above = {node._id: self.has_admin_ancestor(node, user) or node.has_permission(user, 'admin', check_parent=False)}
+        if descendants is None:
+            descendants = node.get_primary_descendants()
+        for descendant in descendants:
+            parent_id = descendant.ancestor_ids[-1]
+            if parent_id not in admin_above:
+                continue
+            self._admin_ancestor[(descendant._id, user._id)] = admin_above[parent_id]
+            admin_above[descendant._id] = admin_above[parent_id] or 'admin' in descendant.permissions.get(user._id, [])
+
+    def clear(self):
+        self._admin_ancestor.clear()
+        self._private_link_keys.clear()
+
+
+class _NullResolver(PermissionResolver):
+    """Resolver used outside of requests; it never remembers anything."""
+
+    def has_admin_ancestor(self, node, user):
+        return node._has_admin_ancestor(user)
+
+    def private_link_keys_active(self, node):
+        return [x.key for x in node.private_links if not x.is_deleted]
+
+    def resolve_subtree(self, node, user, descendants=None):
+        pass
+
+
+def get_resolver():
+    """Return the permission resolver of the current request."""
+    request = get_cache_key()
+    if request is dummy_request:
+        return _NullResolver()
+    try:
+        return _resolvers[request]
+    except KeyError:
+        resolver = _resolvers[request] = PermissionResolver()
+        return resolver
+    except TypeError:  # request object cannot be weakly referenced
+        return _NullResolver()
+
+
+def invalidate():
+    """Forget every permission computed during the current request."""
+    try:
+        resolver = _resolvers.get(get_cache_key())
+    except TypeError:
+        return
+    if resolver is not None:
+        resolver.clear()
+
+
+@signals.save.connect
+def invalidate_on_save(sender, instance, fields_changed, cached_data):
+    # Permissions, the tree a node sits in and private links all feed the cache
+    name = getattr(instance, '_name', None)
+    if name == 'privatelink' or (name == 'node' and fields_changed and {'permissions', 'nodes', 'ancestor_ids'} & set(fields_changed)):
+        invalidate()
@@ -6,9 +6,8 @@ import markdown
 import pytz
 from flask import request
 
-from api.caching.tasks import ban_url
+from api.caching.tasks import enqueue_ban
 from framework.guid.model import Guid
-from framework.postcommit_tasks.handlers import enqueue_postcommit_task
 from modularodm import Q
 from website import settings
 from website.addons.base.signals import file_updated
@@ -175,11 +174,11 @@ def is_reply(target):
 
 def _update_comments_timestamp(auth, node, page=Comment.OVERVIEW, root_id=None):
     if node.is_contributor(auth.user):
-        enqueue_postcommit_task(ban_url, (node, ), {}, celery=False, once_per_request=True)
+        enqueue_ban(node)
         if root_id is not None:
             guid_obj = Guid.load(root_id)
             if guid_obj is not None:
-                enqueue_postcommit_task(ban_url, (guid_obj.referent, ), {}, celery=False, once_per_request=True)
+                enqueue_ban(guid_obj.referent)
 
         # update node timestamp
         if page == Comment.OVERVIEW:
@@ -23,4 +23,8 @@ def grid_data(auth, node, **kwargs):
     """View that returns the formatted data for rubeus.js/hgrid
     """
     data = request.args.to_dict()
-    return {'data': rubeus.to_hgrid(node, auth, **data)}
+    collector = rubeus.NodeFileCollector(node, auth, **data)
+    return {
+        'data': collector.to_hgrid(),
+        'meta': {'addonLatency': collector.addon_latency},
+    }
@@ -10,6 +10,7 @@ from geoip import geolite2
 from furl import furl
 
 from framework import status
+from framework.status import views as status_views
 from framework import sentry
 from framework.auth import cas
 from framework.routing import Rule
@@ -255,6 +256,11 @@ def make_url_map(app):
         Rule('/robots.txt', 'get', robots, json_renderer),
     ])
 
+    # Worker status
+    process_rules(app, [
+        Rule('/api/v1/status/metrics/', 'get', status_views.status_metrics, json_renderer),
+    ])
+
     if settings.USE_EXTERNAL_EMBER:
         # Routes that serve up the Ember application. Hide behind feature flag.
         rules = []
@@ -19,6 +19,7 @@ from elasticsearch import (
 )
 from modularodm import Q
 import six
+from werkzeug.utils import cached_property
 
 from framework import sentry
 from framework.celery_tasks import app as celery_app
@@ -27,6 +28,7 @@ from framework.mongo.utils import paginated
 from website import settings
 from website.files.models import FileNode
 from website.filters import gravatar
+from website.institutions.model import Institution
 from website.models import User, Node
 from website.project.licenses import serialize_node_license_record
 from website.search import exceptions
@@ -297,8 +299,135 @@ def update_node_async(self, node_id, index=None, bulk=False):
     except Exception as exc:
         self.retry(exc=exc)
 
-def serialize_node(node, category):
-    from website.addons.wiki.model import NodeWikiPage
+class NodeBatch(object):
+    """The objects referenced by the search documents of a batch of nodes.
+
+    Contributors, wiki pages, license records, affiliated institutions and
+    osfstorage files (with their guids) are each loaded on first use with a
+    single `$in` query for the whole batch, instead of one load per node and
+    reference.
+    """
+
+    def __init__(self, nodes, files=None):
+        self.nodes = list(nodes)
+        self._files = files
+
+    @cached_property
+    def users(self):
+        return self._load(User, set(
+            user_id for node in self.nodes for user_id in node.visible_contributor_ids
+        ))
+
+    @cached_property
+    def wiki_pages(self):
+        from website.addons.wiki.model import NodeWikiPage
+        return self._load(NodeWikiPage, set(
+            wiki_id for node in self.nodes for wiki_id in node.wiki_pages_current.values()
+        ))
+
+    @cached_property
+    def license_ids(self):
+        return self._load_license_ids([node._id for node in self.nodes])
+
+    @cached_property
+    def licenses(self):
+        from website.project.licenses import NodeLicenseRecord
+        return self._load(NodeLicenseRecord, set(filter(None, self.license_ids.values())))
+
+    @cached_property
+    def institutions(self):
+        institution_ids = set(
+            inst_id for node in self.nodes for inst_id in node._affiliated_institutions._to_primary_keys()
+        )
+        if not institution_ids:
+            return {}
+        return {
+            node._id: Institution(node)
+            for node in Node.find(Q('_id', 'in', list(institution_ids)), allow_institution=True)
+        }
+
+    @cached_property
+    def files(self):
+        """The osfstorage files of every node in the batch, unless the batch
+        was built for a given list of files.
+        """
+        if self._files is not None:
+            return list(self._files)
+        from website.files.models.osfstorage import OsfStorageFile
+        return list(OsfStorageFile.find(Q('node', 'in', [node._id for node in self.nodes])))
+
+    @cached_property
+    def file_guid_ids(self):
+        from framework.guid.model import Guid
+        file_guid_ids = {}
+        if not self.files:
+            return file_guid_ids
+        found = Guid._storage[0].store.find(
+            {'referent.0': {'$in': [file_._id for file_ in self.files]}},
+            {'referent': True},
+        )
+        for document in found:
+            # Files can have several guids; any of them will do
+            file_guid_ids.setdefault(document['referent'][0], document['_id'])
+        return file_guid_ids
+
+    @staticmethod
+    def _load(model, ids):
+        if not ids:
+            return {}
+        return {obj._id: obj for obj in model.find(Q('_id', 'in', list(ids)))}
+
+    @staticmethod
+    def _load_license_ids(node_ids):
+        """Map each node id to the id of the license record that applies to it,
+        following `parent_node` for nodes without a license of their own. Reads
+        the raw documents so that no parents have to be loaded as nodes.
+        """
+        collection = Node._storage[0].store
+        documents = {}
+        pending = set(node_ids)
+        while pending:
+            found = collection.find({'_id': {'$in': list(pending)}}, {'node_license': True, 'parent_node': True})
+            pending = set()
+            for document in found:
+                documents[document['_id']] = document
+                parent_id = document.get('parent_node')
+                if not document.get('node_license') and parent_id and parent_id not in documents:
+                    pending.add(parent_id)
+
+        def license_id(node_id):
+            seen = set()
+            while node_id in documents and node_id not in seen:
+                seen.add(node_id)
+                if documents[node_id].get('node_license'):
+                    return documents[node_id]['node_license']
+                node_id = documents[node_id].get('parent_node')
+            return None
+
+        return {node_id: license_id(node_id) for node_id in node_ids}
+
+    def visible_contributors(self, node):
+        return [self.users.get(user_id) for user_id in node.visible_contributor_ids]
+
+    def wikis(self, node):
+        return filter(None, [self.wiki_pages.get(wiki_id) for wiki_id in node.wiki_pages_current.values()])
+
+    def license(self, node):
+        return self.licenses.get(self.license_ids.get(node._id))
+
+    def affiliated_institutions(self, node):
+        return filter(None, [self.institutions.get(inst_id) for inst_id in node._affiliated_institutions._to_primary_keys()])
+
+    def file_guid_id(self, file_):
+        return self.file_guid_ids.get(file_._id)
+
+
+def serialize_node(node, category, batch=None):
+    """Build the search document of `node`.
+
+    :param NodeBatch batch: prefetched references of the batch `node` belongs to
+    """
+    batch = batch or NodeBatch([node])
 
     elastic_document = {}
     parent_id = node.parent_id
@@ -315,14 +444,14 @@ def serialize_node(node, category):
                 'fullname': x.fullname,
                 'url': x.profile_url if x.is_active else None
             }
-            for x in node.visible_contributors
+            for x in batch.visible_contributors(node)
             if x is not None
         ],
         'title': node.title,
         'normalized_title': normalized_title,
         'category': category,
         'public': node.is_public,
-        'tags': [tag._id for tag in node.tags if tag],
+        'tags': node.tags._to_primary_keys(),
         'description': node.description,
         'url': node.url,
         'is_registration': node.is_registration,
@@ -335,20 +464,58 @@ def serialize_node(node, category):
         'wikis': {},
         'parent_id': parent_id,
         'date_created': node.date_created,
-        'license': serialize_node_license_record(node.license),
-        'affiliated_institutions': [inst.name for inst in node.affiliated_institutions],
+        'license': serialize_node_license_record(batch.license(node)),
+        'affiliated_institutions': [inst.name for inst in batch.affiliated_institutions(node)],
         'boost': int(not node.is_registration) + 1,  # This is for making registered projects less relevant
         'extra_search_terms': clean_splitters(node.title),
     }
     if not node.is_retracted:
-        for wiki in [
-            NodeWikiPage.load(x)
-            for x in node.wiki_pages_current.values()
-        ]:
+        for wiki in batch.wikis(node):
             elastic_document['wikis'][wiki.page_name] = wiki.raw_text(node)
 
     return elastic_document
 
+def node_is_searchable(node):
+    return not (
+        node.is_deleted or not node.is_public or node.archiving or
+        (node.is_spammy and settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH)
+    )
+
+def node_actions(nodes, index, batch=None):
+    """Yield bulk index actions for the searchable nodes among `nodes`."""
+    searchable = [node for node in nodes if node_is_searchable(node)]
+    if not searchable:
+        return
+    batch = batch or NodeBatch(searchable)
+    for node in searchable:
+        category = get_doctype_from_node(node)
+        yield {
+            '_index': index,
+            '_type': category,
+            '_id': node._id,
+            '_source': serialize_node(node, category, batch=batch),
+        }
+
+def file_actions(files, index, batch=None):
+    """Yield bulk actions indexing the searchable files among `files` and
+    removing the others.
+    """
+    for file_ in files:
+        if file_is_searchable(file_):
+            yield {
+                '_index': index,
+                '_type': 'file',
+                '_id': file_._id,
+                '_source': serialize_file(file_, batch=batch),
+            }
+        else:
+            yield {
+                '_op_type': 'delete',
+                '_index': index,
+                '_type': 'file',
+                '_id': file_._id,
+            }
+
 @requires_search
 def update_node(node, index=None, bulk=False, async=False):
     index = index or INDEX
@@ -357,7 +524,7 @@ def update_node(node, index=None, bulk=False, async=False):
     for file_ in paginated(OsfStorageFile, Q('node', 'eq', node)):
         update_file(file_, index=index)
 
-    if node.is_deleted or not node.is_public or node.archiving or (node.is_spammy and settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH):
+    if not node_is_searchable(node):
         delete_doc(node._id, node, index=index)
     else:
         category = get_doctype_from_node(node)
@@ -367,18 +534,64 @@ def update_node(node, index=None, bulk=False, async=False):
         else:
             es.index(index=index, doc_type=category, id=node._id, body=elastic_document, refresh=True)
 
+def _send_bulk(actions, refresh=True):
+    _, errors = helpers.bulk(es, actions, raise_on_error=False, refresh=refresh)
+    for error in errors:
+        # Deleting a document that was never indexed is not a failure
+        if error.get('delete', {}).get('status') != 404:
+            logger.error('Failed to update search document: {}'.format(error))
+
+@requires_search
+def bulk_update_search(nodes, index=None, refresh=True):
+    """Reindex `nodes` and their osfstorage files with a single bulk request.
+
+    References of the whole batch are prefetched (see `NodeBatch`), so the
+    number of database queries does not grow with the number of nodes.
+    Documents of nodes and files that are no longer searchable are removed.
+    """
+    index = index or INDEX
+    nodes = list(nodes)
+    if not nodes:
+        return
+    batch = NodeBatch(nodes)
+    actions = list(node_actions(nodes, index, batch=batch))
+    for node in nodes:
+        if not node_is_searchable(node):
+            actions.append({
+                '_op_type': 'delete',
+                '_index': index,
+                '_type': get_doctype_from_node(node),
+                '_id': node._id,
+            })
+    actions.extend(file_actions(batch.files, index, batch=batch))
+    _send_bulk(actions, refresh=refresh)
+
+@requires_search
+def bulk_update_files(files, index=None, refresh=True):
+    """Reindex `files` with a single bulk request, removing the documents of
+    files that are no longer searchable.
+    """
+    index = index or INDEX
+    files = list(files)
+    if not files:
+        return
+    batch = NodeBatch(set(file_.node for file_ in files), files=files)
+    _send_bulk(file_actions(files, index, batch=batch), refresh=refresh)
+
 def bulk_update_nodes(serialize, nodes, index=None):
     """Updates the list of input projects
 
-    :param function Node-> dict serialize:
+    :param function (Node, NodeBatch) -> dict serialize:
     :param Node[] nodes: Projects, components or registrations
     :param str index: Index of the nodes
     :return:
     """
     index = index or INDEX
+    nodes = list(nodes)
+    batch = NodeBatch(nodes)
     actions = []
     for node in nodes:
-        serialized = serialize(node)
+        serialized = serialize(node, batch=batch)
         if serialized:
             actions.append({
                 '_op_type': 'update',
@@ -391,13 +604,14 @@ def bulk_update_nodes(serialize, nodes, index=None):
     if actions:
         return helpers.bulk(es, actions)
 
-def serialize_contributors(node):
+def serialize_contributors(node, batch=None):
+    batch = batch or NodeBatch([node])
     return {
         'contributors': [
             {
                 'fullname': user.fullname,
                 'url': user.profile_url if user.is_active else None
-            } for user in node.visible_contributors
+            } for user in batch.visible_contributors(node)
             if user is not None
             and user.is_active
         ]
@@ -406,17 +620,7 @@ def serialize_contributors(node):
 bulk_update_contributors = functools.partial(bulk_update_nodes, serialize_contributors)
 
 
-@requires_search
-def update_user(user, index=None):
-
-    index = index or INDEX
-    if not user.is_active:
-        try:
-            es.delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
-        except NotFoundError:
-            pass
-        return
-
+def serialize_user(user):
     names = dict(
         fullname=user.fullname,
         given_name=user.given_name,
@@ -434,7 +638,7 @@ def update_user(user, index=None):
                 pass  # This is fine, will only happen in 2.x if val is already unicode
             normalized_names[key] = unicodedata.normalize('NFKD', val).encode('ascii', 'ignore')
 
-    user_doc = {
+    return {
         'id': user._id,
         'user': user.fullname,
         'normalized_user': normalized_names['fullname'],
@@ -451,22 +655,52 @@ def update_user(user, index=None):
         'boost': 2,  # TODO(fabianvf): Probably should make this a constant or something
     }
 
+@requires_search
+def update_user(user, index=None):
+
+    index = index or INDEX
+    if not user.is_active:
+        try:
+            es.delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
+        except NotFoundError:
+            pass
+        return
+
+    user_doc = serialize_user(user)
+
     es.index(index=index, doc_type='user', body=user_doc, id=user._id, refresh=True)
 
 @requires_search
-def update_file(file_, index=None, delete=False):
+def bulk_update_users(users, index=None, refresh=True):
+    """Reindex `users` with a single bulk request, removing inactive users."""
     index = index or INDEX
+    actions = []
+    for user in users:
+        if user.is_active:
+            actions.append({
+                '_index': index,
+                '_type': 'user',
+                '_id': user._id,
+                '_source': serialize_user(user),
+            })
+        else:
+            actions.append({
+                '_op_type': 'delete',
+                '_index': index,
+                '_type': 'user',
+                '_id': user._id,
+            })
+    if actions:
+        _send_bulk(actions, refresh=refresh)
 
-    if not file_.node.is_public or delete or file_.node.is_deleted or file_.node.archiving:
-        es.delete(
-            index=index,
-            doc_type='file',
-            id=file_._id,
-            refresh=True,
-            ignore=[404]
-        )
-        return
+def file_is_searchable(file_):
+    return file_.node.is_public and not file_.node.is_deleted and not file_.node.archiving
+
+def serialize_file(file_, batch=None):
+    """Build the search document of `file_`.
 
+    :param NodeBatch batch: prefetched references of the batch the file's node belongs to
+    """
     # We build URLs manually here so that this function can be
     # run outside of a Flask request context (e.g. in a celery task)
     file_deep_url = '/{node_id}/files/{provider}{path}/'.format(
@@ -477,14 +711,18 @@ def update_file(file_, index=None, delete=False):
     node_url = '/{node_id}/'.format(node_id=file_.node._id)
 
     guid_url = None
-    file_guid = file_.get_guid(create=False)
-    if file_guid:
-        guid_url = '/{file_guid}/'.format(file_guid=file_guid._id)
-    file_doc = {
+    if batch is not None:
+        file_guid_id = batch.file_guid_id(file_)
+    else:
+        file_guid = file_.get_guid(create=False)
+        file_guid_id = file_guid._id if file_guid else None
+    if file_guid_id:
+        guid_url = '/{file_guid}/'.format(file_guid=file_guid_id)
+    return {
         'id': file_._id,
         'deep_url': file_deep_url,
         'guid_url': guid_url,
-        'tags': [tag._id for tag in file_.tags],
+        'tags': file_.tags._to_primary_keys(),
         'name': file_.name,
         'category': 'file',
         'node_url': node_url,
@@ -495,6 +733,22 @@ def update_file(file_, index=None, delete=False):
         'extra_search_terms': clean_splitters(file_.name),
     }
 
+@requires_search
+def update_file(file_, index=None, delete=False):
+    index = index or INDEX
+
+    if delete or not file_is_searchable(file_):
+        es.delete(
+            index=index,
+            doc_type='file',
+            id=file_._id,
+            refresh=True,
+            ignore=[404]
+        )
+        return
+
+    file_doc = serialize_file(file_)
+
     es.index(
         index=index,
         doc_type='file',
@@ -503,6 +757,15 @@ def update_file(file_, index=None, delete=False):
         refresh=True
     )
 
+def serialize_institution(institution):
+    return {
+        'id': institution._id,
+        'url': '/institutions/{}/'.format(institution._id),
+        'logo_path': institution.logo_path,
+        'category': 'institution',
+        'name': institution.name,
+    }
+
 @requires_search
 def update_institution(institution, index=None):
     index = index or INDEX
@@ -510,13 +773,7 @@ def update_institution(institution, index=None):
     if institution.is_deleted:
         es.delete(index=index, doc_type='institution', id=id_, refresh=True, ignore=[404])
     else:
-        institution_doc = {
-            'id': id_,
-            'url': '/institutions/{}/'.format(institution._id),
-            'logo_path': institution.logo_path,
-            'category': 'institution',
-            'name': institution.name,
-        }
+        institution_doc = serialize_institution(institution)
 
         es.index(index=index, doc_type='institution', body=institution_doc, id=id_, refresh=True)
 
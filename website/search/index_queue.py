@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Debounced queue of search documents waiting to be reindexed.
+
+Instead of indexing a document (and forcing an index refresh) on every save,
+saves record the document in the ``searchindexqueue`` collection. Entries are
+keyed by index, type and id, so repeated updates of the same document collapse
+into one entry. `flush` runs periodically from celery beat and indexes every
+entry that has been waiting for at least `SEARCH_INDEX_QUEUE_WINDOW` seconds,
+`SEARCH_INDEX_QUEUE_FLUSH_SIZE` documents per bulk request, leaving refreshes
+to the index's refresh interval.
+
+When more than `SEARCH_INDEX_QUEUE_MAX_DEPTH` documents are waiting, the queue
+is drained without waiting for the window: from a request this happens in a
+celery task once the request is over, outside of a request (e.g. in a bulk
+import script) it happens right away, so the caller waits for the backlog.
+"""
+import datetime
+import logging
+from collections import defaultdict
+
+from modularodm import Q
+
+from framework import metrics
+from framework.celery_tasks import app as celery_app
+from framework.celery_tasks.handlers import enqueue_task
+from framework.mongo import database
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = 'searchindexqueue'
+
+DOC_TYPES = ('node', 'user', 'file')
+
+stats = {
+    'enqueued': 0,
+    'collapsed': 0,
+    'flushed': 0,
+    'forced_flushes': 0,
+}
+
+
+def is_enabled():
+    # Without celery there is nothing to flush the queue, so index right away
+    return settings.SEARCH_INDEX_QUEUE_ENABLED and settings.USE_CELERY
+
+
+def get_collection():
+    return database[COLLECTION]
+
+
+def enqueue(doc_type, doc_id, index=None):
+    """Schedule the search document `doc_id` of type `doc_type` ('node', 'user'
+    or 'file') to be reindexed.
+    """
+    assert doc_type in DOC_TYPES, 'Unknown search document type {}'.format(doc_type)
+    index = index or settings.ELASTIC_INDEX
+    now = datetime.datetime.utcnow()
+    collection = get_collection()
+    result = collection.update(
+        {'_id': '{}:{}:{}'.format(index, doc_type, doc_id)},
+        {
+            '$set': {'updated': now},
+            '$setOnInsert': {'index': index, 'doc_type': doc_type, 'doc_id': doc_id, 'enqueued': now},
+        },
+        upsert=True,
+    )
+    if result and result.get('updatedExisting'):
+        stats['collapsed'] += 1
+        return
+    stats['enqueued'] += 1
+    if collection.count() > settings.SEARCH_INDEX_QUEUE_MAX_DEPTH:
+        stats['forced_flushes'] += 1
+        enqueue_task(flush.si(force=True))
+
+
+def _load(doc_type, ids):
+    from website.files.models import StoredFileNode
+    from website.models import Node, User
+
+    if doc_type == 'node':
+        return list(Node.find(Q('_id', 'in', ids)))
+    if doc_type == 'user':
+        return list(User.find(Q('_id', 'in', ids)))
+    return [stored.wrapped() for stored in StoredFileNode.find(Q('_id', 'in', ids))]
+
+
+def _index(entries):
+    from website.search import search
+
+    by_type = defaultdict(list)
+    for entry in entries:
+        by_type[(entry['index'], entry['doc_type'])].append(entry['doc_id'])
+    for (index, doc_type), ids in by_type.items():
+        objects = _load(doc_type, ids)
+        if doc_type == 'node':
+            search.bulk_update_search(objects, index=index, refresh=False)
+        elif doc_type == 'user':
+            search.bulk_update_users(objects, index=index, refresh=False)
+        else:
+            search.bulk_update_files(objects, index=index, refresh=False)
+
+
+@celery_app.task(ignore_results=True)
+def flush(force=False):
+    """Index the queued documents whose window has passed, or all of them if
+    `force` is set or the queue is deeper than `SEARCH_INDEX_QUEUE_MAX_DEPTH`.
+
+    :return int: number of documents indexed
+    """
+    collection = get_collection()
+    depth = collection.count()
+    if force or depth > settings.SEARCH_INDEX_QUEUE_MAX_DEPTH:
+        cutoff = datetime.datetime.utcnow()
+    else:
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=settings.SEARCH_INDEX_QUEUE_WINDOW)
+
+    flushed = 0
+    # Bounded so that documents updated continuously cannot keep a flush going forever
+    for _ in range(depth // settings.SEARCH_INDEX_QUEUE_FLUSH_SIZE + 1):
+        entries = list(
+            collection.find({'enqueued': {'$lte': cutoff}})
+            .sort('enqueued', 1)
+            .limit(settings.SEARCH_INDEX_QUEUE_FLUSH_SIZE)
+        )
+        if not entries:
+            break
+        _index(entries)
+        # Entries updated while they were being indexed stay queued for the next flush
+        collection.remove({'$or': [{'_id': entry['_id'], 'updated': entry['updated']} for entry in entries]})
+        flushed += len(entries)
+        if len(entries) < settings.SEARCH_INDEX_QUEUE_FLUSH_SIZE:
+            break
+
+    stats['flushed'] += flushed
+    if flushed:
+        logger.info('Flushed {} of {} queued search documents'.format(flushed, depth))
+    return flushed
+
+
+def get_status():
+    oldest = next(iter(get_collection().find({}, {'enqueued': True}).sort('enqueued', 1).limit(1)), None)
+    return dict(
+        stats,
+        depth=get_collection().count(),
+        oldest_age=(datetime.datetime.utcnow() - oldest['enqueued']).total_seconds() if oldest else 0.0,
+    )
+
+
+metrics.register('search_index_queue', get_status)
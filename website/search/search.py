@@ -3,6 +3,7 @@ import logging
 from framework.celery_tasks.handlers import enqueue_task
 
 from website import settings
+from website.search import index_queue
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +31,9 @@ def update_node(node, index=None, bulk=False, async=True, saved_fields=None):
         'index': index,
         'bulk': bulk
     }
-    if async:
+    if async and not bulk and index_queue.is_enabled():
+        index_queue.enqueue('node', node._id, index=index)
+    elif async:
         node_id = node._id
         # We need the transaction to be committed before trying to run celery tasks.
         # For example, when updating a Node's privacy, is_public must be True in the
@@ -49,6 +52,21 @@ def bulk_update_nodes(serialize, nodes, index=None):
     index = index or settings.ELASTIC_INDEX
     search_engine.bulk_update_nodes(serialize, nodes, index=index)
 
+@requires_search
+def bulk_update_search(nodes, index=None, refresh=True):
+    index = index or settings.ELASTIC_INDEX
+    search_engine.bulk_update_search(nodes, index=index, refresh=refresh)
+
+@requires_search
+def bulk_update_users(users, index=None, refresh=True):
+    index = index or settings.ELASTIC_INDEX
+    search_engine.bulk_update_users(users, index=index, refresh=refresh)
+
+@requires_search
+def bulk_update_files(files, index=None, refresh=True):
+    index = index or settings.ELASTIC_INDEX
+    search_engine.bulk_update_files(files, index=index, refresh=refresh)
+
 @requires_search
 def delete_node(node, index=None):
     index = index or settings.ELASTIC_INDEX
@@ -63,11 +81,17 @@ def update_contributors(nodes):
 
 @requires_search
 def update_user(user, index=None):
+    if index_queue.is_enabled():
+        index_queue.enqueue('user', user._id, index=index)
+        return
     index = index or settings.ELASTIC_INDEX
     search_engine.update_user(user, index=index)
 
 @requires_search
 def update_file(file_, index=None, delete=False):
+    if not delete and index_queue.is_enabled():
+        index_queue.enqueue('file', file_._id, index=index)
+        return
     index = index or settings.ELASTIC_INDEX
     search_engine.update_file(file_, index=index, delete=delete)
 
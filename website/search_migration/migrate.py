@@ -16,6 +16,7 @@ from website.app import init_app
 import website.search.search as search
 from scripts import utils as script_utils
 from website.search.elastic_search import es
+from website.search_migration import reindex
 
 
 logger = logging.getLogger(__name__)
@@ -49,7 +50,14 @@ def migrate_users(index):
     logger.info('Users iterated: {0}\nUsers migrated: {1}'.format(n_iter, n_migr))
 
 
-def migrate(delete, index=None, app=None):
+def migrate(delete, index=None, app=None, workers=None, resume=False, chunk_size=reindex.DEFAULT_CHUNK_SIZE):
+    """Rebuild the search index into a new versioned index and point the alias at it.
+
+    :param int workers: When given, index in parallel with this many processes
+        (see `website.search_migration.reindex`); otherwise index serially
+    :param bool resume: Continue an interrupted parallel reindex of the latest index
+    :param int chunk_size: Number of documents per bulk request when indexing in parallel
+    """
     index = index or settings.ELASTIC_INDEX
     app = app or init_app('website.settings', set_backends=True, routes=True)
 
@@ -60,10 +68,17 @@ def migrate(delete, index=None, app=None):
     ctx = app.test_request_context()
     ctx.push()
 
-    new_index = set_up_index(index)
+    if resume:
+        new_index = get_latest_index(index)
+        logger.info('Resuming reindex into {}'.format(new_index))
+    else:
+        new_index = set_up_index(index)
 
-    migrate_nodes(new_index)
-    migrate_users(new_index)
+    if workers:
+        reindex.reindex(new_index, workers=workers, chunk_size=chunk_size, resume=resume)
+    else:
+        migrate_nodes(new_index)
+        migrate_users(new_index)
 
     set_up_alias(index, new_index)
 
@@ -94,6 +109,14 @@ def set_up_index(idx):
     return index
 
 
+def get_latest_index(idx):
+    """Return the highest versioned index of `idx`, i.e. the one an interrupted
+    migration was filling.
+    """
+    versions = es.indices.get_aliases(index='{}_v*'.format(idx)).keys()
+    return max(versions, key=lambda name: int(name.split('_v')[1]))
+
+
 def set_up_alias(old_index, index):
     alias = es.indices.get_aliases(index=old_index)
     if alias:
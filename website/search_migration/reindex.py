@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""Parallel, resumable search reindexing.
+
+Each document type is split into `_id` ranges which are handed to a pool of
+worker processes. A worker walks its range in `_id` order, one page at a time,
+serializes the page and sends it to elasticsearch with the bulk helpers. After
+each page the last indexed `_id` of the range is written to a checkpoint file,
+so an interrupted reindex can be resumed with ``resume=True``.
+
+    from website.search_migration.reindex import reindex
+    reindex('website_v5', workers=8, chunk_size=500)
+"""
+from __future__ import absolute_import, division
+
+import os
+import json
+import time
+import logging
+import tempfile
+import multiprocessing
+
+from elasticsearch import Elasticsearch, helpers
+from modularodm import Q
+
+from framework.auth import User
+from framework.mongo.handlers import CLIENT_POOL
+from website import settings
+from website.files.models import StoredFileNode
+from website.files.models.osfstorage import OsfStorageFile
+from website.institutions.model import Institution
+from website.models import Node
+from website.search import elastic_search
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_PAGE_SIZE = 2000
+DEFAULT_THREAD_COUNT = 4
+
+
+def _node_actions(nodes, index):
+    return elastic_search.node_actions(nodes, index)
+
+
+def _user_actions(users, index):
+    for user in users:
+        if user.is_active:
+            yield {
+                '_index': index,
+                '_type': 'user',
+                '_id': user._id,
+                '_source': elastic_search.serialize_user(user),
+            }
+
+
+def _file_actions(files, index):
+    for file_ in files:
+        if elastic_search.file_is_searchable(file_):
+            yield {
+                '_index': index,
+                '_type': 'file',
+                '_id': file_._id,
+                '_source': elastic_search.serialize_file(file_),
+            }
+
+
+def _institution_actions(institutions, index):
+    for institution in institutions:
+        yield {
+            '_index': index,
+            '_type': 'institution',
+            '_id': institution._id,
+            '_source': elastic_search.serialize_institution(institution),
+        }
+
+
+class DocType(object):
+    """How to page through and serialize one kind of search document.
+
+    :param collection: pymongo collection holding the documents, used to split
+        the `_id` space into ranges
+    :param find: callable(query) returning a sortable MODM queryset
+    :param wrap: callable turning a queryset result into the serialized object
+    :param actions: callable(objects, index) yielding bulk actions
+    :param query: MODM query selecting the documents to index
+    :param key: callable returning the database `_id` of a wrapped object
+    """
+
+    def __init__(self, name, collection, find, actions, query=None, wrap=lambda x: x,
+                 key=lambda x: x._id, splittable=True):
+        self.name = name
+        self.key = key
+        self.collection = collection
+        self.find = find
+        self.actions = actions
+        self.query = query
+        self.wrap = wrap
+        self.splittable = splittable
+
+    def page(self, lower, upper, after, size):
+        query = Q('_id', 'gt', after) if after is not None else Q('_id', 'gte', lower) if lower is not None else None
+        if upper is not None:
+            query = query & Q('_id', 'lt', upper) if query else Q('_id', 'lt', upper)
+        if self.query is not None:
+            query = query & self.query if query else self.query
+        return [self.wrap(item) for item in self.find(query).sort('_id').limit(size)]
+
+    def split(self, partitions):
+        """Split the `_id` space into at most `partitions` [lower, upper) ranges."""
+        if not self.splittable or partitions < 2:
+            return [(None, None)]
+        collection = self.collection()
+        total = collection.count()
+        step = total // partitions
+        bounds = []
+        for i in range(1, partitions):
+            if not step:
+                break
+            document = next(iter(collection.find({}, {'_id': True}).sort('_id').skip(step * i).limit(1)), None)
+            if document and (not bounds or document['_id'] > bounds[-1]):
+                bounds.append(document['_id'])
+        lowers = [None] + bounds
+        uppers = bounds + [None]
+        return zip(lowers, uppers)
+
+
+def get_doc_types():
+    return [
+        DocType(
+            'node',
+            collection=lambda: Node._storage[0].store,
+            find=Node.find,
+            actions=_node_actions,
+            query=Q('is_public', 'eq', True) & Q('is_deleted', 'eq', False),
+        ),
+        DocType(
+            'user',
+            collection=lambda: User._storage[0].store,
+            find=User.find,
+            actions=_user_actions,
+        ),
+        DocType(
+            'file',
+            collection=lambda: StoredFileNode._storage[0].store,
+            find=lambda query: StoredFileNode.find(OsfStorageFile._filter(query)),
+            wrap=lambda stored: stored.wrapped(),
+            actions=_file_actions,
+        ),
+        DocType(
+            'institution',
+            collection=None,
+            find=lambda query: Node.find(query & Q('institution_id', 'ne', None), allow_institution=True),
+            wrap=Institution,
+            key=lambda institution: institution.node._id,
+            actions=_institution_actions,
+            query=Q('is_deleted', 'ne', True),
+            splittable=False,
+        ),
+    ]
+
+
+class Checkpoint(object):
+    """Progress of one `_id` range, persisted as a small JSON file."""
+
+    def __init__(self, path, doc_type, lower, upper):
+        self.path = path
+        self.state = {'doc_type': doc_type, 'lower': lower, 'upper': upper, 'last_id': None, 'count': 0, 'done': False}
+        if os.path.exists(path):
+            with open(path) as fp:
+                self.state.update(json.load(fp))
+
+    def save(self, **changes):
+        self.state.update(changes)
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as fp:
+            json.dump(self.state, fp)
+        os.rename(tmp_path, self.path)
+
+
+def _bulk(es, actions, chunk_size, thread_count):
+    """Send `actions` with `parallel_bulk` when the installed client provides it."""
+    if hasattr(helpers, 'parallel_bulk'):
+        results = helpers.parallel_bulk(es, actions, chunk_size=chunk_size, thread_count=thread_count)
+    else:
+        results = helpers.streaming_bulk(es, actions, chunk_size=chunk_size)
+    indexed = 0
+    for ok, info in results:
+        if ok:
+            indexed += 1
+        else:
+            logger.error('Failed to index document: {}'.format(info))
+    return indexed
+
+
+def _init_worker(app_init):
+    # Connections inherited from the parent process must not be shared
+    CLIENT_POOL.reset()
+    elastic_search.es = Elasticsearch(settings.ELASTIC_URI, request_timeout=settings.ELASTIC_TIMEOUT)
+    if app_init is not None:
+        app_init()
+
+
+def reindex_range(args):
+    """Index one `_id` range of a document type. Runs in a worker process.
+
+    :return tuple: (doc type name, number of documents indexed)
+    """
+    doc_type_name, lower, upper, index, checkpoint_path, page_size, chunk_size, thread_count = args
+    doc_type = next(each for each in get_doc_types() if each.name == doc_type_name)
+    checkpoint = Checkpoint(checkpoint_path, doc_type_name, lower, upper)
+    if checkpoint.state['done']:
+        return doc_type_name, 0
+
+    indexed = 0
+    after = checkpoint.state['last_id']
+    while True:
+        page = doc_type.page(lower, upper, after, page_size)
+        if not page:
+            break
+        indexed += _bulk(elastic_search.es, doc_type.actions(page, index), chunk_size, thread_count)
+        after = doc_type.key(page[-1])
+        checkpoint.save(last_id=after, count=checkpoint.state['count'] + len(page))
+        for model in (Node, User, StoredFileNode):
+            model._clear_caches()
+    checkpoint.save(done=True)
+    return doc_type_name, indexed
+
+
+def get_checkpoint_dir(index):
+    return os.path.join(tempfile.gettempdir(), 'osf-reindex-{}'.format(index))
+
+
+def reindex(index, workers=None, doc_types=None, chunk_size=DEFAULT_CHUNK_SIZE, page_size=DEFAULT_PAGE_SIZE,
+            thread_count=DEFAULT_THREAD_COUNT, checkpoint_dir=None, resume=False, app_init=None):
+    """Index every searchable document into `index`.
+
+    :param str index: Name of the (already created) index to fill
+    :param int workers: Number of worker processes, defaults to the number of CPUs
+    :param list doc_types: Names of the document types to index, defaults to all
+    :param int chunk_size: Number of documents per bulk request
+    :param int page_size: Number of documents read from the database at a time
+    :param int thread_count: Number of bulk requests in flight per worker
+    :param str checkpoint_dir: Where progress is recorded
+    :param bool resume: Continue from the checkpoints of a previous run instead of starting over
+    :param function app_init: Called in each worker process to set up the app
+    :return dict: doc type name => (documents indexed, documents per second)
+    """
+    workers = workers or multiprocessing.cpu_count()
+    checkpoint_dir = checkpoint_dir or get_checkpoint_dir(index)
+    if not os.path.isdir(checkpoint_dir):
+        os.makedirs(checkpoint_dir)
+    elif not resume:
+        for name in os.listdir(checkpoint_dir):
+            os.remove(os.path.join(checkpoint_dir, name))
+
+    selected = [each for each in get_doc_types() if doc_types is None or each.name in doc_types]
+    tasks = []
+    for doc_type in selected:
+        ranges_path = os.path.join(checkpoint_dir, '{}-ranges.json'.format(doc_type.name))
+        if resume and os.path.exists(ranges_path):
+            with open(ranges_path) as fp:
+                ranges = json.load(fp)
+        else:
+            ranges = doc_type.split(workers)
+            with open(ranges_path, 'w') as fp:
+                json.dump(ranges, fp)
+        for number, (lower, upper) in enumerate(ranges):
+            checkpoint_path = os.path.join(checkpoint_dir, '{}-{}.json'.format(doc_type.name, number))
+            tasks.append((doc_type.name, lower, upper, index, checkpoint_path, page_size, chunk_size, thread_count))
+
+    logger.info('Reindexing {} ranges into {} with {} workers'.format(len(tasks), index, workers))
+    started = {doc_type.name: time.time() for doc_type in selected}
+    finished = {}
+    counts = {doc_type.name: 0 for doc_type in selected}
+    remaining = {doc_type.name: sum(1 for task in tasks if task[0] == doc_type.name) for doc_type in selected}
+
+    pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(app_init, ))
+    try:
+        for name, indexed in pool.imap_unordered(reindex_range, tasks):
+            counts[name] += indexed
+            remaining[name] -= 1
+            if not remaining[name]:
+                finished[name] = time.time()
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    report = {}
+    for name, count in counts.items():
+        elapsed = finished.get(name, time.time()) - started[name]
+        report[name] = (count, count / elapsed if elapsed else 0.0)
+        logger.info('{}: {} documents in {:.1f}s ({:.1f} docs/sec)'.format(name, count, elapsed, report[name][1]))
+    return report
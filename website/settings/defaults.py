@@ -83,6 +83,22 @@ SEARCH_ENGINE = 'elastic'  # Can be 'elastic', or None
 ELASTIC_URI = 'localhost:9200'
 ELASTIC_TIMEOUT = 10
 ELASTIC_INDEX = 'website'
+# Queue search updates and index them in bulk instead of on every save (requires celery)
+SEARCH_INDEX_QUEUE_ENABLED = True
+# Seconds a queued document waits for further updates before it is indexed
+SEARCH_INDEX_QUEUE_WINDOW = 10
+# Documents per bulk request when the queue is flushed
+SEARCH_INDEX_QUEUE_FLUSH_SIZE = 500
+# Number of queued documents above which the queue is flushed without waiting for the window
+SEARCH_INDEX_QUEUE_MAX_DEPTH = 10000
+
+# Log ids read from the database at a time for the watched projects' log feed
+LOG_FEED_BATCH_SIZE = 100
+
+# Users whose notification digests are emailed, then removed, together
+NOTIFICATION_DIGEST_CHUNK_SIZE = 500
+# Notification digests read from the database at a time when sending digests
+NOTIFICATION_DIGEST_BATCH_SIZE = 1000
 
 # Sessions
 COOKIE_NAME = 'osf'
@@ -114,6 +130,17 @@ MAIL_SERVER = 'smtp.sendgrid.net'
 MAIL_USERNAME = 'osf-smtp'
 MAIL_PASSWORD = ''  # Set this in local.py
 
+# Open SMTP connections kept and reused per process
+MAIL_SMTP_POOL_SIZE = 4
+# Messages sent on an SMTP connection before it is replaced
+MAIL_SMTP_MAX_MESSAGES = 100
+# Seconds to wait for the SMTP server
+MAIL_SMTP_TIMEOUT = 30
+# Messages of a batch sent at once
+MAIL_SEND_CONCURRENCY = 4
+# Messages per task when a batch of mails is sent through celery
+MAIL_SEND_BATCH_SIZE = 500
+
 # OR, if using Sendgrid's API
 SENDGRID_API_KEY = None
 
@@ -153,6 +180,25 @@ DB_PORT = os_env.get('OSF_DB_PORT', 27017)
 DB_NAME = 'osf20130903'
 DB_USER = None
 DB_PASS = None
+# Maximum number of connections shared by all threads and greenlets of a process
+DB_POOL_SIZE = 100
+# Seconds to wait for a free connection before giving up
+DB_POOL_WAIT_TIMEOUT = 10
+# Seconds the pool may sit unused before its idle sockets are closed
+DB_POOL_IDLE_TIMEOUT = 300
+
+# Expose connection pool, queue and cache counters at /api/v1/status/metrics/. The
+# endpoint is unauthenticated; only enable it where it can't be reached publicly
+ENABLE_STATUS_METRICS = False
+
+# Merge page counter increments in memory and write them out periodically
+ANALYTICS_BUFFER_ENABLED = True
+# Seconds between writes of the buffered increments
+ANALYTICS_BUFFER_FLUSH_INTERVAL = 5
+# Number of pending documents that triggers a write before the interval is up
+ANALYTICS_BUFFER_MAX_KEYS = 5000
+# Write buffered increments when the process exits
+ANALYTICS_BUFFER_FLUSH_ON_EXIT = True
 
 # Cache settings
 SESSION_HISTORY_LENGTH = 5
@@ -297,6 +343,16 @@ DEFAULT_HMAC_SECRET = 'changeme'
 DEFAULT_HMAC_ALGORITHM = hashlib.sha256
 WATERBUTLER_URL = 'http://localhost:7777'
 WATERBUTLER_ADDRS = ['127.0.0.1']
+# Cache the metadata WaterButler returns for files of external providers
+WATERBUTLER_METADATA_CACHE_ENABLED = True
+# Seconds cached metadata is served without asking WaterButler again
+WATERBUTLER_METADATA_CACHE_TTL = 30
+# Seconds expired metadata is still served when WaterButler fails or is slow
+WATERBUTLER_METADATA_CACHE_STALE_TTL = 60 * 60
+# Number of paths cached per process
+WATERBUTLER_METADATA_CACHE_SIZE = 1000
+# Seconds to wait for metadata from WaterButler
+WATERBUTLER_METADATA_TIMEOUT = 10
 
 # Test identifier namespaces
 DOI_NAMESPACE = 'doi:10.5072/FK2'
@@ -311,6 +367,14 @@ SHARE_REGISTRATION_URL = ''
 SHARE_URL = 'https://share.osf.io/'
 
 CAS_SERVER_URL = 'http://localhost:8080'
+# Cache the profiles CAS returns for API bearer tokens
+CAS_TOKEN_CACHE_ENABLED = True
+# Seconds a valid token is trusted without asking CAS again
+CAS_TOKEN_CACHE_TTL = 60
+# Seconds a token rejected by CAS is rejected without asking CAS again
+CAS_TOKEN_CACHE_NEGATIVE_TTL = 10
+# Number of tokens cached per process
+CAS_TOKEN_CACHE_SIZE = 10000
 MFR_SERVER_URL = 'http://localhost:7778'
 
 ###### ARCHIVER ###########
@@ -323,6 +387,21 @@ ARCHIVE_TIMEOUT_TIMEDELTA = timedelta(1)  # 24 hours
 
 ENABLE_ARCHIVER = True
 
+# Folder listings requested from WaterButler at once while walking a file tree
+FILE_TREE_WORKERS = 8
+# Folder listings per second allowed against each provider, per process
+FILE_TREE_RATE_LIMITS = {
+    'default': 5,
+    'osfstorage': 50,
+}
+
+# Addons whose file grid data is fetched at once when serializing a project's files
+HGRID_ADDON_WORKERS = 8
+# Seconds to wait for the file grid data of each addon before showing it as unavailable
+HGRID_ADDON_TIMEOUTS = {
+    'default': 10,
+}
+
 JWT_SECRET = 'changeme'
 JWT_ALGORITHM = 'HS256'
 
@@ -336,6 +415,7 @@ HIGH_QUEUE = 'high'
 LOW_PRI_MODULES = {
     'framework.analytics.tasks',
     'framework.celery_tasks',
+    'api.caching.tasks',
     'scripts.osfstorage.usage_audit',
     'scripts.osfstorage.glacier_inventory',
     'scripts.analytics.tasks',
@@ -343,6 +423,7 @@ LOW_PRI_MODULES = {
     'scripts.osfstorage.glacier_audit',
     'scripts.populate_new_and_noteworthy_projects',
     'website.search.elastic_search',
+    'website.search.index_queue',
 }
 
 MED_PRI_MODULES = {
@@ -360,6 +441,7 @@ HIGH_PRI_MODULES = {
     'scripts.refresh_addon_tokens',
     'scripts.retract_registrations',
     'website.archiver.tasks',
+    'website.files.tasks',
 }
 
 try:
@@ -392,12 +474,15 @@ CELERY_RESULT_BACKEND = 'amqp://'
 # Modules to import when celery launches
 CELERY_IMPORTS = (
     'framework.celery_tasks',
+    'api.caching.tasks',
     'framework.celery_tasks.signals',
     'framework.email.tasks',
     'website.mailchimp_utils',
     'website.notifications.tasks',
     'website.archiver.tasks',
+    'website.files.tasks',
     'website.search.search',
+    'website.search.index_queue',
     'website.project.tasks',
     'scripts.populate_new_and_noteworthy_projects',
     'scripts.refresh_addon_tokens',
@@ -427,6 +512,10 @@ except ImportError:
 else:
     #  Setting up a scheduler, essentially replaces an independent cron job
     CELERYBEAT_SCHEDULE = {
+        'flush_search_index_queue': {
+            'task': 'website.search.index_queue.flush',
+            'schedule': timedelta(seconds=SEARCH_INDEX_QUEUE_WINDOW),
+        },
         '5-minute-emails': {
             'task': 'website.notifications.tasks.send_users_email',
             'schedule': crontab(minute='*/5'),
@@ -549,6 +638,12 @@ ENABLE_INSTITUTIONS = False
 ENABLE_VARNISH = False
 ENABLE_ESI = False
 VARNISH_SERVERS = []  # This should be set in local.py or cache invalidation won't work
+# Bans collected during a request are coalesced into alternation regexes no longer than this
+VARNISH_BAN_MAX_URL_LENGTH = 2048
+VARNISH_BAN_TIMEOUT = 0.3  # seconds
+VARNISH_BAN_CONCURRENCY = 10
+VARNISH_BAN_MAX_RETRIES = 5
+VARNISH_BAN_RETRY_DELAY = 30  # seconds
 ESI_MEDIA_TYPES = {'application/vnd.api+json', 'application/json'}
 
 # Used for gathering meta information about the current build
@@ -23,6 +23,9 @@ SEARCH_ENGINE = 'elastic'
 
 USE_EMAIL = False
 USE_CELERY = False
+ANALYTICS_BUFFER_ENABLED = False
+CAS_TOKEN_CACHE_ENABLED = False
+WATERBUTLER_METADATA_CACHE_ENABLED = False
 
 # Email
 MAIL_SERVER = 'localhost:1025'  # For local testing
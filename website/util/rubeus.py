@@ -4,9 +4,11 @@ formatted hgrid list/folders.
 """
 import logging
 import datetime
+import multiprocessing
+import time
+from multiprocessing.pool import ThreadPool
 
 import hurry.filesize
-
 from framework import sentry
 from framework.auth.decorators import Auth
 
@@ -148,13 +150,29 @@ def sort_by_name(hgrid_data):
 
 class NodeFileCollector(object):
 
-    """A utility class for creating rubeus formatted node data"""
+    """A utility class for creating rubeus formatted node data
+
+    The node tree is serialized first. The remote requests of the addons of
+    every serialized node that provide a `prefetch_hgrid_data` are then made
+    at once, up to `HGRID_ADDON_WORKERS` addons at a time, so that the slowest
+    remote addon, rather than the sum of all of them, sets the time taken.
+    Everything else, `get_hgrid_data` included, runs on the request thread, as
+    the database connection and transaction of the request are bound to it. An
+    addon that fails or whose requests take longer than its
+    `HGRID_ADDON_TIMEOUTS` is shown as unavailable. The time taken by each addon
+    is recorded in `addon_latency`.
+    """
     def __init__(self, node, auth, **kwargs):
         self.node = node
         self.auth = auth
         self.extra = kwargs
-        self.can_view = node.can_view(auth)
-        self.can_edit = node.can_edit(auth) and not node.is_registration
+        self.addon_latency = []
+        # Permissions by node id, as nodes are checked repeatedly while collecting
+        self._permissions = {}
+        # (node, children) of serialized nodes waiting for their addons
+        self._pending = []
+        self.can_view, can_edit = self._get_permissions(node)
+        self.can_edit = can_edit and not node.is_registration
 
     def to_hgrid(self):
         """Return the Rubeus.JS representation of the node's file data, including
@@ -163,27 +181,32 @@ class NodeFileCollector(object):
         root = self._serialize_node(self.node)
         return [root]
 
+    def _get_permissions(self, node):
+        if node._id not in self._permissions:
+            self._permissions[node._id] = (node.can_view(self.auth), node.can_edit(self.auth))
+        return self._permissions[node._id]
+
     def _collect_components(self, node, visited):
         rv = []
-        if not node.can_view(self.auth):
+        if not self._get_permissions(node)[0]:
             return rv
         for child in node.nodes:
             if child.is_deleted:
                 continue
-            elif not child.can_view(self.auth):
+            elif not self._get_permissions(child)[0]:
                 if child.primary:
                     for desc in child.find_readable_descendants(self.auth):
-                        visited.append(desc.resolve()._id)
+                        visited.add(desc.resolve()._id)
                         rv.append(self._serialize_node(desc, visited=visited))
             elif child.resolve()._id not in visited:
-                visited.append(child.resolve()._id)
+                visited.add(child.resolve()._id)
                 rv.append(self._serialize_node(child, visited=visited))
         return rv
 
     def _get_node_name(self, node):
         """Input node object, return the project name to be display.
         """
-        can_view = node.can_view(auth=self.auth)
+        can_view = self._get_permissions(node)[0]
 
         if can_view:
             node_name = sanitize.unescape_entities(node.title)
@@ -201,13 +224,16 @@ class NodeFileCollector(object):
     def _serialize_node(self, node, visited=None):
         """Returns the rubeus representation of a node folder.
         """
-        visited = visited or []
-        visited.append(node.resolve()._id)
-        can_view = node.can_view(auth=self.auth)
+        is_top = visited is None
+        visited = visited if visited is not None else set()
+        visited.add(node.resolve()._id)
+        can_view, can_edit = self._get_permissions(node)
+        children = []
         if can_view:
-            children = self._collect_addons(node) + self._collect_components(node, visited)
-        else:
-            children = []
+            self._pending.append((node, children))
+            children.extend(self._collect_components(node, visited))
+        if is_top:
+            self._collect_pending_addons()
 
         return {
             # TODO: Remove safe_unescape_html when mako html safe comes in
@@ -215,7 +241,7 @@ class NodeFileCollector(object):
             'category': node.category,
             'kind': FOLDER,
             'permissions': {
-                'edit': node.can_edit(self.auth) and not node.is_registration,
+                'edit': can_edit and not node.is_registration,
                 'view': can_view,
             },
             'urls': {
@@ -229,35 +255,129 @@ class NodeFileCollector(object):
             'nodeID': node.resolve()._id,
         }
 
+    def _collect_pending_addons(self):
+        """Put the addons of the nodes serialized so far ahead of their components"""
+        pending, self._pending = self._pending, []
+        collected = self._fetch_addons([node for node, _ in pending])
+        for (node, children), addons in zip(pending, collected):
+            children[0:0] = addons
+
     def _collect_addons(self, node):
-        rv = []
-        for addon in node.get_addons():
-            if addon.config.has_hgrid_files:
-                # WARNING: get_hgrid_data can return None if the addon is added but has no credentials.
-                try:
-                    temp = addon.config.get_hgrid_data(addon, self.auth, **self.extra)
-                except Exception as e:
-                    logger.warn(
-                        getattr(
-                            e,
-                            'data',
-                            'Unexpected error when fetching file contents for {0}.'.format(addon.config.full_name)
-                        )
-                    )
-                    sentry.log_exception()
-                    rv.append({
-                        KIND: FOLDER,
-                        'unavailable': True,
-                        'iconUrl': addon.config.icon_url,
-                        'provider': addon.config.short_name,
-                        'addonFullname': addon.config.full_name,
-                        'permissions': {'view': False, 'edit': False},
-                        'name': '{} is currently unavailable'.format(addon.config.full_name),
-                    })
-                    continue
-                rv.extend(sort_by_name(temp) or [])
+        return self._fetch_addons([node])[0]
+
+    def _fetch_addons(self, nodes):
+        """Return the serialized addons of each of `nodes`"""
+        jobs = [
+            (index, addon)
+            for index, node in enumerate(nodes)
+            for addon in node.get_addons()
+            if addon.config.has_hgrid_files
+        ]
+        prefetched = self._prefetch([addon for _, addon in jobs])
+
+        rv = [[] for _ in nodes]
+        for (index, addon), (status, data, latency) in zip(jobs, prefetched):
+            if status == 'ok':
+                status, data, render_latency = self._get_hgrid_data(addon, data)
+                latency += render_latency
+            self.addon_latency.append({
+                'nodeID': addon.owner._id,
+                'provider': addon.config.short_name,
+                'latency': round(latency, 3),
+                'status': status,
+            })
+            if status == 'ok':
+                rv[index].extend(sort_by_name(data) or [])
+            else:
+                rv[index].append(unavailable_addon(addon))
         return rv
 
+    def _prefetch(self, addons):
+        """Return ``(status, prefetched data, seconds taken)`` of each of `addons`,
+        making the remote requests of those with a `prefetch_hgrid_data` at once
+        """
+        results = [('ok', None, 0)] * len(addons)
+        pending = []
+        for position, addon in enumerate(addons):
+            if not addon.config.prefetch_hgrid_data:
+                continue
+            # Whatever the requests need from the database is read here, on the request thread
+            status, fetch, latency = self._call(addon, addon.config.prefetch_hgrid_data, addon, self.auth, **self.extra)
+            results[position] = (status, None, latency)
+            if status == 'ok' and fetch:
+                pending.append((position, addon, fetch))
+
+        if len(pending) > 1 and settings.HGRID_ADDON_WORKERS > 1:
+            fetched = self._run_concurrently([(each_addon, each_fetch) for _, each_addon, each_fetch in pending])
+        else:
+            fetched = [self._call(each_addon, each_fetch) for _, each_addon, each_fetch in pending]
+        for (position, _, _), (status, data, latency) in zip(pending, fetched):
+            results[position] = (status, data, results[position][2] + latency)
+        return results
+
+    def _get_hgrid_data(self, addon, prefetched=None):
+        """Return ``(status, hgrid data, seconds taken)`` of `addon`"""
+        kwargs = dict(self.extra)
+        if prefetched is not None:
+            kwargs['prefetched'] = prefetched
+        # WARNING: get_hgrid_data can return None if the addon is added but has no credentials.
+        return self._call(addon, addon.config.get_hgrid_data, addon, self.auth, **kwargs)
+
+    def _call(self, addon, func, *args, **kwargs):
+        """Return ``(status, return value, seconds taken)`` of calling `func`"""
+        start = time.time()
+        try:
+            rv = func(*args, **kwargs)
+        except Exception as e:
+            logger.warn(
+                getattr(
+                    e,
+                    'data',
+                    'Unexpected error when fetching file contents for {0}.'.format(addon.config.full_name)
+                )
+            )
+            sentry.log_exception()
+            return 'error', None, time.time() - start
+        return 'ok', rv, time.time() - start
+
+    def _run_concurrently(self, fetches):
+        """Call each of the ``(addon, fetch)`` `fetches` on a thread pool. The
+        fetches make remote requests only, so those that time out are left to
+        finish without holding up the response.
+        """
+        timeouts = settings.HGRID_ADDON_TIMEOUTS
+        pool = ThreadPool(min(settings.HGRID_ADDON_WORKERS, len(fetches)))
+        try:
+            start = time.time()
+            async_results = [
+                pool.apply_async(self._call, (addon, fetch))
+                for addon, fetch in fetches
+            ]
+
+            results = []
+            for (addon, _), async_result in zip(fetches, async_results):
+                timeout = timeouts.get(addon.config.short_name, timeouts['default'])
+                try:
+                    results.append(async_result.get(max(start + timeout - time.time(), 0)))
+                except multiprocessing.TimeoutError:
+                    logger.warn('Timed out fetching file contents for {0}.'.format(addon.config.full_name))
+                    results.append(('timeout', None, time.time() - start))
+            return results
+        finally:
+            pool.close()
+
+
+def unavailable_addon(addon):
+    return {
+        KIND: FOLDER,
+        'unavailable': True,
+        'iconUrl': addon.config.icon_url,
+        'provider': addon.config.short_name,
+        'addonFullname': addon.config.full_name,
+        'permissions': {'view': False, 'edit': False},
+        'name': '{} is currently unavailable'.format(addon.config.full_name),
+    }
+
 
 # TODO: these might belong in addons module
 def collect_addon_assets(node):